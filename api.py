@@ -0,0 +1,203 @@
+from datetime import datetime
+
+from flask import Blueprint, current_app, jsonify, request
+
+from constants import ERROR_CODES
+from constants import CLUB_LIMIT_MESSAGE
+from constants import EMAIL_NOT_FOUND_ERROR
+from constants import EMAIL_EMPTY_ERROR
+from constants import INVALID_CLUB_OR_COMPETITION
+from constants import LOADING_MESSAGE_ERROR
+from constants import SAVE_CHANGES_MESSAGE_ERROR
+from constants import ERROR_MESSAGE_RETRY
+from constants import IDEMPOTENCY_KEY_REUSED_MESSAGE
+
+from utils import validate_purchase
+from utils import is_competition_past
+from utils import purchase_limit
+from utils import competition_filters
+
+from data_access import load_clubs
+from data_access import load_competitions
+from data_access import apply_booking
+from data_access import get_club_by_email
+from data_access import get_club_by_name
+from data_access import get_competition_by_name
+from data_access import data_lock_path
+from data_access import competition_date
+from data_access import competitions_page
+
+from locks import booking_lock
+
+from holds import without_holds
+
+from http_cache import conditional
+
+from idempotency import idempotent
+from idempotency import keep_outcome
+
+from metrics import count_booking
+
+# JSON version of the HTML routes, for clients that do not need the pages. Errors are returned as
+#     {"error": {"code": "insufficient_points", "message": "You do not have enough points to reserve these places."}}
+# with the same messages as the pages and the codes of constants.ERROR_CODES.
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# HTTP status of each error code. The other codes are invalid requests (422).
+ERROR_STATUSES = {
+    "email_missing": 400,
+    "club_not_found": 404,
+    "invalid_club_or_competition": 404,
+    "insufficient_points": 409,
+    "insufficient_places": 409,
+    "competition_full": 409,
+    "club_limit_reached": 409,
+    "loading_error": 503,
+    "save_error": 503,
+    "unknown_error": 500,
+}
+
+# Largest number of competitions returned at once.
+MAX_PAGE_SIZE = 100
+
+
+def error_code(message: str) -> str:
+    # Returns the code of a message. The club limit message holds the number of places left, so it is recognized by
+    # the text before that number.
+    code = ERROR_CODES.get(message)
+    if code is None and message.startswith(CLUB_LIMIT_MESSAGE.split('{')[0]):
+        code = ERROR_CODES[CLUB_LIMIT_MESSAGE]
+    return code or ERROR_CODES[ERROR_MESSAGE_RETRY]
+
+
+def error_response(message: str):
+    code = error_code(message)
+    if request.endpoint == 'api.purchase_places':
+        count_booking(code)
+    return jsonify(error={"code": code, "message": message}), ERROR_STATUSES.get(code, 422)
+
+
+def _number(value):
+    # Points and places are loaded as numbers, or as None when the data files hold an invalid value.
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _club_json(club) -> dict:
+    return {"name": club['name'], "email": club['email'], "points": _number(club['points'])}
+
+
+def _competition_json(competitions, competition, current_date: datetime, club=None) -> dict:
+    date = competition_date(competitions, competition)
+    result = {
+        "name": competition['name'],
+        "date": competition['date'],
+        "places": _number(competition['numberOfPlaces']),
+        "past": date is None or is_competition_past(date, current_date),
+    }
+    # For a club, also tell how many places it has already booked and can still book.
+    if club is not None:
+        result["booked"] = competition.get('bookings', {}).get(club['name'], 0)
+        result["remaining_limit"] = purchase_limit(club, competition)
+    return result
+
+
+def _listed_competitions(competitions, current_date: datetime):
+    # Like the summary page, lists one page of the competitions matching the filters of the query string (by default
+    # the upcoming ones, by date), with at most ?limit= competitions. Returns the page and the next cursor.
+    try:
+        page_size = min(max(int(request.args.get('limit', '')), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        page_size = current_app.config['COMPETITIONS_PER_PAGE']
+    return competitions_page(competitions, page_size=page_size,
+                             **competition_filters(request.args, current_date))
+
+
+@api.route('/summary')
+@conditional(time_dependent=True)
+def summary():
+    # Same as /show-summary: the club of the email and the competitions, with what the club has booked in each.
+    email = request.args.get('email')
+    competitions = load_competitions()
+    if not competitions:
+        return error_response(LOADING_MESSAGE_ERROR)
+    if not email:
+        return error_response(EMAIL_EMPTY_ERROR)
+
+    club = get_club_by_email(email)
+    if not club:
+        return error_response(EMAIL_NOT_FOUND_ERROR)
+    current_date = datetime.now()
+    page, next_cursor = _listed_competitions(competitions, current_date)
+    return jsonify(club=_club_json(club), competitions=[_competition_json(competitions, c, current_date, club)
+                                                        for c in page], next_cursor=next_cursor)
+
+
+@api.route('/competitions')
+@conditional(time_dependent=True)
+def competitions_availability():
+    competitions = load_competitions()
+    if not competitions:
+        return error_response(LOADING_MESSAGE_ERROR)
+    current_date = datetime.now()
+    page, next_cursor = _listed_competitions(competitions, current_date)
+    return jsonify(competitions=[_competition_json(competitions, c, current_date) for c in page],
+                   next_cursor=next_cursor)
+
+
+@api.route('/competitions/<name>')
+@conditional(time_dependent=True)
+def competition_availability(name):
+    competitions = load_competitions()
+    competition = get_competition_by_name(name)
+    if not competition:
+        return error_response(INVALID_CLUB_OR_COMPETITION)
+    return jsonify(competition=_competition_json(competitions, competition, datetime.now()))
+
+
+@api.route('/club-points')
+@conditional()
+def club_points():
+    clubs = load_clubs()
+    if not clubs:
+        return error_response(LOADING_MESSAGE_ERROR)
+    return jsonify(clubs=[{"name": club['name'], "points": _number(club['points'])} for club in clubs])
+
+
+@api.route('/purchases', methods=['POST'])
+@idempotent(('competition', 'club', 'places'), lambda: error_response(IDEMPOTENCY_KEY_REUSED_MESSAGE))
+def purchase_places():
+    # Books places with a JSON body {"club": ..., "competition": ..., "places": ...}. Runs the checks of the
+    # /purchase-places page under the same locks, and returns the club and the competition after the booking. With an
+    # Idempotency-Key header, retries get the response to the first booking again.
+    data = request.get_json(silent=True) or {}
+    competition_name = data.get('competition')
+    club_name = data.get('club')
+    if not isinstance(competition_name, str) or not isinstance(club_name, str):
+        return error_response(INVALID_CLUB_OR_COMPETITION)
+
+    with booking_lock(competition_name, club_name, data_lock_path()):
+        selected_competition = get_competition_by_name(competition_name)
+        selected_club = get_club_by_name(club_name)
+        if not selected_competition or not selected_club:
+            return error_response(INVALID_CLUB_OR_COMPETITION)
+
+        places_required, error_message = validate_purchase(selected_club,
+                                                           without_holds(selected_competition, club_name),
+                                                           data.get('places'), datetime.now(),
+                                                           competition_date(load_competitions(),
+                                                                            selected_competition))
+        if error_message:
+            return error_response(error_message)
+
+        if not apply_booking(competition_name, club_name, places_required):
+            return error_response(SAVE_CHANGES_MESSAGE_ERROR)
+
+        keep_outcome()
+        count_booking('booked')
+        club = get_club_by_name(club_name)
+        return jsonify(places=places_required, club=_club_json(club),
+                       competition=_competition_json(load_competitions(), get_competition_by_name(competition_name),
+                                                     datetime.now(), club)), 201
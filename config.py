@@ -0,0 +1,79 @@
+import os
+
+# Settings holding a path to the data, relative to the root of the repository.
+DATA_PATH_SETTINGS = ('CLUBS_FILE', 'COMPETITIONS_FILE', 'SQLITE_DATABASE', 'SHARDED_DATA_DIRECTORY',
+                      'IDEMPOTENCY_DIRECTORY', 'HOLDS_FILE')
+
+
+class Config:
+    # Settings read once when the application starts (see server.create_app).
+    SECRET_KEY = os.getenv('GUDLFT_SECRET_KEY', 'something_special')
+
+    # Where clubs and competitions are stored: "json" (the data files below), "sqlite" (the database below),
+    # "sharded" (the directory below, one file per competition and buckets of clubs) or "memory" (a copy of the data
+    # files that is never written back). Relative paths are taken from the root of the repository.
+    STORAGE_BACKEND = os.getenv('GUDLFT_STORAGE_BACKEND', 'sqlite' if os.getenv('GUDLFT_SQLITE_DATABASE') else 'json')
+    CLUBS_FILE = os.getenv('GUDLFT_CLUBS_FILE', 'data/production/clubs.json')
+    COMPETITIONS_FILE = os.getenv('GUDLFT_COMPETITIONS_FILE', 'data/production/competitions.json')
+    SQLITE_DATABASE = os.getenv('GUDLFT_SQLITE_DATABASE', 'data/production/gudlft.db')
+    SHARDED_DATA_DIRECTORY = os.getenv('GUDLFT_SHARDED_DATA_DIRECTORY', 'data/production/sharded')
+    # Writes the JSON data files without indentation, which is several times faster for large files.
+    COMPACT_JSON = False
+    # Seconds during which the bookings of concurrent requests are gathered to be saved by a single write, for the
+    # "json" and "sharded" storages (see persistence.GroupCommitter). None saves each booking on its own.
+    GROUP_COMMIT_WINDOW = None
+    # Saves the bookings from a background thread instead (see persistence.WriteBehindPersister): "fsync" answers a
+    # booking once it is written, "enqueue" as soon as it is queued, at the risk of losing the bookings not written
+    # yet if the process dies. Only for a single worker process: another process using the same files, or a fork,
+    # writes its bookings synchronously. None, the default, disables it.
+    WRITE_BEHIND = None
+    # Bookings waiting to be written by the background thread before new bookings have to wait.
+    WRITE_BEHIND_MAX_PENDING = 1000
+    # Number of competitions listed on each page of the summary page.
+    COMPETITIONS_PER_PAGE = 20
+    # Number of clubs listed on each page of /club-points when a page is asked for, and whether the page is always
+    # streamed (it can also be asked for with ?stream=1).
+    CLUB_POINTS_PER_PAGE = 100
+    CLUB_POINTS_STREAMING = False
+    # Seconds during which the response to a booking sent with an idempotency key is given again to retries with the
+    # same key (see idempotency), 0 to disable it, and the number of responses kept. They are kept in the directory
+    # below, shared by the worker processes, or in the memory of each worker if it is None, which is only right for a
+    # single worker process.
+    IDEMPOTENCY_TTL = 600
+    IDEMPOTENCY_MAX_ENTRIES = 10000
+    IDEMPOTENCY_DIRECTORY = os.getenv('GUDLFT_IDEMPOTENCY_DIRECTORY', 'data/production/idempotency')
+    # Seconds during which the places asked for on a booking page (the places sent to /book/<competition>/<club>) are
+    # held for the club (see holds), 0 to disable holds. They are kept in the file below, shared by the worker
+    # processes, or in the memory of each worker if it is None, which is only right for a single worker process.
+    HOLD_SECONDS = 120
+    HOLDS_FILE = os.getenv('GUDLFT_HOLDS_FILE', 'data/production/holds.json')
+    # Directory where each worker process writes its metrics, so that /metrics shows those of all the workers (see
+    # metrics), and how often they are written. None only shows the metrics of the worker answering.
+    METRICS_DIRECTORY = os.getenv('GUDLFT_METRICS_DIRECTORY')
+    METRICS_FLUSH_SECONDS = 5
+    # Directory where the cProfile stats of the requests profiled are written (see profiling), None to never profile.
+    # Requests are profiled when they send a token made by "python profiling.py" in the X-Profile-Token header, or
+    # at random for the share PROFILING_SAMPLE_RATE of the requests. The PROFILING_MAX_FILES most recent are kept.
+    PROFILING_DIRECTORY = os.getenv('GUDLFT_PROFILING_DIRECTORY')
+    PROFILING_SAMPLE_RATE = 0.0
+    PROFILING_MAX_FILES = 100
+    # Memory kept for rendered parts of pages (see fragment_cache), 0 to disable it.
+    FRAGMENT_CACHE_BYTES = 16 * 1024 * 1024
+    # Loads and indexes the data and compiles the templates when the application is created, so that the first
+    # request does not pay for it, and so that the workers forked by gunicorn --preload share them.
+    PRELOAD_DATA = os.getenv('GUDLFT_PRELOAD_DATA', '1') == '1'
+
+
+class TestingConfig(Config):
+    # Used by the performance tests, so that they do not change the production data.
+    CLUBS_FILE = os.getenv('GUDLFT_CLUBS_FILE', 'data/test/clubs_test.json')
+    COMPETITIONS_FILE = os.getenv('GUDLFT_COMPETITIONS_FILE', 'data/test/competitions_test.json')
+    SQLITE_DATABASE = os.getenv('GUDLFT_SQLITE_DATABASE', 'data/test/gudlft_test.db')
+    SHARDED_DATA_DIRECTORY = os.getenv('GUDLFT_SHARDED_DATA_DIRECTORY', 'data/test/sharded')
+    IDEMPOTENCY_DIRECTORY = os.getenv('GUDLFT_IDEMPOTENCY_DIRECTORY', 'data/test/idempotency')
+    HOLDS_FILE = os.getenv('GUDLFT_HOLDS_FILE', 'data/test/holds.json')
+
+
+def get_config():
+    # Returns the configuration for the environment named by FLASK_ENV.
+    return Config if os.getenv('FLASK_ENV', 'production') == 'production' else TestingConfig
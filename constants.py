@@ -16,3 +16,29 @@ MAX_PLACES_PER_BOOKING_MESSAGE = "Cannot book more than 12 places."
 INVALID_DATE_FORMAT_MESSAGE = "Invalid competition date format"
 PAST_COMPETITION_BOOKING_ERROR_MESSAGE = "Cannot book places for past competitions"
 COMPETITION_FULL_MESSAGE = "The competition is already full. No more places available."
+INVALID_NUMBER_OF_PLACES_MESSAGE = "Invalid number of places"
+CLUB_LIMIT_MESSAGE = "You can only book {remaining_places} more place(s) for this competition."
+EMPTY_BATCH_MESSAGE = "Please enter the number of places for at least one competition."
+IDEMPOTENCY_KEY_REUSED_MESSAGE = "This booking was already sent with other values. Please reload the page."
+
+# Error codes returned by the JSON API along with the messages above.
+ERROR_CODES = {
+    EMAIL_NOT_FOUND_ERROR: "club_not_found",
+    EMAIL_EMPTY_ERROR: "email_missing",
+    LOADING_MESSAGE_ERROR: "loading_error",
+    SAVE_CHANGES_MESSAGE_ERROR: "save_error",
+    ERROR_MESSAGE_RETRY: "unknown_error",
+    INSUFFICIENT_POINTS_MESSAGE: "insufficient_points",
+    INSUFFICIENT_PLACES_MESSAGE: "insufficient_places",
+    INVALID_PLACES_MESSAGE: "invalid_places",
+    INVALID_POINTS_MESSAGE: "invalid_points",
+    NON_POSITIVE_PLACES_MESSAGE: "non_positive_places",
+    INVALID_CLUB_OR_COMPETITION: "invalid_club_or_competition",
+    MAX_PLACES_PER_BOOKING_MESSAGE: "max_places_per_booking",
+    INVALID_DATE_FORMAT_MESSAGE: "invalid_date_format",
+    PAST_COMPETITION_BOOKING_ERROR_MESSAGE: "past_competition",
+    COMPETITION_FULL_MESSAGE: "competition_full",
+    INVALID_NUMBER_OF_PLACES_MESSAGE: "invalid_number_of_places",
+    CLUB_LIMIT_MESSAGE: "club_limit_reached",
+    IDEMPOTENCY_KEY_REUSED_MESSAGE: "idempotency_key_reused",
+}
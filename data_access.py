@@ -1,56 +1,1531 @@
 import os
 import json
+import time
+import uuid
+import bisect
+import heapq
+import stat
+import hashlib
+import tempfile
+import copy
+import sqlite3
+import weakref
+import threading
+from typing import Optional
+from typing import Tuple
+from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, where write-behind cannot check that it runs in a single process.
+    fcntl = None
 
-def load_clubs():
-    env = os.getenv('FLASK_ENV', 'production')
-    file_path = 'data/production/clubs.json' if env == 'production' \
-        else 'data/test/clubs_test.json'
+from flask import current_app, has_app_context
+
+import sqlite_storage
+import sharded_storage
+from persistence import GroupCommitter
+from persistence import WriteBehindPersister
+from locks import data_lock
+from locks import bookings_waiting
+from locks import release_booking_locks
+from metrics import STORAGE_SECONDS
+from utils import purchase_limit
+from utils import parse_competition_date
+from models import Record
+from models import Club
+from models import Competition
+from models import clubs_from_dicts
+from models import competitions_from_dicts
+from models import to_dicts
+from config import get_config
+
+
+class RecordsCache:
+    # Keeps the parsed content of the JSON data files in memory. An entry is reused as long as the file on disk keeps
+    # the same signature (mtime, size and inode), so a request only pays for an os.stat() instead of a full json.load().
+    #
+    # While a file is pinned, its entry is reused whatever the signature: this process is writing records that are
+    # already older than the ones in memory, which must not be replaced by reading them back.
+    def __init__(self):
+        self._entries = {}
+        self._pinned = {}  # file path -> number of writes in progress
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, file_path: str, signature: tuple):
+        # Returns the cached records for the file if its signature did not change, None otherwise.
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is not None and (entry[0] == signature or file_path in self._pinned):
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, file_path: str, signature: tuple, records):
+        with self._lock:
+            self._entries[file_path] = (signature, records)
+
+    def pin(self, file_path: str):
+        with self._lock:
+            self._pinned[file_path] = self._pinned.get(file_path, 0) + 1
+
+    def unpin(self, file_path: str):
+        with self._lock:
+            self._pinned[file_path] -= 1
+            if self._pinned[file_path] == 0:
+                del self._pinned[file_path]
+
+    def invalidate(self, file_path: Optional[str] = None):
+        # Drops the entry of one file, or every entry when no file is given, forcing the next load to read the disk.
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(file_path, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+def normalize_email(email: str) -> str:
+    # Emails are compared case-insensitively and without surrounding spaces.
+    return email.strip().casefold()
+
+
+def _same_value(value):
+    return value
+
+
+# Generation of the filters of every IndexedRecords: records changed in place so that they match a filter again
+# (a competition getting places back) bump it, and the positions matching the filters are then found again.
+_filters_generation = {"value": 0}
+
+
+def _matching_again():
+    _filters_generation["value"] += 1
+
+
+class IndexedRecords(list):
+    # A list of records that also keeps a dict index per looked-up field, so finding a club or a competition is a
+    # dict access instead of a scan. The first record holding a value wins, like next() over the list did. Appending
+    # updates the indexes in place; any other change to the list rebuilds them on the next lookup. Call reindex()
+    # after changing an indexed field of a record in place.
+    #
+    # Sorted fields map a name to a function giving the sort key of a record (the parsed date of a competition). The
+    # keys are computed once and kept in order, so a range of keys is found with bisect. Records without a key (None)
+    # are left out of the ranges.
+    #
+    # Filters map a name to a sorted field and a predicate (a competition has places): the positions, in order of
+    # that field, of the records matching it are kept, so a range of them is also found with bisect. A record that
+    # stops matching is skipped when it is met, then left out; one that matches again calls _matching_again().
+    def __init__(self, records=(), index_fields=None, sorted_fields=None, filters=None):
+        super().__init__(records)
+        self._index_fields = index_fields or {}
+        self._sorted_fields = sorted_fields or {}
+        self._filters = filters or {}
+        self._indexes = None
+        self._sorted = None
+        self._filtered = {}
+
+    def reindex(self):
+        indexes = {field: {} for field in self._index_fields}
+        for record in self:
+            self._index_record(indexes, record)
+        self._indexes = indexes
+        self._sorted = None
+        if self._sorted_fields:
+            self._sort()
+
+    def _index_record(self, indexes, record):
+        for field, normalize in self._index_fields.items():
+            value = record.get(field)
+            if value is not None:
+                indexes[field].setdefault(normalize(value), record)
+
+    def _sort(self):
+        # For each sorted field: the key of every record, by id, and the records that have one, in order of that key
+        # (stable, so records with the same key keep the order of the list).
+        sorted_indexes = {}
+        for field, sort_key in self._sorted_fields.items():
+            values = {record_id: sort_key(record) for record_id, record in ((id(record), record) for record in self)}
+            ordered = sorted((record for record in self if values[id(record)] is not None),
+                             key=lambda record: values[id(record)])
+            positions = {id(record): position for position, record in enumerate(ordered)}
+            sorted_indexes[field] = (values, [values[id(record)] for record in ordered], ordered, positions)
+        self._sorted = sorted_indexes
+        return sorted_indexes
+
+    def _sorted_index(self, field: str):
+        sorted_indexes = self._sorted if self._sorted is not None else self._sort()
+        return sorted_indexes[field]
+
+    def lookup(self, field: str, value):
+        # Returns the first record whose field matches the value, or None.
+        indexes = self._indexes
+        if indexes is None:
+            self.reindex()
+            indexes = self._indexes
+        return indexes[field].get(self._index_fields[field](value))
+
+    def converted(self, field: str, record):
+        # Returns the sort key of a record for a sorted field, computed when the records were indexed.
+        values = self._sorted_index(field)[0]
+        if id(record) in values:
+            return values[id(record)]
+        return self._sorted_fields[field](record)  # A record that is not in the list, such as a copy
+
+    def bounds(self, field: str, start=None, end=None) -> Tuple[int, int]:
+        # Returns the positions, in order of a sorted field, of the first record whose value is at least start and
+        # of the first one whose value is at least end.
+        keys = self._sorted_index(field)[1]
+        low = 0 if start is None else bisect.bisect_left(keys, start)
+        high = len(keys) if end is None else bisect.bisect_left(keys, end)
+        return low, max(low, high)
+
+    def between(self, field: str, start=None, end=None) -> list:
+        # Returns the records whose converted value is at least start and below end, in order of that value.
+        low, high = self.bounds(field, start, end)
+        return self._sorted_index(field)[2][low:high]
+
+    def at(self, field: str, position: int):
+        # Returns the record at a position in order of a sorted field.
+        return self._sorted_index(field)[2][position]
+
+    def position(self, field: str, record) -> Optional[int]:
+        # Returns the position of a record in order of a sorted field, or None if its value could not be converted.
+        return self._sorted_index(field)[3].get(id(record))
+
+    def _filter_index(self, name: str) -> tuple:
+        # The positions matching a filter, found again when the sorted field was sorted again or the generation
+        # changed. The list is replaced rather than changed, so a walk over it is never disturbed.
+        field, predicate = self._filters[name]
+        generation = _filters_generation["value"]
+        ordered = self._sorted_index(field)[2]
+        filtered = self._filtered.get(name)
+        if filtered is None or filtered[0] is not ordered or filtered[1] != generation:
+            filtered = (ordered, generation, [position for position, record in enumerate(ordered) if predicate(record)])
+            self._filtered[name] = filtered
+        return filtered
+
+    def matching(self, name: str, low: int, high: int):
+        # Yields, in order, the positions from low to high of the records matching a filter.
+        field, predicate = self._filters[name]
+        filtered = self._filter_index(name)
+        ordered, positions = filtered[0], filtered[2]
+        stale = []
+        try:
+            for index in range(bisect.bisect_left(positions, low), len(positions)):
+                position = positions[index]
+                if position >= high:
+                    break
+                if predicate(ordered[position]):
+                    yield position
+                else:
+                    stale.append(position)
+        finally:
+            if stale and self._filtered.get(name) is filtered:
+                stale = set(stale)
+                self._filtered[name] = (ordered, filtered[1], [position for position in positions
+                                                               if position not in stale])
+
+    def append(self, record):
+        super().append(record)
+        if self._indexes is not None:
+            self._index_record(self._indexes, record)
+        self._sorted = None
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
 
+    def _drop_indexes(method):
+        def wrapper(self, *args, **kwargs):
+            self._indexes = None
+            self._sorted = None
+            return method(self, *args, **kwargs)
+        return wrapper
+
+    insert = _drop_indexes(list.insert)
+    remove = _drop_indexes(list.remove)
+    pop = _drop_indexes(list.pop)
+    clear = _drop_indexes(list.clear)
+    sort = _drop_indexes(list.sort)
+    reverse = _drop_indexes(list.reverse)
+    __setitem__ = _drop_indexes(list.__setitem__)
+    __delitem__ = _drop_indexes(list.__delitem__)
+    __iadd__ = _drop_indexes(list.__iadd__)
+    __imul__ = _drop_indexes(list.__imul__)
+    del _drop_indexes
+
+
+def _competition_date(competition) -> Optional[datetime]:
+    if isinstance(competition, Competition):
+        return competition.parsed_date
+    return parse_competition_date(competition['date'])  # A plain dict
+
+
+def _folded_name(record) -> str:
+    return record['name'].casefold()
+
+
+def _has_places(competition) -> bool:
     try:
-        with open(file_path, 'r') as c:
-            list_of_clubs = json.load(c)['clubs']
-            return list_of_clubs
-    except (FileNotFoundError, json.decoder.JSONDecodeError) as e:
-        print(f"Error loading {file_path}: {e}")
-        return []  # Return an empty list in case of error.
+        return int(competition['numberOfPlaces']) > 0
+    except (KeyError, TypeError, ValueError):
+        return False
 
 
-def load_competitions():
-    env = os.getenv('FLASK_ENV', 'production')
-    file_path = 'data/production/competitions.json' if env == 'production' \
-        else 'data/test/competitions_test.json'
+CLUB_INDEX_FIELDS = {'email': normalize_email, 'name': _same_value}
+COMPETITION_INDEX_FIELDS = {'name': _same_value}
+COMPETITION_SORTED_FIELDS = {'date': _competition_date, 'name': _folded_name}
+COMPETITION_FILTERS = {'available': ('date', _has_places)}
+
+
+class RecordKind:
+    # What the records of one data file are: the key holding them in the file, the model they are loaded into and
+    # the fields they are indexed by.
+    def __init__(self, key: str, from_dicts, index_fields: dict, sorted_fields: Optional[dict] = None,
+                 filters: Optional[dict] = None):
+        self.key = key
+        self.from_dicts = from_dicts
+        self.index_fields = index_fields
+        self.sorted_fields = sorted_fields
+        self.filters = filters
+
+    def records(self, records) -> IndexedRecords:
+        # Returns the records as indexed models. Records that already are, such as the ones just loaded, are kept.
+        if not (isinstance(records, IndexedRecords) and records._index_fields is self.index_fields
+                and all(isinstance(record, Record) for record in records)):
+            records = IndexedRecords(self.from_dicts(records), self.index_fields, self.sorted_fields, self.filters)
+        records.reindex()
+        return records
+
+
+CLUBS = RecordKind('clubs', clubs_from_dicts, CLUB_INDEX_FIELDS)
+COMPETITIONS = RecordKind('competitions', competitions_from_dicts, COMPETITION_INDEX_FIELDS,
+                          COMPETITION_SORTED_FIELDS, COMPETITION_FILTERS)
+
+_cache = RecordsCache()
+
+# Digest and resulting file signature of the last content written to each file by this process.
+_last_writes = {}
+_last_writes_lock = threading.Lock()
+
+
+def _file_signature(file_path: str) -> Optional[tuple]:
+    # Returns what identifies the current version of a file on disk, or None if the file cannot be found.
+    try:
+        file_stat = os.stat(file_path)
+    except OSError:
+        return None
+    return file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino
+
+
+def _load_records(file_path: str, kind: RecordKind):
+    # The signature is taken before reading: if the file changes in between, the next call simply reloads it again.
+    signature = _file_signature(file_path)
+    if signature is not None:
+        records = _cache.get(file_path, signature)
+        if records is not None:
+            return records
+
     try:
         with open(file_path, 'r') as c:
-            list_of_competitions = json.load(c)['competitions']
-            return list_of_competitions
-    except (FileNotFoundError, json.decoder.JSONDecodeError) as e:
+            records = kind.records(json.load(c)[kind.key])
+    except (FileNotFoundError, json.decoder.JSONDecodeError, KeyError, TypeError) as e:
         print(f"Error loading {file_path}: {e}")
         return []  # Return an empty list in case of error.
 
+    if signature is not None:
+        _cache.put(file_path, signature, records)
+    return records
 
-def save_clubs(clubs_list) -> bool:
-    env = os.getenv('FLASK_ENV', 'production')
-    file_path = 'data/production/clubs.json' if env == 'production' \
-        else 'data/test/clubs_test.json'
 
+def _file_size(file_path: str) -> int:
     try:
-        with open(file_path, 'w') as c:
-            json.dump({"clubs": clubs_list}, c, indent=4)
-            return True  # Returns True if writing was successful
-    except IOError as e:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+
+def _fsync_directory(directory: str):
+    # Makes the rename itself durable. Some platforms cannot open a directory, the write is still atomic there.
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_file_atomically(file_path: str, content: str):
+    # Writes the content to a temporary file in the same directory, flushes it to disk and renames it over the
+    # original. Readers and a crash at any point see either the old or the new file, never a truncated one.
+    directory = os.path.dirname(file_path) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(file_path)}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as tmp:
+            tmp.write(content)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        try:
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(file_path).st_mode))  # mkstemp creates the file as 0600
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(directory)
+
+
+def _records_content(kind: RecordKind, records, compact: bool) -> tuple:
+    # Returns the records as indexed models and the content of their data file.
+    records = kind.records(records)
+    data = {kind.key: to_dicts(records)}
+    return records, json.dumps(data, separators=(',', ':')) if compact else json.dumps(data, indent=4)
+
+
+def _save_records(file_path: str, kind: RecordKind, records, compact: bool, skip_unchanged: bool) -> bool:
+    try:
+        # Records given as dicts are checked and turned into models first, numbers are written as numbers.
+        records = kind.records(records)
+        data = {kind.key: to_dicts(records)}
+        # The compact form is produced by the C encoder, several times faster than the indented one, so it is the
+        # one used to detect changes; the indented form is only built once a write is needed.
+        if compact or skip_unchanged:
+            content = json.dumps(data, separators=(',', ':'))
+        digest = None
+        if skip_unchanged:
+            digest = hashlib.blake2b(content.encode(), digest_size=16).digest()
+            # Nothing to do if this exact data is what this process last wrote and the file was not touched since.
+            with _last_writes_lock:
+                last_write = _last_writes.get(file_path)
+            if last_write == (digest, _file_signature(file_path)):
+                return True
+
+        if not compact:
+            content = json.dumps(data, indent=4)
+    except (KeyError, TypeError, ValueError) as e:
         print(f"Error saving to {file_path}: {e}")
-        return False  # Returns False if an error occurs
+        _cache.invalidate(file_path)
+        with _last_writes_lock:
+            _last_writes.pop(file_path, None)
+        return False
+    return _write_records(file_path, records, content, digest)
 
 
-def save_competitions(competitions_list) -> bool:
-    env = os.getenv('FLASK_ENV', 'production')
-    file_path = 'data/production/competitions.json' if env == 'production' \
-        else 'data/test/competitions_test.json'
+def _write_records(file_path: str, records, content: str, digest: Optional[bytes] = None,
+                   keep_cached: bool = False) -> bool:
+    # Writes the content of the records to their file. keep_cached keeps the records in memory when the write fails,
+    # for records holding changes that must be written later rather than dropped.
     try:
-        with open(file_path, 'w') as c:
-            json.dump({"competitions": competitions_list}, c, indent=4)
-            return True  # Returns True if writing was successful
+        write_file_atomically(file_path, content)
     except IOError as e:
         print(f"Error saving to {file_path}: {e}")
+        # The cached records may hold changes that never reached the disk.
+        if not keep_cached:
+            _cache.invalidate(file_path)
+        with _last_writes_lock:
+            _last_writes.pop(file_path, None)
         return False  # Returns False if an error occurs
+
+    # What was just written is exactly what a reload would return, so keep it instead of parsing the file again.
+    signature = _file_signature(file_path)
+    with _last_writes_lock:
+        if digest is None:
+            _last_writes.pop(file_path, None)
+        else:
+            _last_writes[file_path] = (digest, signature)
+    if signature is not None:
+        _cache.put(file_path, signature, records)
+    return True  # Returns True if writing was successful
+
+
+def _find(records, field: str, value, normalize):
+    if isinstance(records, IndexedRecords):
+        return records.lookup(field, value)
+    # Plain lists (built by hand or in tests) have no index and are scanned.
+    value = normalize(value)
+    return next((r for r in records if r.get(field) is not None and normalize(r[field]) == value), None)
+
+
+def find_club_by_email(clubs, email: str):
+    return _find(clubs, 'email', email, normalize_email)
+
+
+def find_club_by_name(clubs, name: str):
+    return _find(clubs, 'name', name, _same_value)
+
+
+def find_competition_by_name(competitions, name: str):
+    return _find(competitions, 'name', name, _same_value)
+
+
+def competition_date(competitions, competition) -> Optional[datetime]:
+    # The date of a competition as a datetime, parsed when the competitions were loaded, or None if it is invalid.
+    if isinstance(competitions, IndexedRecords) and 'date' in competitions._sorted_fields:
+        return competitions.converted('date', competition)
+    return _competition_date(competition)
+
+
+def competitions_between(competitions, start: Optional[datetime] = None, end: Optional[datetime] = None) -> list:
+    # Returns the competitions taking place from start (included) to end (excluded), by date. Competitions with an
+    # invalid date are left out.
+    if isinstance(competitions, IndexedRecords) and 'date' in competitions._sorted_fields:
+        return competitions.between('date', start, end)
+    # Plain lists (built by hand or in tests) have no index and are scanned.
+    dated = [(competition_date(competitions, c), c) for c in competitions]
+    return [c for date, c in sorted((d for d in dated if d[0] is not None), key=lambda d: d[0])
+            if (start is None or date >= start) and (end is None or date < end)]
+
+
+def competitions_page(competitions, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                      available_only: bool = False, name_prefix: Optional[str] = None, cursor: int = 0,
+                      page_size: int = 20) -> Tuple[list, Optional[int]]:
+    # Returns a page of the competitions taking place from start to end, by date, and the cursor of the next page, or
+    # None if it is the last one. The cursor is a position in the date index, so pages stay the same when
+    # competitions are booked. The date range and the name prefix (case-insensitive) are found with bisect in the
+    # date and name indexes, and the competitions with places in the index of those (see COMPETITION_FILTERS). A page
+    # costs the competitions it shows, plus, with a name prefix, the fewest of the competitions having the prefix and
+    # those walked by date to find a page of them.
+    if not (isinstance(competitions, IndexedRecords) and 'date' in competitions._sorted_fields
+            and 'name' in competitions._sorted_fields and 'available' in competitions._filters):
+        competitions = IndexedRecords(competitions, sorted_fields=COMPETITION_SORTED_FIELDS,
+                                      filters=COMPETITION_FILTERS)
+    low, high = competitions.bounds('date', start, end)
+    low = max(low, cursor)
+    by_date = competitions.matching('available', low, high) if available_only else range(low, high)
+
+    def matches(competition) -> bool:
+        return not available_only or _has_places(competition)
+
+    if name_prefix:
+        prefix = name_prefix.casefold()
+        first, last = competitions.bounds('name', prefix, prefix + '\U0010ffff')
+        if (page_size + 1) * (high - low) <= (last - first) ** 2:
+            # Many competitions have the prefix: walking the dates finds a page after a few of them.
+            positions = (position for position in by_date
+                         if _folded_name(competitions.at('date', position)).startswith(prefix))
+        else:
+            # Few have it: only the first page_size + 1 of them by date are needed.
+            found = (competitions.position('date', competitions.at('name', index)) for index in range(first, last))
+            positions = heapq.nsmallest(page_size + 1, (position for position in found
+                                                        if position is not None and low <= position < high
+                                                        and matches(competitions.at('date', position))))
+    else:
+        positions = by_date
+
+    page = []
+    for position in positions:
+        competition = competitions.at('date', position)
+        if len(page) == page_size:
+            # Another competition matches: the next page starts with it.
+            return page, position
+        page.append(competition)
+    return page, None
+
+
+def _points_order(club):
+    # Most points first, then by name. Clubs with invalid points come last.
+    try:
+        points = int(club['points'])
+    except (KeyError, TypeError, ValueError):
+        points = float('-inf')
+    return -points, club['name'].casefold()
+
+
+CLUB_ORDERS = {'name': lambda club: club['name'].casefold(), 'points': _points_order}
+
+
+def clubs_page(clubs, sort_by: Optional[str] = None, page: int = 1,
+               page_size: Optional[int] = None) -> Tuple[list, bool]:
+    # Returns a page of the clubs, sorted by name or by points (see CLUB_ORDERS) or in the order of the list, and
+    # whether there is a next page. Without page_size every club is returned. Only the clubs up to the requested
+    # page are sorted, with a heap, so the first pages of a large federation stay cheap.
+    order = CLUB_ORDERS.get(sort_by)
+    if page_size is None:
+        return (sorted(clubs, key=order) if order else clubs), False
+    start = (max(page, 1) - 1) * page_size
+    end = start + page_size
+    if order:
+        first_clubs = heapq.nsmallest(end + 1, clubs, key=order)
+    else:
+        first_clubs = clubs[:end + 1]
+    return first_clubs[start:end], len(first_clubs) > end
+
+
+def _can_book(club, competition, places: int) -> bool:
+    # Last check of a booking, made while the records cannot change anymore. Invalid numbers were loaded as None.
+    return (0 < places <= purchase_limit(club, competition)
+            and club.points is not None and club.points >= places
+            and competition.number_of_places is not None and competition.number_of_places >= places)
+
+
+def _book(club: Club, competition: Competition, places: int):
+    competition.bookings[club.name] = competition.bookings.get(club.name, 0) + places
+    club.points -= places
+    competition.number_of_places -= places
+
+
+def _book_all(clubs, competitions, club_name: str, bookings) -> Optional[list]:
+    # Makes every booking, a list of (competition name, places), or none of them. Returns what _restore() needs to
+    # undo them, or None if one of them was not possible.
+    club = find_club_by_name(clubs, club_name)
+    if club is None:
+        return None
+    made = []
+    for competition_name, places in bookings:
+        competition = find_competition_by_name(competitions, competition_name)
+        if competition is None or not _can_book(club, competition, places):
+            _restore(made)
+            return None
+        _book(club, competition, places)
+        made.append((club, competition, places))
+    return made
+
+
+def _restore(made: list):
+    # Gives back the places and points the bookings took, rather than setting the values they replaced: bookings of
+    # the same club or competition made since then, and not written yet, are kept.
+    for club, competition, places in reversed(made):
+        club.points += places
+        competition.number_of_places += places
+        booked = competition.bookings.get(club.name, 0) - places
+        if booked > 0:
+            competition.bookings[club.name] = booked
+        else:
+            competition.bookings.pop(club.name, None)
+    if made:
+        _matching_again()  # The competitions may have places again
+
+
+class StorageBackend:
+    # What the application needs from the place where clubs and competitions are stored. Lookups have a default
+    # implementation on top of the loaded records; a backend can answer them more directly.
+    #
+    # lock_path is the file locked while a booking runs, so that worker processes sharing the same data do not
+    # interleave their bookings. It is None for backends that do not need it.
+    lock_path = None
+    persister = None
+    _write_behind_fd = None
+
+    def __init__(self):
+        _backends.add(self)
+        self._version_lock = threading.Lock()
+        self._version = 0
+        self._modified = time.time()
+        # Versions are only compared within a scope: a version of one process means nothing to another one.
+        self.version_scope = uuid.uuid4().hex[:16]
+
+    def _changed(self, modified: Optional[float] = None):
+        with self._version_lock:
+            self._version += 1
+            self._modified = time.time() if modified is None else modified
+        _notify_change()
+
+    def data_version(self) -> Optional[tuple]:
+        # Returns the scope of the version, a version of the clubs and competitions changed by every change, and the
+        # time of the last change, or None if it cannot be known. Does not load any data. Backends storing their data
+        # in files or a database give the same version in every process using it.
+        with self._version_lock:
+            return self.version_scope, self._version, self._modified
+
+    def after_fork(self):
+        # Called in a process forked from the one that created the backend (gunicorn --preload). The records loaded
+        # are kept, shared with the parent until they change, but versions are now counted by the child alone.
+        self.version_scope = uuid.uuid4().hex[:16]
+        self._end_write_behind()
+
+    def after_fork_in_parent(self):
+        # Called in the process that forked another one.
+        self._end_write_behind()
+
+    def _files_version(self, signature, modified: float) -> tuple:
+        # data_version() of the backends storing files: it is named after the signature of the files, so every worker
+        # process reading them gives the same version, and the pages the same ETags. Bookings kept in memory by
+        # write-behind (a single process) change it before they are written.
+        with self._version_lock:
+            if signature != self._signatures:
+                self._signatures = signature
+                self._files_modified = modified
+                self._files_scope = hashlib.blake2b(repr(signature).encode(), digest_size=8).hexdigest()
+            if isinstance(self.persister, WriteBehindPersister):
+                return self._files_scope, self._version, max(self._files_modified, self._modified)
+            return self._files_scope, 0, self._files_modified
+
+    def load_clubs(self):
+        raise NotImplementedError
+
+    def load_competitions(self):
+        raise NotImplementedError
+
+    def save_clubs(self, clubs_list, compact: Optional[bool] = None, skip_unchanged: bool = False) -> bool:
+        raise NotImplementedError
+
+    def save_competitions(self, competitions_list, compact: Optional[bool] = None,
+                          skip_unchanged: bool = False) -> bool:
+        raise NotImplementedError
+
+    def apply_bookings(self, club_name: str, bookings) -> bool:
+        # Takes the places from the competitions and the points from the club and records the bookings, given as a
+        # list of (competition name, places), all or nothing. Returns False, with nothing changed, if one of the
+        # bookings is not possible anymore or if they cannot be saved.
+        raise NotImplementedError
+
+    def apply_booking(self, competition_name: str, club_name: str, places: int) -> bool:
+        return self.apply_bookings(club_name, [(competition_name, places)])
+
+    def enable_group_commit(self, window: float):
+        # Bookings made by concurrent threads within window seconds are saved by a single write (see
+        # persistence.GroupCommitter). Only used by the backends writing files. The write also waits for the requests
+        # waiting for the lock of a competition or club, which are about to book.
+        self.persister = GroupCommitter(self._write_bookings, data_lock, window, bookings_waiting)
+
+    def enable_write_behind(self, durability: str = 'enqueue', max_pending: int = 1000) -> bool:
+        # Bookings are saved by a background thread (see persistence.WriteBehindPersister). Since the bookings not
+        # written yet only exist in the memory of this process, it must be the only one using the data: it keeps a
+        # lock on a file next to the data, and a process that cannot take it writes its bookings synchronously.
+        # Forking the process also ends write-behind, in the parent and in the child (see after_fork()).
+        if self.lock_path is not None and fcntl is not None:
+            fd = os.open(self.lock_path + '.write-behind', os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                print("Another process writes the bookings behind: bookings are written synchronously")
+                return False
+            self._write_behind_fd = fd
+        self.persister = WriteBehindPersister(self._write_bookings, self._snapshot_bookings, data_lock, durability,
+                                              max_pending)
+        return True
+
+    def close(self):
+        # Saves the bookings still waiting to be written.
+        persister, self.persister = self.persister, None
+        if persister is not None:
+            persister.close()
+        if self._write_behind_fd is not None:
+            os.close(self._write_behind_fd)
+            self._write_behind_fd = None
+
+    def _end_write_behind(self):
+        # Called on fork: the parent and the child would both keep bookings in memory and write them over each other.
+        if isinstance(self.persister, WriteBehindPersister):
+            self.close()
+            print("Write-behind is for a single process: bookings are now written synchronously")
+
+    def _commit_bookings(self, book, club_name: str, bookings) -> bool:
+        # book() makes the bookings in memory and returns what _write_bookings() needs to save or undo them, or None
+        # if they are not possible. It runs under the data lock, and so does the write.
+        persister = self.persister
+        if persister is None:
+            with data_lock():
+                change = book()
+                if change is None or not self._write_bookings([change]):
+                    return False
+            _notify_booking(club_name, bookings)
+            return True
+
+        persister.begin()
+        ticket = None
+        try:
+            with data_lock():
+                change = book()
+                if change is not None:
+                    ticket = persister.submit(change)
+        finally:
+            if ticket is None:
+                persister.abandon()
+        # The bookings are made: holds on their places end now, before other bookings of the competition are checked,
+        # even though the write may still fail.
+        if ticket is not None:
+            _notify_booking(club_name, bookings)
+        # The next booking of the same competition or club can be made while this one is written, and join its batch.
+        release_booking_locks()
+        if ticket is None or not persister.wait(ticket):
+            return False
+        # The bookings may not be written yet, the pages showing the records must change now.
+        self._changed()
+        return True
+
+    def _write_bookings(self, changes: list) -> bool:
+        # Saves the records changed by the bookings, or puts them back as they were and returns False.
+        raise NotImplementedError
+
+    def _snapshot_bookings(self, changes: list):
+        # Serializes the records changed by the bookings, and returns the function writing them to disk.
+        raise NotImplementedError
+
+    def _snapshot_writer(self, files: list):
+        # Returns the function writing the serialized records, files being a list of (path, records, content). Called
+        # under the data lock: until the write is done, the records loaded are the ones in memory, which may already
+        # hold bookings made after the snapshot, rather than the files being replaced.
+        for path, _, _ in files:
+            _cache.pin(path)
+        return lambda: self._write_snapshot(files)
+
+    def _write_snapshot(self, files: list) -> bool:
+        # The records are kept in memory if the write fails.
+        try:
+            return all(_write_records(path, records, content, keep_cached=True) for path, records, content in files)
+        finally:
+            for path, _, _ in files:
+                _cache.unpin(path)
+
+    def invalidate(self):
+        # Drops whatever the backend keeps in memory.
+        self._changed()
+
+    def file_sizes(self) -> dict:
+        # Returns the size in bytes of the files holding the data, by name.
+        return {}
+
+    def get_club_by_email(self, email: str):
+        return find_club_by_email(self.load_clubs(), email)
+
+    def get_club_by_name(self, name: str):
+        return find_club_by_name(self.load_clubs(), name)
+
+    def get_competition_by_name(self, name: str):
+        return find_competition_by_name(self.load_competitions(), name)
+
+    def list_competitions(self):
+        return self.load_competitions()
+
+    def upcoming_competitions(self, current_date: Optional[datetime] = None) -> list:
+        # Competitions that have not started yet, by date.
+        return competitions_between(self.load_competitions(), current_date or datetime.now())
+
+
+class InMemoryBackend(StorageBackend):
+    # Keeps the records in memory only. Used by the tests, and to run the application without touching any file.
+    def __init__(self, clubs=(), competitions=()):
+        super().__init__()
+        self.save_clubs(list(clubs))
+        self.save_competitions(list(competitions))
+
+    def load_clubs(self):
+        return self._clubs
+
+    def load_competitions(self):
+        return self._competitions
+
+    def save_clubs(self, clubs_list, compact: Optional[bool] = None, skip_unchanged: bool = False) -> bool:
+        self._clubs = CLUBS.records(clubs_list)
+        self._changed()
+        return True
+
+    def save_competitions(self, competitions_list, compact: Optional[bool] = None,
+                          skip_unchanged: bool = False) -> bool:
+        self._competitions = COMPETITIONS.records(competitions_list)
+        self._changed()
+        return True
+
+    def apply_bookings(self, club_name: str, bookings) -> bool:
+        with data_lock():
+            if _book_all(self._clubs, self._competitions, club_name, bookings) is None:
+                return False
+            self._changed()
+        _notify_booking(club_name, bookings)
+        return True
+
+
+class JSONFileBackend(StorageBackend):
+    # Stores clubs and competitions in two JSON files, kept parsed in memory until they change on disk.
+    def __init__(self, clubs_path: str, competitions_path: str, compact: bool = False):
+        super().__init__()
+        self._signatures = None
+        self.clubs_path = clubs_path
+        self.competitions_path = competitions_path
+        self.compact = compact
+        self.lock_path = os.path.join(os.path.dirname(clubs_path) or '.', '.data.lock')
+
+    def load_clubs(self):
+        return _load_records(self.clubs_path, CLUBS)
+
+    def load_competitions(self):
+        return _load_records(self.competitions_path, COMPETITIONS)
+
+    def save_clubs(self, clubs_list, compact: Optional[bool] = None, skip_unchanged: bool = False) -> bool:
+        # compact drops the indentation, which makes the file smaller and several times faster to write.
+        # skip_unchanged avoids rewriting the file when its content would stay the same, at the cost of an extra
+        # serialization when it does change.
+        compact = self.compact if compact is None else compact
+        if not _save_records(self.clubs_path, CLUBS, clubs_list, compact, skip_unchanged):
+            return False
+        self._changed()
+        return True
+
+    def save_competitions(self, competitions_list, compact: Optional[bool] = None,
+                          skip_unchanged: bool = False) -> bool:
+        compact = self.compact if compact is None else compact
+        if not _save_records(self.competitions_path, COMPETITIONS, competitions_list, compact, skip_unchanged):
+            return False
+        self._changed()
+        return True
+
+    def apply_bookings(self, club_name: str, bookings) -> bool:
+        return self._commit_bookings(lambda: _book_all(self.load_clubs(), self.load_competitions(), club_name,
+                                                       bookings), club_name, bookings)
+
+    def _write_bookings(self, changes: list) -> bool:
+        clubs = self.load_clubs()
+        competitions = self.load_competitions()
+        if self.save_clubs(clubs) and self.save_competitions(competitions):
+            return True
+
+        # Put everything back, including the points on disk if only the competitions could not be saved.
+        for made in reversed(changes):
+            _restore(made)
+        self.save_clubs(clubs)
+        return False
+
+    def _snapshot_bookings(self, changes: list):
+        files = [(self.clubs_path, *_records_content(CLUBS, self.load_clubs(), self.compact)),
+                 (self.competitions_path, *_records_content(COMPETITIONS, self.load_competitions(), self.compact))]
+        return self._snapshot_writer(files)
+
+    def data_version(self) -> Optional[tuple]:
+        # The files are written by replacing them, so any write, by this process or another one, changes their
+        # signature (modification time, size and inode).
+        signatures = (_file_signature(self.clubs_path), _file_signature(self.competitions_path))
+        return self._files_version(signatures, max((signature[0] / 1e9 for signature in signatures
+                                                    if signature is not None), default=time.time()))
+
+    def invalidate(self):
+        _cache.invalidate(self.clubs_path)
+        _cache.invalidate(self.competitions_path)
+        with self._version_lock:
+            self._signatures = None
+
+    def file_sizes(self) -> dict:
+        return {"clubs": _file_size(self.clubs_path), "competitions": _file_size(self.competitions_path)}
+
+
+class SQLiteBackend(StorageBackend):
+    # Stores clubs, competitions and bookings in a SQLite database (see sqlite_storage). Each thread has its own
+    # connection. The records loaded are shared by the threads and kept with the version of the data they hold: when
+    # the data changes, by this process or another one, only the rows changed since are read again and copied into
+    # them. Looking up a single club or competition is an indexed query that loads nothing else.
+    def __init__(self, db_path: str):
+        super().__init__()
+        self.db_path = db_path
+        self._local = threading.local()
+        self._records = {}
+        self._records_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = sqlite_storage.connect(self.db_path)
+        return connection
+
+    def _load(self, kind: RecordKind, load, table: str):
+        try:
+            connection = self._connection()
+            version = sqlite_storage.data_version(connection)[1]
+            cached = self._records.get(kind)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            with self._records_lock, sqlite_storage.snapshot(connection):
+                version = sqlite_storage.data_version(connection)[1]
+                cached = self._records.get(kind)
+                if cached is None:
+                    records = kind.records(load(connection))
+                elif cached[0] == version:
+                    return cached[1]
+                else:
+                    records = self._update(kind, cached[1], load(connection, cached[0]),
+                                           sqlite_storage.count(connection, table))
+                    if records is None:
+                        records = kind.records(load(connection))
+                self._records[kind] = (version, records)
+                return records
+        except sqlite3.Error as e:
+            print(f"Error loading {self.db_path}: {e}")
+            return []  # Return an empty list in case of error.
+
+    @staticmethod
+    def _update(kind: RecordKind, records: IndexedRecords, changes: list, total: int) -> IndexedRecords:
+        # Copies the rows changed into the records loaded, and adds the new ones. Records whose indexed or sorted
+        # fields changed are indexed again. Rows were removed if the count does not match: everything is read again.
+        changed = False
+        for record in kind.from_dicts(changes):
+            loaded = records.lookup('name', record.name)
+            if loaded is None:
+                records.append(record)
+                continue
+            for field in list(kind.index_fields) + list(kind.sorted_fields or ()):
+                changed = changed or loaded[field] != record[field]
+            again = any(matches(record) and not matches(loaded) for _, matches in (kind.filters or {}).values())
+            for attribute in type(record).__slots__:
+                setattr(loaded, attribute, getattr(record, attribute))
+            if again:
+                _matching_again()
+        if len(records) != total:
+            return None
+        if changed:
+            records.reindex()
+        return records
+
+    def after_fork(self):
+        # A SQLite connection must not be used across a fork: every thread of the child opens its own. The records
+        # loaded are kept, with the version they hold.
+        super().after_fork()
+        self._local = threading.local()
+        self._records_lock = threading.Lock()
+
+    def load_clubs(self):
+        return self._load(CLUBS, sqlite_storage.load_clubs, 'clubs')
+
+    def load_competitions(self):
+        return self._load(COMPETITIONS, sqlite_storage.load_competitions, 'competitions')
+
+    def _find(self, kind: RecordKind, find, *args):
+        try:
+            found = find(self._connection(), *args)
+        except sqlite3.Error as e:
+            print(f"Error reading {self.db_path}: {e}")
+            return None
+        return None if found is None else kind.from_dicts([found])[0]
+
+    def get_club_by_email(self, email: str):
+        # The index compares emails without ASCII case; the match is checked the way find_club_by_email() does.
+        club = self._find(CLUBS, sqlite_storage.find_club, 'email', email.strip())
+        return club if club is not None and normalize_email(club.email) == normalize_email(email) else None
+
+    def get_club_by_name(self, name: str):
+        return self._find(CLUBS, sqlite_storage.find_club, 'name', name)
+
+    def get_competition_by_name(self, name: str):
+        return self._find(COMPETITIONS, sqlite_storage.find_competition, name)
+
+    def save_clubs(self, clubs_list, compact: Optional[bool] = None, skip_unchanged: bool = False) -> bool:
+        # The database only rewrites the rows that changed, compact and skip_unchanged do not apply.
+        connection = self._connection()
+        return self._changed_if(sqlite_storage.save_clubs(connection, clubs_list))
+
+    def save_competitions(self, competitions_list, compact: Optional[bool] = None,
+                          skip_unchanged: bool = False) -> bool:
+        connection = self._connection()
+        return self._changed_if(sqlite_storage.save_competitions(connection, competitions_list))
+
+    def apply_bookings(self, club_name: str, bookings) -> bool:
+        # A single transaction whose guarded UPDATEs do the same checks as _can_book().
+        connection = self._connection()
+        if not self._changed_if(sqlite_storage.book_places_batch(connection, club_name, bookings)):
+            return False
+        _notify_booking(club_name, bookings)
+        return True
+
+    def _changed_if(self, success: bool) -> bool:
+        # The version itself is kept in the database; this only tells the listeners of on_data_change().
+        if success:
+            _notify_change()
+        return success
+
+    def data_version(self) -> Optional[tuple]:
+        # The version is kept in the database, and shared by every process using it.
+        try:
+            return sqlite_storage.data_version(self._connection())
+        except sqlite3.Error as e:
+            print(f"Error reading the version of {self.db_path}: {e}")
+            return None
+
+    def invalidate(self):
+        with self._records_lock:
+            self._records = {}
+
+    def file_sizes(self) -> dict:
+        return {"database": _file_size(self.db_path)}
+
+
+class ShardedJSONBackend(StorageBackend):
+    # Stores each competition with its bookings in its own JSON file, and the clubs in buckets of JSON files by a
+    # hash of their name (see sharded_storage). A booking only rewrites the bucket of its club and the files of its
+    # competitions, and a lookup by club or competition name only reads the one file that can hold it. Every file is
+    # kept parsed in memory until it changes on disk, like the two data files of JSONFileBackend.
+    #
+    # Every write, by any process, ends by replacing the token of the version file: as long as it stays the same, the
+    # lists of all clubs and competitions are served without checking each file.
+    def __init__(self, directory: str, buckets: int = sharded_storage.DEFAULT_BUCKETS, compact: bool = False):
+        super().__init__()
+        self.directory = directory
+        self.buckets = buckets  # Only used to create a new directory, an existing one keeps its number of buckets
+        self.compact = compact
+        self.lock_path = os.path.join(directory, '.data.lock')
+        self._signatures = None
+        self._manifest = (None, None)
+        self._combined = {}
+        self._combined_lock = threading.Lock()
+
+    def _signature(self) -> tuple:
+        # What identifies the current version of the whole directory, and the time it was written. Reading the token
+        # costs about as much as a stat. A directory written before version files existed has none until its next
+        # write, and is identified by the signatures of all its files meanwhile.
+        try:
+            with open(sharded_storage.version_path(self.directory)) as v:
+                return v.read(), os.fstat(v.fileno()).st_mtime_ns / 1e9
+        except OSError:
+            pass
+        manifest = self._read_manifest()
+        signatures = (_file_signature(sharded_storage.manifest_path(self.directory)),)
+        signatures += tuple(_file_signature(sharded_storage.bucket_path(self.directory, bucket))
+                            for bucket in range(manifest['buckets']))
+        signatures += tuple(_file_signature(sharded_storage.competition_path(self.directory, name))
+                            for name in manifest['competitions'])
+        return signatures, max((signature[0] / 1e9 for signature in signatures if signature is not None),
+                               default=time.time())
+
+    def _write_version(self, in_place: bool = False) -> bool:
+        # Called after every write, once the files are in place. in_place tells that the records written are those
+        # of the combined lists, changed in place by bookings: if no other process wrote since the lists were
+        # combined, they are still up to date under the new token, and are kept without checking every file again.
+        previous = self._signature() if in_place else None
+        try:
+            write_file_atomically(sharded_storage.version_path(self.directory), uuid.uuid4().hex)
+        except IOError as e:
+            print(f"Error saving to {sharded_storage.version_path(self.directory)}: {e}")
+            return False
+        if in_place:
+            signature = self._signature()
+            with self._combined_lock:
+                for kind, cached in list(self._combined.items()):
+                    if cached[0] == previous:
+                        self._combined[kind] = (signature,) + cached[1:]
+        return True
+
+    def _read_manifest(self) -> dict:
+        signature = _file_signature(sharded_storage.manifest_path(self.directory))
+        cached_signature, manifest = self._manifest
+        if manifest is None or signature is None or signature != cached_signature:
+            manifest = sharded_storage.read_manifest(self.directory) or sharded_storage.new_manifest(self.buckets)
+            manifest['competition_names'] = set(manifest['competitions'])
+            self._manifest = (signature, manifest)
+        return manifest
+
+    def _write_manifest(self, manifest: dict, **changes) -> bool:
+        manifest = {key: changes.get(key, manifest[key]) for key in ('buckets', 'clubs', 'competitions')}
+        try:
+            write_file_atomically(sharded_storage.manifest_path(self.directory),
+                                  sharded_storage.manifest_content(manifest))
+        except IOError as e:
+            print(f"Error saving to {sharded_storage.manifest_path(self.directory)}: {e}")
+            return False
+        manifest['competition_names'] = set(manifest['competitions'])
+        self._manifest = (_file_signature(sharded_storage.manifest_path(self.directory)), manifest)
+        return True
+
+    def _bucket_path(self, club_name: str) -> str:
+        bucket = sharded_storage.club_bucket(club_name, self._read_manifest()['buckets'])
+        return sharded_storage.bucket_path(self.directory, bucket)
+
+    def _bucket(self, club_name: str):
+        return _load_records(self._bucket_path(club_name), CLUBS)
+
+    def _shard(self, competition_name: str):
+        if competition_name not in self._read_manifest()['competition_names']:
+            return []
+        return _load_records(sharded_storage.competition_path(self.directory, competition_name), COMPETITIONS)
+
+    def _combine(self, kind: RecordKind, names: list, load_parts):
+        # Returns every record of the files in the order of the manifest. The combined list is rebuilt only when one
+        # of the files was parsed again; records changed in place by a booking are already in it.
+        signature = self._signature()
+        with self._combined_lock:
+            cached = self._combined.get(kind)
+            if cached is not None and cached[0] == signature:
+                return cached[3]
+        parts = load_parts()
+        with self._combined_lock:
+            cached = self._combined.get(kind)
+            if (cached is not None and cached[1] is names and len(cached[2]) == len(parts)
+                    and all(part is cached_part for part, cached_part in zip(parts, cached[2]))):
+                records = cached[3]
+            else:
+                by_name = {record['name']: record for part in parts for record in part}
+                ordered = [by_name.pop(name) for name in names if name in by_name]
+                ordered.extend(by_name.values())  # Records whose file was written before the manifest
+                records = kind.records(IndexedRecords(ordered, kind.index_fields, kind.sorted_fields, kind.filters))
+            self._combined[kind] = (signature, names, parts, records)
+            return records
+
+    def load_clubs(self):
+        manifest = self._read_manifest()
+        return self._combine(CLUBS, manifest['clubs'],
+                             lambda: [_load_records(sharded_storage.bucket_path(self.directory, bucket), CLUBS)
+                                      for bucket in range(manifest['buckets'])])
+
+    def load_competitions(self):
+        manifest = self._read_manifest()
+        return self._combine(COMPETITIONS, manifest['competitions'],
+                             lambda: [self._shard(name) for name in manifest['competitions']])
+
+    def get_club_by_name(self, name: str):
+        return find_club_by_name(self._bucket(name), name)
+
+    def get_competition_by_name(self, name: str):
+        return find_competition_by_name(self._shard(name), name)
+
+    def save_clubs(self, clubs_list, compact: Optional[bool] = None, skip_unchanged: bool = False) -> bool:
+        # Buckets whose clubs did not change are not rewritten, whatever skip_unchanged says.
+        compact = self.compact if compact is None else compact
+        try:
+            clubs = CLUBS.records(clubs_list)
+            os.makedirs(os.path.join(self.directory, sharded_storage.CLUBS_DIRECTORY), exist_ok=True)
+        except (OSError, KeyError, TypeError) as e:
+            print(f"Error saving clubs to {self.directory}: {e}")
+            return False
+        manifest = self._read_manifest()
+        buckets = [[] for _ in range(manifest['buckets'])]
+        for club in clubs:
+            buckets[sharded_storage.club_bucket(club.name, manifest['buckets'])].append(club)
+        for bucket, bucket_clubs in enumerate(buckets):
+            if not _save_records(sharded_storage.bucket_path(self.directory, bucket), CLUBS, bucket_clubs, compact,
+                                 True):
+                return False
+        names = [club.name for club in clubs]
+        if names != manifest['clubs'] and not self._write_manifest(manifest, clubs=names):
+            return False
+        if not self._write_version():
+            return False
+        self._changed()
+        return True
+
+    def save_competitions(self, competitions_list, compact: Optional[bool] = None,
+                          skip_unchanged: bool = False) -> bool:
+        # Competitions that did not change are not rewritten, and the files of the ones no longer listed are removed.
+        compact = self.compact if compact is None else compact
+        try:
+            competitions = COMPETITIONS.records(competitions_list)
+            os.makedirs(os.path.join(self.directory, sharded_storage.COMPETITIONS_DIRECTORY), exist_ok=True)
+        except (OSError, KeyError, TypeError) as e:
+            print(f"Error saving competitions to {self.directory}: {e}")
+            return False
+        manifest = self._read_manifest()
+        for competition in competitions:
+            if not _save_records(sharded_storage.competition_path(self.directory, competition.name), COMPETITIONS,
+                                 [competition], compact, True):
+                return False
+        names = [competition.name for competition in competitions]
+        if names != manifest['competitions'] and not self._write_manifest(manifest, competitions=names):
+            return False
+        for name in manifest['competition_names'].difference(names):
+            path = sharded_storage.competition_path(self.directory, name)
+            _cache.invalidate(path)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if not self._write_version():
+            return False
+        self._changed()
+        return True
+
+    def apply_bookings(self, club_name: str, bookings) -> bool:
+        def book():
+            files = {self._bucket_path(club_name): (CLUBS, self._bucket(club_name))}
+            for competition_name, _ in bookings:
+                path = sharded_storage.competition_path(self.directory, competition_name)
+                files[path] = (COMPETITIONS, self._shard(competition_name))
+            competitions = [competition for kind, records in files.values() if kind is COMPETITIONS
+                            for competition in records]
+            made = _book_all(files[self._bucket_path(club_name)][1], competitions, club_name, bookings)
+            return None if made is None else (made, files)
+        return self._commit_bookings(book, club_name, bookings)
+
+    def _write_bookings(self, changes: list) -> bool:
+        # Only the files of the clubs and competitions booked are written.
+        files = {path: records for _, change_files in changes for path, records in change_files.items()}
+        if self._save_files(files):
+            self._changed()
+            return True
+
+        # Put everything back, including the files already written.
+        for made, _ in reversed(changes):
+            _restore(made)
+        self._save_files(files)
+        self._changed()
+        return False
+
+    def _save_files(self, files: dict) -> bool:
+        saved = all(_save_records(path, kind, records, self.compact, False) for path, (kind, records) in files.items())
+        # Even a partial write changed files that other processes must read again.
+        return self._write_version(in_place=True) and saved
+
+    def _write_snapshot(self, files: list) -> bool:
+        saved = super()._write_snapshot(files)
+        return self._write_version(in_place=True) and saved
+
+    def _snapshot_bookings(self, changes: list):
+        files = {path: records for _, change_files in changes for path, records in change_files.items()}
+        contents = [(path, *_records_content(kind, records, self.compact)) for path, (kind, records) in files.items()]
+        return self._snapshot_writer(contents)
+
+    def data_version(self) -> Optional[tuple]:
+        # Any write, by this process or another one, replaces the token of the version file.
+        signature = self._signature()
+        return self._files_version(signature[0], signature[1])
+
+    def invalidate(self):
+        _cache.invalidate()
+        with self._combined_lock:
+            self._combined = {}
+        self._manifest = (None, None)
+        with self._version_lock:
+            self._signatures = None
+
+    def file_sizes(self) -> dict:
+        # The clubs and the competitions are each the total of their directory.
+        sizes = {"manifest": _file_size(sharded_storage.manifest_path(self.directory))}
+        for name, subdirectory in (("clubs", sharded_storage.CLUBS_DIRECTORY),
+                                   ("competitions", sharded_storage.COMPETITIONS_DIRECTORY)):
+            try:
+                with os.scandir(os.path.join(self.directory, subdirectory)) as entries:
+                    sizes[name] = sum(entry.stat().st_size for entry in entries if entry.name.endswith('.json'))
+            except OSError:
+                sizes[name] = 0
+        return sizes
+
+
+def create_backend(config) -> StorageBackend:
+    # Builds the backend named by STORAGE_BACKEND in the application configuration.
+    kind = config.get('STORAGE_BACKEND', 'json')
+    if kind in ('json', 'sharded'):
+        if kind == 'json':
+            backend = JSONFileBackend(config['CLUBS_FILE'], config['COMPETITIONS_FILE'],
+                                      config.get('COMPACT_JSON', False))
+        else:
+            backend = ShardedJSONBackend(config['SHARDED_DATA_DIRECTORY'], compact=config.get('COMPACT_JSON', False))
+        if config.get('WRITE_BEHIND'):
+            backend.enable_write_behind(config['WRITE_BEHIND'], config.get('WRITE_BEHIND_MAX_PENDING', 1000))
+        elif config.get('GROUP_COMMIT_WINDOW') is not None:
+            backend.enable_group_commit(config['GROUP_COMMIT_WINDOW'])
+        return backend
+    if kind == 'sqlite':
+        return SQLiteBackend(config['SQLITE_DATABASE'])
+    if kind == 'memory':
+        # Starts from a copy of the data files, and never writes them.
+        files = JSONFileBackend(config['CLUBS_FILE'], config['COMPETITIONS_FILE'])
+        return InMemoryBackend(copy.deepcopy(files.load_clubs()), copy.deepcopy(files.load_competitions()))
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+def migrate_to_numbers(clubs_path: str, competitions_path: str) -> bool:
+    # Rewrites data files holding points and places as strings with numbers instead. Files with a value that is not
+    # a number are left untouched, since it would be written as null.
+    files = JSONFileBackend(clubs_path, competitions_path)
+    clubs = files.load_clubs()
+    competitions = files.load_competitions()
+    if not clubs or not competitions:
+        return False
+    if (any(club.points is None for club in clubs)
+            or any(competition.number_of_places is None for competition in competitions)):
+        print("Fix the invalid numbers before migrating the data files")
+        return False
+    return files.save_clubs(clubs) and files.save_competitions(competitions)
+
+
+def shard_data_files(clubs_path: str, competitions_path: str, directory: str,
+                     buckets: int = sharded_storage.DEFAULT_BUCKETS) -> bool:
+    # Copies the two data files into a directory read by ShardedJSONBackend. The data files are left untouched.
+    files = JSONFileBackend(clubs_path, competitions_path)
+    clubs = files.load_clubs()
+    competitions = files.load_competitions()
+    if not clubs or not competitions:
+        return False
+    sharded = ShardedJSONBackend(directory, buckets)
+    return sharded.save_clubs(clubs) and sharded.save_competitions(competitions)
+
+
+# The backend used outside of an application, and every backend created, told when the process forks.
+_backend = None
+_backend_lock = threading.Lock()
+_backends = weakref.WeakSet()
+_change_listeners = []
+_booking_listeners = []
+
+
+def on_data_change(callback):
+    # Registers a function called, without arguments, after every change made to the data by this process. A method
+    # is only kept as long as its object is.
+    _change_listeners[:] = [reference for reference in _change_listeners if reference() is not None]
+    _change_listeners.append(weakref.WeakMethod(callback) if hasattr(callback, '__self__') else lambda: callback)
+
+
+def _notify_change():
+    for reference in list(_change_listeners):
+        callback = reference()
+        if callback is not None:
+            callback()
+
+
+def on_booking(callback):
+    # Registers a function called with the club name and the bookings, a list of (competition name, places), once
+    # they are made, while the competition and club locks of the booking are still held.
+    _booking_listeners.append(callback)
+
+
+def _notify_booking(club_name: str, bookings):
+    for callback in _booking_listeners:
+        callback(club_name, bookings)
+
+
+def init_app(app, backend: Optional[StorageBackend] = None) -> Optional[StorageBackend]:
+    # Sets the backend used by the functions below while the application runs: the one given, or the one named by its
+    # configuration. Returns the previous one.
+    previous = app.extensions.get('storage')
+    app.extensions['storage'] = backend if backend is not None else create_backend(app.config)
+    return previous
+
+
+def configure_backend(backend: Optional[StorageBackend]) -> Optional[StorageBackend]:
+    # Sets the backend used by the functions below outside of an application (scripts, benchmarks) and returns the
+    # previous one.
+    global _backend
+    with _backend_lock:
+        previous, _backend = _backend, backend
+    return previous
+
+
+def _current_backend() -> Optional[StorageBackend]:
+    if has_app_context():
+        backend = current_app.extensions.get('storage')
+        if backend is not None:
+            return backend
+    return _backend
+
+
+def get_backend() -> StorageBackend:
+    # The backend of the current application. Outside of one, the backend set with configure_backend(), or until then
+    # the JSON files of the configuration named by FLASK_ENV.
+    backend = _current_backend()
+    if backend is not None:
+        return backend
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            config = get_config()
+            _backend = JSONFileBackend(config.CLUBS_FILE, config.COMPETITIONS_FILE)
+        return _backend
+
+
+def _after_fork():
+    for backend in list(_backends):
+        backend.after_fork()
+
+
+def _after_fork_in_parent():
+    for backend in list(_backends):
+        backend.after_fork_in_parent()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork, after_in_parent=_after_fork_in_parent)
+
+
+@STORAGE_SECONDS.time('load_clubs')
+def load_clubs():
+    return get_backend().load_clubs()
+
+
+@STORAGE_SECONDS.time('load_competitions')
+def load_competitions():
+    return get_backend().load_competitions()
+
+
+@STORAGE_SECONDS.time('save_clubs')
+def save_clubs(clubs_list, compact: Optional[bool] = None, skip_unchanged: bool = False) -> bool:
+    return get_backend().save_clubs(clubs_list, compact, skip_unchanged)
+
+
+@STORAGE_SECONDS.time('save_competitions')
+def save_competitions(competitions_list, compact: Optional[bool] = None, skip_unchanged: bool = False) -> bool:
+    return get_backend().save_competitions(competitions_list, compact, skip_unchanged)
+
+
+@STORAGE_SECONDS.time('apply_booking')
+def apply_booking(competition_name: str, club_name: str, places: int) -> bool:
+    return get_backend().apply_booking(competition_name, club_name, places)
+
+
+@STORAGE_SECONDS.time('apply_bookings')
+def apply_bookings(club_name: str, bookings) -> bool:
+    return get_backend().apply_bookings(club_name, bookings)
+
+
+def get_club_by_email(email: str):
+    return get_backend().get_club_by_email(email)
+
+
+def get_club_by_name(name: str):
+    return get_backend().get_club_by_name(name)
+
+
+def get_competition_by_name(name: str):
+    return get_backend().get_competition_by_name(name)
+
+
+def list_competitions():
+    return get_backend().list_competitions()
+
+
+def upcoming_competitions(current_date: Optional[datetime] = None) -> list:
+    return get_backend().upcoming_competitions(current_date)
+
+
+def started_competitions(current_date: datetime) -> int:
+    # Number of competitions that have started by the current date, found with bisect in the date index.
+    competitions = load_competitions()
+    if not (isinstance(competitions, IndexedRecords) and 'date' in competitions._sorted_fields):
+        return len(competitions_between(competitions, None, current_date))
+    return competitions.bounds('date', None, current_date)[1]
+
+
+def data_version() -> Optional[tuple]:
+    return get_backend().data_version()
+
+
+def data_lock_path() -> Optional[str]:
+    # Lock file shared by every process that books places in the same data, if the backend needs one.
+    return get_backend().lock_path
+
+
+def invalidate():
+    # Forces the next load_clubs() / load_competitions() to read the data again, and the next save to write it.
+    backend = _current_backend()
+    if backend is not None and backend.persister is not None:
+        backend.persister.flush()  # Bookings not written yet only exist in the records kept in memory
+    _cache.invalidate()
+    with _last_writes_lock:
+        _last_writes.clear()
+    if backend is not None:
+        backend.invalidate()
+
+
+def persistence_stats() -> Optional[dict]:
+    # Returns the batch sizes and write times of group commit or write-behind, or None if the backend uses neither.
+    persister = get_backend().persister
+    return None if persister is None else persister.stats()
+
+
+def data_file_sizes() -> dict:
+    # Returns the size in bytes of the files holding the data, by name, for the files the backend uses.
+    return get_backend().file_sizes()
+
+
+def cache_stats() -> dict:
+    # Returns the hit and miss counters of the in-memory cache of the JSON files.
+    return _cache.stats()
@@ -0,0 +1,140 @@
+import os
+import sys
+import random
+import argparse
+from datetime import datetime
+from datetime import timedelta
+from typing import Optional
+
+# Generates clubs and competitions for testing at scale, in the schema of the data files (points and places as
+# numbers). The same seed and the same day give the same data:
+#   - points follow a log-normal distribution: most clubs have a dozen points, a few have hundreds;
+#   - a share of the competitions is over, the others are spread over the next 18 months;
+#   - capacities are mostly small, sometimes in the thousands;
+#   - competitions are partly booked, past ones more than upcoming ones, by clubs holding 1 to 12 places each.
+#
+# Usage: python datasets.py <clubs.json> <competitions.json> [--clubs 10000] [--competitions 1000] [--seed 42]
+#                           [--today YYYY-MM-DD] [--past-share 0.3] [--compact]
+
+DEFAULT_SEED = 42
+# Places a club can book in a competition, see utils.purchase_limit().
+PLACES_LIMIT = 12
+
+CLUB_PREFIXES = ("Iron", "Simply", "Golden", "Northern", "Urban", "Mighty", "Steel", "Peak", "Coastal", "Titan",
+                 "Red", "Granite", "Summit", "Phoenix", "Valley")
+CLUB_KINDS = ("Lift", "Temple", "Barbell Club", "Strength", "Lifters", "Gym", "Athletics", "Power House",
+              "Weightlifting", "Crew")
+COMPETITION_SEASONS = ("Spring", "Summer", "Autumn", "Winter", "National", "Regional", "Open", "Masters")
+COMPETITION_EVENTS = ("Festival", "Classic", "Championship", "Challenge", "Cup", "Games", "Sprint", "Trophy")
+# Ranges of numbers of places, and how often a competition falls in each one.
+CAPACITIES = (((5, 30), 6), ((30, 200), 3), ((200, 5000), 1))
+
+
+def generate_clubs(count: int, seed: int = DEFAULT_SEED) -> list:
+    # Clubs with unique names and emails.
+    rng = random.Random(f"clubs-{seed}")
+    clubs = []
+    for i in range(count):
+        name = f"{rng.choice(CLUB_PREFIXES)} {rng.choice(CLUB_KINDS)} {i + 1}"
+        points = min(int(rng.lognormvariate(2.5, 1.0)), 1000)
+        clubs.append({"name": name, "email": f"contact@{name.lower().replace(' ', '-')}.example.com",
+                      "points": points})
+    return clubs
+
+
+def _competition_date(rng: random.Random, today: datetime, past: bool) -> datetime:
+    # A day in the last two years or in the next 18 months, at a round hour or half hour of the day.
+    days = rng.randint(1, 730) if past else rng.randint(1, 540)
+    day = today - timedelta(days=days) if past else today + timedelta(days=days)
+    return day.replace(hour=rng.randint(7, 18), minute=rng.choice((0, 30)), second=0, microsecond=0)
+
+
+def _bookings(rng: random.Random, club_names: list, places: int, filled: float) -> dict:
+    # Places booked by clubs taken at random, for about filled of the places of the competition.
+    target = int(places * filled)
+    bookings = {}
+    booked = 0
+    while booked < target and len(bookings) < len(club_names):
+        club_name = rng.choice(club_names)
+        if club_name in bookings:
+            continue
+        club_places = min(1 + int(rng.expovariate(1 / 3)), PLACES_LIMIT, target - booked)
+        bookings[club_name] = club_places
+        booked += club_places
+    return bookings
+
+
+def generate_competitions(count: int, club_names: list, seed: int = DEFAULT_SEED, today: Optional[datetime] = None,
+                          past_share: float = 0.3) -> list:
+    # Competitions with unique names, booked by the clubs named. numberOfPlaces is what is left after the bookings.
+    rng = random.Random(f"competitions-{seed}")
+    today = (today or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    ranges, weights = zip(*CAPACITIES)
+    competitions = []
+    for i in range(count):
+        past = rng.random() < past_share
+        low, high = rng.choices(ranges, weights)[0]
+        places = rng.randint(low, high)
+        bookings = _bookings(rng, club_names, places, rng.betavariate(3, 2) if past else rng.betavariate(1.2, 3))
+        competitions.append({"name": f"{rng.choice(COMPETITION_SEASONS)} {rng.choice(COMPETITION_EVENTS)} {i + 1}",
+                             "date": _competition_date(rng, today, past).strftime("%Y-%m-%d %H:%M:%S"),
+                             "numberOfPlaces": places - sum(bookings.values()), "bookings": bookings})
+    return competitions
+
+
+def generate_dataset(number_of_clubs: int, number_of_competitions: int, seed: int = DEFAULT_SEED,
+                     today: Optional[datetime] = None, past_share: float = 0.3) -> tuple:
+    # Returns (clubs, competitions).
+    clubs = generate_clubs(number_of_clubs, seed)
+    competitions = generate_competitions(number_of_competitions, [club["name"] for club in clubs], seed, today,
+                                         past_share)
+    return clubs, competitions
+
+
+def make_bookable(clubs: list, competitions: list):
+    # Changes the data so that any booking of a place succeeds for a long time: plenty of points and places, and
+    # one place booked by each club already in the bookings, which keeps the size of the bookings maps.
+    for club in clubs:
+        club["points"] = 10 ** 6
+    for competition in competitions:
+        competition["numberOfPlaces"] = 10 ** 6
+        competition["bookings"] = {club_name: 1 for club_name in competition["bookings"]}
+
+
+def write_dataset(clubs_path: str, competitions_path: str, clubs: list, competitions: list,
+                  compact: bool = False) -> bool:
+    from data_access import JSONFileBackend
+    for path in (clubs_path, competitions_path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    files = JSONFileBackend(clubs_path, competitions_path, compact)
+    return files.save_clubs(clubs) and files.save_competitions(competitions)
+
+
+def main(arguments) -> int:
+    parser = argparse.ArgumentParser(description="Generates clubs and competitions data files.")
+    parser.add_argument('clubs_file')
+    parser.add_argument('competitions_file')
+    parser.add_argument('--clubs', type=int, default=10000, help="number of clubs")
+    parser.add_argument('--competitions', type=int, default=1000, help="number of competitions")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--today', help="day the dates are taken from, YYYY-MM-DD, today by default")
+    parser.add_argument('--past-share', type=float, default=0.3, help="share of the competitions that are over")
+    parser.add_argument('--compact', action='store_true', help="write the files without indentation")
+    options = parser.parse_args(arguments)
+
+    try:
+        today = datetime.strptime(options.today, "%Y-%m-%d") if options.today else None
+    except ValueError:
+        print(f"Invalid day {options.today}, expected YYYY-MM-DD")
+        return 1
+    clubs, competitions = generate_dataset(options.clubs, options.competitions, options.seed, today,
+                                           options.past_share)
+    if not write_dataset(options.clubs_file, options.competitions_file, clubs, competitions, options.compact):
+        return 1
+    print(f"Wrote {len(clubs)} clubs to {options.clubs_file} and {len(competitions)} competitions to "
+          f"{options.competitions_file}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,110 @@
+import threading
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from markupsafe import Markup
+
+from data_access import data_version
+from data_access import on_data_change
+
+# Parts of pages that are the same for every visitor until the data changes (the club points table, the list of
+# competitions of a club) are rendered once and kept here. Keys include the data version, so a write makes the old
+# fragments unreachable; they are also dropped as soon as this process saves, to give the memory back.
+#
+# Each application keeps its own cache (see init_app()); the functions below use the one of the current application,
+# or outside of one a cache of the module.
+
+
+class FragmentCache:
+    # Least recently used fragments are dropped once the rendered HTML kept goes over max_bytes. A fragment larger
+    # than a quarter of that is never kept, so that one huge page cannot flush all the others.
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is None:
+                self.misses += 1
+                return None
+            self._fragments.move_to_end(key)
+            self.hits += 1
+            return fragment
+
+    def put(self, key, fragment: str):
+        size = _size(fragment)
+        if size > self.max_bytes // 4:
+            return
+        with self._lock:
+            previous = self._fragments.pop(key, None)
+            if previous is not None:
+                self._bytes -= _size(previous)
+            self._fragments[key] = fragment
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, dropped = self._fragments.popitem(last=False)
+                self._bytes -= _size(dropped)
+                self.evictions += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._fragments.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "evictions": self.evictions, "entries": len(self._fragments), "bytes": self._bytes,
+                    "max_bytes": self.max_bytes}
+
+
+def _size(fragment: str) -> int:
+    # Size of the UTF-8 body sent for the fragment, close enough to the memory it takes.
+    return len(fragment.encode())
+
+
+_fragments = FragmentCache(16 * 1024 * 1024)
+on_data_change(_fragments.invalidate)
+
+
+def init_app(app, max_bytes: int):
+    # Gives the application its own cache of max_bytes. 0 disables it.
+    cache = app.extensions['fragment_cache'] = FragmentCache(max_bytes)
+    on_data_change(cache.invalidate)
+
+
+def _cache() -> FragmentCache:
+    if has_app_context():
+        return current_app.extensions.get('fragment_cache', _fragments)
+    return _fragments
+
+
+def cached_fragment(name: str, key, render) -> Markup:
+    # Returns the fragment rendered by render() for this name and key at the current version of the data, rendering
+    # it only if it is not cached.
+    fragments = _cache()
+    version = data_version()
+    if version is None or fragments.max_bytes <= 0:
+        return Markup(render())
+    full_key = (name, version[:2], key)
+    fragment = fragments.get(full_key)
+    if fragment is None:
+        fragment = render()
+        fragments.put(full_key, fragment)
+    return Markup(fragment)
+
+
+def invalidate():
+    _cache().invalidate()
+
+
+def fragment_cache_stats() -> dict:
+    # Returns the hit rate of the fragment cache and the memory taken by the fragments it keeps.
+    return _cache().stats()
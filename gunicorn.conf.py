@@ -0,0 +1,11 @@
+# Read by gunicorn when it is started from the root of the repository.
+import metrics
+from config import get_config
+
+
+def child_exit(server, worker):
+    # Adds the metrics of a worker that has exited, or was killed, to those of the workers gone before it, so that
+    # its file is neither lost nor counted again (see metrics).
+    directory = get_config().METRICS_DIRECTORY
+    if directory:
+        metrics.mark_process_dead(worker.pid, directory)
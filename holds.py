@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import heapq
+import threading
+from contextlib import contextmanager
+from dataclasses import replace
+from typing import Optional
+
+from flask import current_app, has_app_context
+
+from data_access import on_booking
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, where holds can only be kept in memory.
+    fcntl = None
+
+# Places held for a club while it fills in the booking form of a popular competition. The booking page can hold the
+# places the club asks for, as long as they are free; other clubs can then no longer book them, and the booking that
+# follows is sure to find them, instead of failing only once the form is sent. A hold lasts a few minutes, and ends
+# when the club books in that competition.
+#
+# A club holds places at most once per competition: holding again replaces its hold. Holds are kept in the memory of
+# the worker process (HoldTable), or in a file shared by the worker processes (FileHoldTable), by each application
+# (see init_app()). They end in the same step as the booking, while its competition and club locks are held, so that
+# the next booking never counts the places both as booked and as held.
+
+
+class Hold:
+    __slots__ = ('competition', 'club', 'places', 'expires')
+
+    def __init__(self, competition: str, club: str, places: int, expires: float):
+        self.competition = competition
+        self.club = club
+        self.places = places
+        self.expires = expires
+
+
+class HoldTable:
+    # Holds by competition and club, with the places held in each competition kept up to date. Expiry times are
+    # kept in a heap: holds that have expired are taken from its top, so that nothing needs to go through all the
+    # holds. Heap entries of holds already replaced or ended are skipped when they come up.
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._holds = {}
+        self._held = {}
+        self._expiries = []
+        self._lock = threading.Lock()
+        self._stats = {"placed": 0, "refused": 0, "confirmed": 0, "expired": 0}
+
+    def _remove(self, hold: Hold):
+        del self._holds[(hold.competition, hold.club)]
+        held = self._held[hold.competition] - hold.places
+        if held:
+            self._held[hold.competition] = held
+        else:
+            del self._held[hold.competition]
+
+    def _reclaim(self, now: float):
+        while self._expiries and self._expiries[0][0] <= now:
+            expires, competition, club = heapq.heappop(self._expiries)
+            hold = self._holds.get((competition, club))
+            if hold is not None and hold.expires == expires:
+                self._remove(hold)
+                self._stats["expired"] += 1
+
+    def held(self, competition: str, club: Optional[str] = None) -> int:
+        # Returns the places held in the competition by the clubs other than club.
+        with self._lock:
+            self._reclaim(time.monotonic())
+            held = self._held.get(competition, 0)
+            own = self._holds.get((competition, club))
+            return held - own.places if own is not None else held
+
+    def place(self, competition: str, club: str, places: int, free_places: int) -> Optional[Hold]:
+        # Holds places for the club, if the free places of the competition (the places not booked yet) minus those
+        # held by other clubs are enough. Returns None otherwise.
+        with self._lock:
+            now = time.monotonic()
+            self._reclaim(now)
+            previous = self._holds.get((competition, club))
+            held = self._held.get(competition, 0) - (previous.places if previous is not None else 0)
+            if self.ttl <= 0 or free_places - held < places:
+                self._stats["refused"] += 1
+                return None
+            if previous is not None:
+                self._remove(previous)
+            hold = Hold(competition, club, places, now + self.ttl)
+            self._holds[(competition, club)] = hold
+            self._held[competition] = self._held.get(competition, 0) + places
+            heapq.heappush(self._expiries, (hold.expires, competition, club))
+            self._stats["placed"] += 1
+            return hold
+
+    def release(self, competition: str, club: str):
+        # Ends the hold of the club, once it has booked.
+        with self._lock:
+            hold = self._holds.get((competition, club))
+            if hold is not None:
+                self._remove(hold)
+                self._stats["confirmed"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._holds.clear()
+            self._held.clear()
+            self._expiries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._reclaim(time.monotonic())
+            return dict(self._stats, active=len(self._holds), places_held=sum(self._held.values()), ttl=self.ttl)
+
+
+class FileHoldTable:
+    # Same as HoldTable, with the holds kept in a JSON file shared by the worker processes, as
+    # {competition: {club: [places, expiry time]}}. Each call reads the holds under an fcntl lock on the file, and
+    # rewrites them if it changes them. The file only holds the holds not expired yet, a few per popular competition.
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = {"placed": 0, "refused": 0, "confirmed": 0, "expired": 0}
+
+    def _count(self, name: str, number: int = 1):
+        with self._lock:
+            self._stats[name] += number
+
+    @contextmanager
+    def _holds(self, exclusive: bool = False):
+        # Yields the holds not expired yet, and writes them back when exclusive. An unreadable file counts as no
+        # holds.
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            with open(fd, 'rb', closefd=False) as file:
+                content = file.read()
+            try:
+                holds = json.loads(content) if content else {}
+            except ValueError as e:
+                print(f"Error: Unable to read the holds of {self.path}: {e}")
+                holds = {}
+            now = time.time()
+            expired = 0
+            for competition in list(holds):
+                club_holds = holds[competition]
+                for club in [club for club, (_, expires) in club_holds.items() if expires <= now]:
+                    del club_holds[club]
+                    expired += 1
+                if not club_holds:
+                    del holds[competition]
+            yield holds
+            if exclusive:
+                content = json.dumps(holds).encode()
+                os.ftruncate(fd, 0)
+                os.pwrite(fd, content, 0)
+                if expired:
+                    self._count("expired", expired)
+        finally:
+            os.close(fd)
+
+    def held(self, competition: str, club: Optional[str] = None) -> int:
+        with self._holds() as holds:
+            return sum(held for holder, (held, _) in holds.get(competition, {}).items() if holder != club)
+
+    def place(self, competition: str, club: str, places: int, free_places: int) -> Optional[Hold]:
+        with self._holds(exclusive=True) as holds:
+            club_holds = holds.setdefault(competition, {})
+            held = sum(held for holder, (held, _) in club_holds.items() if holder != club)
+            if self.ttl <= 0 or free_places - held < places:
+                if not club_holds:
+                    del holds[competition]
+                self._count("refused")
+                return None
+            expires = time.time() + self.ttl
+            club_holds[club] = [places, expires]
+        self._count("placed")
+        return Hold(competition, club, places, expires)
+
+    def release(self, competition: str, club: str):
+        with self._holds(exclusive=True) as holds:
+            club_holds = holds.get(competition, {})
+            if club_holds.pop(club, None) is None:
+                return
+            if not club_holds:
+                del holds[competition]
+        self._count("confirmed")
+
+    def clear(self):
+        with self._holds(exclusive=True) as holds:
+            holds.clear()
+
+    def stats(self) -> dict:
+        with self._holds() as holds:
+            active = sum(len(club_holds) for club_holds in holds.values())
+            places_held = sum(held for club_holds in holds.values() for held, _ in club_holds.values())
+        with self._lock:
+            return dict(self._stats, active=active, places_held=places_held, ttl=self.ttl)
+
+
+_holds = HoldTable(120)
+
+
+def init_app(app, ttl: float, path: Optional[str] = None):
+    # Gives the application its own holds, lasting ttl seconds, kept in the file if given (and supported) or in memory
+    # otherwise. 0 disables holds.
+    if path and ttl > 0 and fcntl is not None:
+        app.extensions['holds'] = FileHoldTable(path, ttl)
+    else:
+        app.extensions['holds'] = HoldTable(ttl)
+
+
+def _table() -> HoldTable:
+    if has_app_context():
+        return current_app.extensions.get('holds', _holds)
+    return _holds
+
+
+def place_hold(competition, club_name: str, places: int) -> Optional[Hold]:
+    # Holds places of the competition record for the club, see HoldTable.place().
+    return _table().place(competition.name, club_name, places, competition.number_of_places)
+
+
+def release_hold(competition_name: str, club_name: str):
+    _table().release(competition_name, club_name)
+
+
+def _release_booked(club_name: str, bookings):
+    # Ends the holds of the club in the competitions it has just booked, see data_access.on_booking().
+    table = _table()
+    if table.ttl <= 0:
+        return
+    for competition_name, _ in bookings:
+        table.release(competition_name, club_name)
+
+
+on_booking(_release_booked)
+
+
+def without_holds(competition, club_name: str):
+    # Returns the competition record as the club sees it, without the places held by the other clubs, so that the
+    # checks of a booking only count the places the club can take. The record itself is returned when nothing is held.
+    held = _table().held(competition.name, club_name)
+    if not held or competition.number_of_places is None:
+        return competition
+    return replace(competition, number_of_places=competition.number_of_places - held)
+
+
+def hold_stats() -> dict:
+    # Returns the number of holds placed, refused, confirmed by a booking and expired, and the places held now.
+    return _table().stats()
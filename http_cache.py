@@ -0,0 +1,55 @@
+from datetime import datetime
+from datetime import timezone
+from functools import wraps
+
+from flask import make_response, request, session
+
+from data_access import data_version
+from data_access import started_competitions
+
+# Conditional responses for the read routes. A page only depends on the clubs and competitions, so its ETag is the
+# version of the data: a client sending back the ETag of its copy (If-None-Match) gets a 304 as long as nothing was
+# written since, without any data being loaded or any template rendered.
+
+
+def _not_modified(etag: str, last_modified: datetime):
+    response = make_response('', 304)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
+
+
+def conditional(time_dependent: bool = False):
+    # Decorator for the GET routes. Routes whose content also depends on the current time (competitions becoming
+    # past) give time_dependent=True, which adds the number of competitions already started to the ETag. Pages that
+    # differ on each visit (the booking form and its idempotency key) must not use it.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Pending flash messages are shown once by the next page, which must then be rendered.
+            if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return view(*args, **kwargs)
+            version = data_version()
+            if version is None:
+                return view(*args, **kwargs)
+
+            scope, number, modified = version
+            etag = f"{scope}-{number}"
+            if time_dependent:
+                etag += f"-{started_competitions(datetime.now())}"
+            last_modified = datetime.fromtimestamp(int(modified), timezone.utc)
+
+            if request.if_none_match:
+                if request.if_none_match.contains(etag):
+                    return _not_modified(etag, last_modified)
+            elif request.if_modified_since is not None and last_modified <= request.if_modified_since:
+                return _not_modified(etag, last_modified)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+                response.last_modified = last_modified
+                response.cache_control.no_cache = True  # Always check with the server before using the copy
+            return response
+        return wrapper
+    return decorator
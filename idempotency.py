@@ -0,0 +1,353 @@
+import os
+import json
+import time
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Optional
+
+from flask import current_app, flash, g, has_app_context, make_response, request, session
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, where the outcomes can only be kept in memory.
+    fcntl = None
+
+# Bookings sent with an idempotency key (the idempotency_key form field or the Idempotency-Key header) are made once.
+# The response to a booking that went through is kept for a while, and a retry with the same key gets that response
+# again, without loading any data or taking any lock. Only bookings that went through are kept: a refused or failed
+# booking has changed nothing, and is simply checked again when retried.
+#
+# The responses are kept in memory (IdempotencyStore), where a retry is only recognized by the worker process that
+# made the booking, or in a directory shared by the worker processes (FileIdempotencyStore). Each application keeps
+# its own (see init_app()).
+
+IDEMPOTENCY_KEY_FIELD = 'idempotency_key'
+IDEMPOTENCY_KEY_HEADER = 'Idempotency-Key'
+# Header added to the responses given again.
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+# Longest key accepted, longer keys are ignored.
+MAX_KEY_LENGTH = 255
+
+
+class Outcome:
+    # A response kept for a key, with the request it answered and the messages it left to flash.
+    __slots__ = ('fingerprint', 'status', 'headers', 'body', 'messages', 'expires')
+
+    def __init__(self, fingerprint, status: int, headers: list, body: bytes, messages: list, expires: float):
+        self.fingerprint = fingerprint
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.messages = messages
+        self.expires = expires
+
+
+class IdempotencyStore:
+    # Outcomes are kept ttl seconds. They all live as long, so the oldest is always the first to expire and expired
+    # outcomes are dropped from the front of the table, without going through it. Past max_entries, the oldest
+    # outcomes are dropped before their time.
+    #
+    # A request making a booking for a key claims it; a retry arriving meanwhile waits for it to finish, then gets
+    # its outcome, or makes the booking itself if the first one did not go through.
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._outcomes = OrderedDict()
+        self._running = {}
+        self._lock = threading.Lock()
+        self._stats = {"replays": 0, "misses": 0, "waits": 0, "expirations": 0, "evictions": 0}
+
+    def _expire(self, now: float):
+        while self._outcomes:
+            key, outcome = next(iter(self._outcomes.items()))
+            if outcome.expires > now:
+                break
+            del self._outcomes[key]
+            self._stats["expirations"] += 1
+
+    def claim(self, key) -> Optional[Outcome]:
+        # Returns the outcome kept for the key, or None once the key is claimed by the caller, who must then call
+        # release() whatever happens.
+        while True:
+            with self._lock:
+                self._expire(time.monotonic())
+                outcome = self._outcomes.get(key)
+                if outcome is not None:
+                    self._stats["replays"] += 1
+                    return outcome
+                running = self._running.get(key)
+                if running is None:
+                    self._running[key] = threading.Event()
+                    self._stats["misses"] += 1
+                    return None
+                self._stats["waits"] += 1
+            running.wait()
+
+    def release(self, key, outcome: Optional[Outcome] = None):
+        # Keeps the outcome of the request that claimed the key, if given, and wakes up the retries waiting for it.
+        with self._lock:
+            if outcome is not None and self.ttl > 0 and self.max_entries > 0:
+                self._outcomes[key] = outcome
+                while len(self._outcomes) > self.max_entries:
+                    self._outcomes.popitem(last=False)
+                    self._stats["evictions"] += 1
+            self._running.pop(key).set()
+
+    def clear(self):
+        with self._lock:
+            self._outcomes.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire(time.monotonic())
+            return dict(self._stats, entries=len(self._outcomes), running=len(self._running), ttl=self.ttl,
+                        max_entries=self.max_entries)
+
+
+class FileIdempotencyStore:
+    # Same as IdempotencyStore, with the outcomes kept in a directory shared by the worker processes, one file per
+    # key. The request claiming a key holds an fcntl lock on its file until it has written the outcome there: a retry
+    # sent to another worker meanwhile waits for that lock, then reads the outcome, so the booking is only made once
+    # whichever worker the retry reaches.
+    #
+    # Outcomes expire ttl seconds after they were written. Expired files, and the oldest ones past max_entries, are
+    # removed at most every SWEEP_SECONDS, by whichever worker gets there first.
+    SWEEP_SECONDS = 60
+
+    def __init__(self, directory: str, ttl: float, max_entries: int):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+        self._running = {}
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+        self._stats = {"replays": 0, "misses": 0, "waits": 0, "expirations": 0, "evictions": 0}
+
+    def _path(self, key) -> str:
+        return os.path.join(self.directory, hashlib.sha256(repr(key).encode()).hexdigest() + '.json')
+
+    def _lock_file(self, path: str) -> int:
+        # Opens and locks the file of a key. A file removed by a sweep while this worker waited for its lock is opened
+        # again, so that every worker locks the same file.
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    self._count("waits")
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                if os.path.exists(path) and os.path.samestat(os.fstat(fd), os.stat(path)):
+                    return fd
+            except BaseException:
+                os.close(fd)
+                raise
+            os.close(fd)
+
+    def _read(self, fd: int) -> Optional[Outcome]:
+        status = os.fstat(fd)
+        if status.st_size == 0:
+            return None
+        if time.time() - status.st_mtime >= self.ttl:
+            os.ftruncate(fd, 0)
+            self._count("expirations")
+            return None
+        with open(fd, 'rb', closefd=False) as file:
+            data = json.load(file)
+        return Outcome(tuple(data["fingerprint"]), data["status"], [tuple(header) for header in data["headers"]],
+                       base64.b64decode(data["body"]), [tuple(message) for message in data["messages"]],
+                       status.st_mtime + self.ttl)
+
+    def claim(self, key) -> Optional[Outcome]:
+        path = self._path(key)
+        fd = self._lock_file(path)
+        try:
+            outcome = self._read(fd)
+        except (OSError, ValueError) as e:
+            print(f"Error: Unable to read the outcome of an idempotency key: {e}")
+            outcome = None
+        if outcome is not None:
+            os.close(fd)
+            self._count("replays")
+            return outcome
+        with self._lock:
+            self._running[key] = (fd, path)
+            self._stats["misses"] += 1
+        return None
+
+    def release(self, key, outcome: Optional[Outcome] = None):
+        # Without an outcome, the file of the key is removed before it is unlocked: the retries waiting for it open
+        # the next one.
+        with self._lock:
+            fd, path = self._running.pop(key)
+        try:
+            if outcome is None or self.max_entries <= 0:
+                os.remove(path)
+            else:
+                content = json.dumps({"fingerprint": outcome.fingerprint, "status": outcome.status,
+                                      "headers": outcome.headers, "body": base64.b64encode(outcome.body).decode(),
+                                      "messages": outcome.messages}).encode()
+                os.ftruncate(fd, 0)
+                os.pwrite(fd, content, 0)
+                os.fsync(fd)
+        except OSError as e:
+            print(f"Error: Unable to keep the outcome of an idempotency key: {e}")
+        finally:
+            os.close(fd)
+        self._sweep()
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _files(self) -> list:
+        # The files of the outcomes, as (modification time, path), oldest first.
+        files = []
+        for entry in os.scandir(self.directory):
+            try:
+                files.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                pass
+        return sorted(files)
+
+    def _sweep(self):
+        with self._lock:
+            if time.monotonic() < self._next_sweep:
+                return
+            self._next_sweep = time.monotonic() + self.SWEEP_SECONDS
+        try:
+            files = self._files()
+        except OSError as e:
+            print(f"Error: Unable to list the outcomes of the idempotency keys: {e}")
+            return
+        now = time.time()
+        for position, (modified, path) in enumerate(files):
+            expired = now - modified >= self.ttl
+            if not expired and len(files) - position <= self.max_entries:
+                break
+            if self._remove(path):
+                self._count("expirations" if expired else "evictions")
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        # Removes the file of a key, unless a request holds it.
+        try:
+            fd = os.open(path, os.O_RDWR)
+        except FileNotFoundError:
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+        finally:
+            os.close(fd)
+
+    def clear(self):
+        for _, path in self._files():
+            self._remove(path)
+
+    def stats(self) -> dict:
+        try:
+            entries = len(os.listdir(self.directory))
+        except OSError:
+            entries = 0
+        with self._lock:
+            return dict(self._stats, entries=entries, running=len(self._running), ttl=self.ttl,
+                        max_entries=self.max_entries)
+
+
+_store = IdempotencyStore(600, 10000)
+
+
+def init_app(app, ttl: float, max_entries: int, directory: Optional[str] = None):
+    # Gives the application its own outcomes, kept ttl seconds, at most max_entries, in the directory if given (and
+    # supported) or in memory otherwise. A ttl of 0 disables idempotency keys.
+    if directory and ttl > 0 and fcntl is not None:
+        app.extensions['idempotency'] = FileIdempotencyStore(directory, ttl, max_entries)
+    else:
+        app.extensions['idempotency'] = IdempotencyStore(ttl, max_entries)
+
+
+def _current_store() -> IdempotencyStore:
+    if has_app_context():
+        return current_app.extensions.get('idempotency', _store)
+    return _store
+
+
+def keep_outcome():
+    # Called by an idempotent route once the booking went through, so that its response is given to retries.
+    g.keep_idempotent_outcome = True
+
+
+def _request_key() -> Optional[str]:
+    key = request.headers.get(IDEMPOTENCY_KEY_HEADER) or request.form.get(IDEMPOTENCY_KEY_FIELD)
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return None
+    return key
+
+
+def _fingerprint(fields) -> tuple:
+    data = request.get_json(silent=True) if request.is_json else request.form
+    if not hasattr(data, 'get'):
+        data = {}
+    return tuple(str(data.get(field)) for field in fields)
+
+
+def _replay(outcome: Outcome):
+    for category, message in outcome.messages:
+        flash(message, category)
+    response = current_app.response_class(outcome.body, outcome.status, outcome.headers)
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def _outcome(response, fingerprint: tuple, flashed_before: int) -> Optional[Outcome]:
+    if response.is_streamed:
+        return None
+    # The messages left in the session are flashed by the next page: a retry leaves them again.
+    messages = list(session.get('_flashes', [])[flashed_before:])
+    headers = [(name, value) for name, value in response.headers.items() if name.lower() != 'set-cookie']
+    return Outcome(fingerprint, response.status_code, headers, response.get_data(), messages,
+                   time.monotonic() + _current_store().ttl)
+
+
+def idempotent(fields, reused):
+    # Decorator for the booking routes. fields are the names of the form or JSON fields of the booking: a key sent
+    # again with other values is refused with the response returned by reused().
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            store = _current_store()
+            key = _request_key()
+            if key is None or store.ttl <= 0:
+                return view(*args, **kwargs)
+
+            fingerprint = _fingerprint(fields)
+            scoped_key = (request.endpoint, key)
+            outcome = store.claim(scoped_key)
+            if outcome is not None:
+                return _replay(outcome) if outcome.fingerprint == fingerprint else reused()
+
+            outcome = None
+            try:
+                flashed_before = len(session.get('_flashes', []))
+                response = make_response(view(*args, **kwargs))
+                if g.pop('keep_idempotent_outcome', False):
+                    outcome = _outcome(response, fingerprint, flashed_before)
+                return response
+            finally:
+                store.release(scoped_key, outcome)
+        return wrapper
+    return decorator
+
+
+def idempotency_stats() -> dict:
+    # Returns the number of retries answered from the table and the number of outcomes it keeps.
+    return _current_store().stats()
@@ -0,0 +1,235 @@
+import os
+import time
+import threading
+from typing import Optional
+from contextlib import ExitStack
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, where only the in-process locks are used.
+    fcntl = None
+
+
+class LockStats:
+    # Counts acquisitions and the time spent waiting for each kind of lock.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, kind: str, wait_seconds: float):
+        with self._lock:
+            stats = self._stats.setdefault(kind, {"acquisitions": 0, "wait_seconds_total": 0.0,
+                                                  "wait_seconds_max": 0.0})
+            stats["acquisitions"] += 1
+            stats["wait_seconds_total"] += wait_seconds
+            stats["wait_seconds_max"] = max(stats["wait_seconds_max"], wait_seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {kind: dict(stats) for kind, stats in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class KeyedLocks:
+    # One lock per key (a competition or a club name). A lock only exists while a thread holds it or waits for it, so
+    # the names sent by clients, valid or not, do not pile up in memory.
+    def __init__(self):
+        self._locks = {}  # key -> [lock, number of threads holding it or waiting for it]
+        self._guard = threading.Lock()
+
+    def get(self, key) -> 'KeyLock':
+        return KeyLock(self, key)
+
+    def acquire(self, key):
+        with self._guard:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        entry[0].acquire()
+
+    def release(self, key):
+        with self._guard:
+            entry = self._locks[key]
+            entry[0].release()
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def __len__(self):
+        with self._guard:
+            return len(self._locks)
+
+
+class KeyLock:
+    # The lock of one key of a KeyedLocks.
+    __slots__ = ('_keyed_locks', '_key')
+
+    def __init__(self, keyed_locks: KeyedLocks, key):
+        self._keyed_locks = keyed_locks
+        self._key = key
+
+    def acquire(self):
+        self._keyed_locks.acquire(self._key)
+
+    def release(self):
+        self._keyed_locks.release(self._key)
+
+
+class SharedFileLock:
+    # Exclusive advisory fcntl lock on a file, shared by the threads of this process. The first thread to enter takes
+    # the lock, the last one to leave releases it, so worker processes exclude each other while the threads of one
+    # worker keep running in parallel under their own in-process locks.
+    #
+    # So that a busy process does not keep the lock forever, once it has held it for max_hold seconds the threads
+    # arriving wait for the ones inside to leave: the lock is then released, and other worker processes waiting for
+    # it get their turn.
+    def __init__(self, path: str, max_hold: float = 0.05):
+        self.path = path
+        self.max_hold = max_hold
+        self._condition = threading.Condition()
+        self._holders = 0
+        self._fd = None
+        self._acquired_at = 0.0
+        self._draining = False
+
+    def acquire(self):
+        with self._condition:
+            while self._draining or (self._holders and time.monotonic() - self._acquired_at > self.max_hold):
+                self._draining = True
+                self._condition.wait()
+            if self._holders == 0:
+                if fcntl is not None:
+                    fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                    try:
+                        fcntl.flock(fd, fcntl.LOCK_EX)
+                    except BaseException:
+                        os.close(fd)
+                        raise
+                    self._fd = fd
+                self._acquired_at = time.monotonic()
+            self._holders += 1
+
+    def release(self):
+        with self._condition:
+            self._holders -= 1
+            if self._holders == 0:
+                if self._fd is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+                    os.close(self._fd)
+                    self._fd = None
+                self._draining = False
+                self._condition.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+_stats = LockStats()
+_competition_locks = KeyedLocks()
+_club_locks = KeyedLocks()
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+# Held while records shared by every thread are changed or serialized, which only takes a moment.
+_data_lock = threading.RLock()
+# Threads in a bookings_lock() block that still hold or wait for its competition and club locks.
+_bookings = 0
+_bookings_guard = threading.Lock()
+# For each thread, the competition and club locks of the bookings_lock() blocks it is in, innermost last.
+_held = threading.local()
+
+
+def _shared_file_lock(path: str) -> SharedFileLock:
+    with _file_locks_guard:
+        lock = _file_locks.get(path)
+        if lock is None:
+            lock = _file_locks[path] = SharedFileLock(path)
+        return lock
+
+
+@contextmanager
+def _timed(lock, kind: str):
+    start = time.perf_counter()
+    lock.acquire()
+    _stats.record(kind, time.perf_counter() - start)
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+@contextmanager
+def booking_lock(competition_name, club_name, lock_path: Optional[str] = None):
+    # Serializes the bookings of one competition and the spending of one club's points, and, when a lock file is
+    # given, the bookings of other worker processes. Bookings for other competitions and clubs only wait for each
+    # other while the data is being written.
+    with bookings_lock([competition_name], club_name, lock_path):
+        yield
+
+
+@contextmanager
+def bookings_lock(competition_names, club_name, lock_path: Optional[str] = None):
+    # Same as booking_lock() for bookings in several competitions at once. Locks are always taken in the same order
+    # (competitions by name, club, file) so two bookings can never wait for each other.
+    with ExitStack() as stack:
+        record_locks = stack.enter_context(ExitStack())
+        _count_booking(1)
+        record_locks.callback(_count_booking, -1)
+        for competition_name in sorted(set(competition_names), key=str):
+            record_locks.enter_context(_timed(_competition_locks.get(competition_name), 'competition'))
+        record_locks.enter_context(_timed(_club_locks.get(club_name), 'club'))
+        if lock_path is not None:
+            stack.enter_context(_timed(_shared_file_lock(lock_path), 'file'))
+        held = _held.__dict__.setdefault('stacks', [])
+        held.append(record_locks)
+        try:
+            yield
+        finally:
+            held.pop()
+
+
+def _count_booking(step: int):
+    global _bookings
+    with _bookings_guard:
+        _bookings += step
+
+
+def bookings_waiting() -> int:
+    # Number of threads holding or waiting for the competition and club locks of a bookings_lock() block: bookings
+    # about to be made.
+    return _bookings
+
+
+def release_booking_locks():
+    # Releases the competition and club locks of the innermost bookings_lock() block of this thread before the end of
+    # the block, once its bookings are made in memory: the next booking of the same competition or club can then be
+    # checked and made while these ones are written. The file lock is kept until the end of the block, so other worker
+    # processes do not read bookings that are not on disk yet. Does nothing outside of a bookings_lock() block.
+    held = getattr(_held, 'stacks', None)
+    if held:
+        held[-1].close()
+
+
+@contextmanager
+def data_lock():
+    # To be held while changing the loaded records and saving them, so that no thread serializes a record another
+    # thread is in the middle of changing.
+    with _timed(_data_lock, 'data'):
+        yield
+
+
+def lock_stats() -> dict:
+    # Returns, for each kind of lock, how many times it was acquired and how long callers waited for it.
+    return _stats.snapshot()
+
+
+def reset_lock_stats():
+    _stats.reset()
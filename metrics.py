@@ -0,0 +1,465 @@
+import os
+import json
+import time
+import atexit
+import bisect
+import tempfile
+import threading
+import uuid
+from functools import wraps
+from contextlib import contextmanager
+from typing import Optional
+
+from flask import Blueprint, Response, current_app, g, has_app_context, request
+from flask import before_render_template, template_rendered
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, where the files of the workers are not locked.
+    fcntl = None
+
+# Metrics of the application in the Prometheus text format, served by /metrics: how long each route, storage
+# operation and template takes, how bookings end, and the counters of the *_stats() functions of the other modules.
+#
+# Each worker process counts in memory. With a metrics directory, a thread of every worker also writes what it
+# counted to its own file there, every flush_seconds, and /metrics adds up the files of all the workers, so that any
+# worker can answer for all of them. Without a directory, /metrics only shows the worker answering.
+#
+# The counts of the workers that are gone are added to a single file of the directory (AGGREGATE_FILE), like
+# prometheus_client's mark_process_dead(): by the worker itself when it exits, by gunicorn's child_exit hook (see
+# gunicorn.conf.py) when it was killed, or by /metrics when it finds the file of a process that no longer runs.
+#
+# The series are counted for the whole process, as in a Prometheus registry. The directory and the stats shown are
+# settings of each application (see init_app()).
+
+# Upper bounds, in seconds, of the buckets of the latency histograms.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics = {}
+
+
+class Histogram:
+    # Observations by label values. Each series keeps the count of each bucket (the last one for the observations
+    # above every bound) and the sum of the observations.
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = (), buckets: tuple = BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+        _metrics[name] = self
+
+    def observe(self, value: float, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, *label_values):
+        # Decorator observing how long each call of the function takes.
+        def decorator(function):
+            @wraps(function)
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - start, *label_values)
+            return timed
+        return decorator
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [[list(label_values), list(counts), total] for label_values, (counts, total) in self._series.items()]
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._series = {}
+        self._lock = threading.Lock()
+        _metrics[name] = self
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [[list(label_values), value] for label_values, value in self._series.items()]
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+REQUEST_SECONDS = Histogram('gudlft_request_duration_seconds', 'Time to answer a request, by route.',
+                            ('route', 'method', 'status'))
+STORAGE_SECONDS = Histogram('gudlft_storage_duration_seconds', 'Time spent in the storage functions of data_access.',
+                            ('operation',))
+TEMPLATE_SECONDS = Histogram('gudlft_template_render_duration_seconds', 'Time to render a template.',
+                             ('template',))
+BOOKINGS = Counter('gudlft_booking_outcomes_total', 'Bookings made (booked) or refused, by error code.',
+                   ('outcome',))
+
+AGGREGATE_FILE = 'aggregate.json'
+LOCK_FILE = '.lock'
+
+# Settings of an application that did not call init_app(): the metrics of this process only, without stats.
+_default_settings = {"directory": None, "flush_seconds": 5.0, "stats": {}}
+# Name of the file of this process in the metrics directory, made unique so that a new process reusing the pid of
+# an old one does not take over its file. Once retired, the process no longer writes it.
+_process = {"pid": os.getpid(), "id": uuid.uuid4().hex[:8], "retired": False}
+# Settings of the applications with a metrics directory, whose files the flusher thread of this process writes.
+_flushed = []
+_flusher = {"thread": None}
+_flusher_lock = threading.Lock()
+# Held while this process writes its file, so that it is not written again once removed at exit.
+_write_lock = threading.Lock()
+
+
+def _after_fork():
+    # A worker forked from a process that already counted starts from zero, with its own file and its own thread.
+    _process.update(pid=os.getpid(), id=uuid.uuid4().hex[:8], retired=False)
+    _flusher["thread"] = None
+    for metric in _metrics.values():
+        metric.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def init_app(app, directory: Optional[str], flush_seconds: float = 5.0):
+    # Sets the directory shared by the worker processes of the application, None to only show the metrics of each
+    # process.
+    settings = {"directory": directory or None, "flush_seconds": flush_seconds, "stats": {}}
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        with _flusher_lock:
+            _flushed.append(settings)
+    app.extensions['metrics'] = settings
+
+
+def _settings() -> dict:
+    if has_app_context():
+        return current_app.extensions.get('metrics', _default_settings)
+    return _default_settings
+
+
+def register_stats(app, group: str, stats, label: str = 'kind'):
+    # Shows the numbers of the dict returned by stats() as gauges named gudlft_<group>_<key> in the metrics of the
+    # application. The numbers of nested dicts get the key of the dict as the label named label. Other values are
+    # left out.
+    app.extensions['metrics']["stats"][group] = (stats, label)
+
+
+def reset():
+    for metric in _metrics.values():
+        metric.reset()
+
+
+def _stats_samples(settings: dict) -> list:
+    samples = []
+    for group, (stats, label) in settings["stats"].items():
+        for key, value in (stats() or {}).items():
+            if isinstance(value, dict):
+                samples.extend([f"gudlft_{group}_{name}", {label: key}, number]
+                               for name, number in value.items() if isinstance(number, (int, float)))
+            elif isinstance(value, (int, float)):
+                samples.append([f"gudlft_{group}_{key}", {}, value])
+    return samples
+
+
+def _process_snapshot(settings: dict) -> dict:
+    return {"pid": _process["pid"],
+            "metrics": {name: metric.snapshot() for name, metric in _metrics.items()},
+            "gauges": _stats_samples(settings)}
+
+
+def _write(path: str, snapshot: dict):
+    # Metrics do not need to survive a crash, so the file is replaced without fsync.
+    fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as temporary_file:
+            json.dump(snapshot, temporary_file)
+        os.replace(temporary_path, path)
+    except OSError as error:
+        print(f"Error writing the metrics: {error}")
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+
+
+def _own_file(directory: str) -> str:
+    return os.path.join(directory, f"{_process['pid']}-{_process['id']}.json")
+
+
+def flush(settings: Optional[dict] = None):
+    # Writes what this process counted to its file in the metrics directory of the application.
+    settings = settings or _settings()
+    if settings["directory"] is None:
+        return
+    with _write_lock:
+        if not _process["retired"]:
+            _write(_own_file(settings["directory"]), _process_snapshot(settings))
+
+
+def _flush_periodically():
+    # Runs until another thread replaces it.
+    while _flusher["thread"] is threading.current_thread():
+        with _flusher_lock:
+            flushed = list(_flushed)
+        time.sleep(min((settings["flush_seconds"] for settings in flushed), default=_default_settings["flush_seconds"]))
+        for settings in flushed:
+            flush(settings)
+
+
+def _start_flusher():
+    # Starts the thread writing the files of this process, once per process: a forked worker starts its own.
+    if _flusher["thread"] is not None:
+        return
+    with _flusher_lock:
+        if _flusher["thread"] is not None or not _flushed:
+            return
+        thread = _flusher["thread"] = threading.Thread(target=_flush_periodically, name='metrics-flusher',
+                                                       daemon=True)
+    thread.start()
+
+
+@contextmanager
+def _locked(directory: str, exclusive: bool = True):
+    # Held while the files of the directory are read, or while the counts of a process that is gone are moved to the
+    # aggregate file, so that they are never counted twice or missed.
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(os.path.join(directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+    finally:
+        os.close(fd)
+
+
+def _read(path: str) -> Optional[dict]:
+    try:
+        with open(path) as process_file:
+            return json.load(process_file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as error:
+        print(f"Error reading the metrics of {os.path.basename(path)}: {error}")
+        return None
+
+
+def _aggregate(directory: str, snapshots: list, paths: list = ()):
+    # Adds the counts of the snapshots of processes that are gone to the aggregate file, then removes their files.
+    # Called under the exclusive lock of the directory.
+    aggregate_path = os.path.join(directory, AGGREGATE_FILE)
+    aggregate = _read(aggregate_path)
+    merged, _ = _merge(([aggregate] if aggregate else []) + snapshots, False)
+    _write(aggregate_path, {"pid": None, "gauges": [], "metrics": {
+        name: [[list(label_values), *value] if isinstance(value, tuple) else [list(label_values), value]
+               for label_values, value in series.items()] for name, series in merged.items()}})
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError as error:
+            print(f"Error removing the metrics of {os.path.basename(path)}: {error}")
+
+
+def mark_process_dead(pid: int, directory: str):
+    # Adds the counts of a worker process that is gone to the aggregate file of the directory. For gunicorn's
+    # child_exit hook, which runs in the master process.
+    with _locked(directory):
+        paths = [entry.path for entry in os.scandir(directory) if entry.name.startswith(f"{pid}-")
+                 and entry.name.endswith('.json')]
+        snapshots = [snapshot for snapshot in map(_read, paths) if snapshot is not None]
+        if paths:
+            _aggregate(directory, snapshots, paths)
+
+
+def _retire():
+    # At exit, adds what this process counted to the aggregate file of each of its directories, and removes its own
+    # file, which would otherwise be counted again by the next process reusing its pid.
+    with _write_lock:
+        if _process["retired"] or _process["pid"] != os.getpid():
+            return
+        _process["retired"] = True
+    with _flusher_lock:
+        flushed = {settings["directory"]: settings for settings in _flushed}
+    for directory, settings in flushed.items():
+        try:
+            with _locked(directory):
+                _aggregate(directory, [_process_snapshot(settings)],
+                           [path for path in [_own_file(directory)] if os.path.exists(path)])
+        except OSError as error:
+            print(f"Error writing the metrics: {error}")
+
+
+atexit.register(_retire)
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _snapshots(settings: dict) -> list:
+    # The counts of this process as they are now, and the files of the others. The files of processes that are gone
+    # are moved to the aggregate file on the way.
+    directory = settings["directory"]
+    if directory is None:
+        return [_process_snapshot(settings)]
+    own_file = _own_file(directory)
+    snapshots = [_process_snapshot(settings)]
+    dead = []
+    with _locked(directory):
+        for entry in os.scandir(directory):
+            if not entry.name.endswith('.json') or entry.path == own_file:
+                continue
+            snapshot = _read(entry.path)
+            if snapshot is None:
+                continue
+            if snapshot["pid"] is not None and not _is_alive(snapshot["pid"]):
+                dead.append((entry.path, snapshot))
+            snapshots.append(snapshot)
+        if dead:
+            _aggregate(directory, [snapshot for _, snapshot in dead], [path for path, _ in dead])
+    return snapshots
+
+
+def _merge(snapshots: list, by_process: bool) -> tuple:
+    # Adds up the series of every process. With by_process, the gauges of the stats are those of each running
+    # process, labelled with its pid: the counts of processes that are gone still add up, their stats no longer make
+    # sense.
+    merged = {}
+    gauges = []
+    for snapshot in snapshots:
+        for name, series in snapshot["metrics"].items():
+            metric = _metrics.get(name)
+            if metric is None:
+                continue
+            totals = merged.setdefault(name, {})
+            for entry in series:
+                label_values = tuple(entry[0])
+                if metric.kind == 'histogram':
+                    counts, total = totals.get(label_values, ([0] * len(entry[1]), 0.0))
+                    totals[label_values] = ([a + b for a, b in zip(counts, entry[1])], total + entry[2])
+                else:
+                    totals[label_values] = totals.get(label_values, 0) + entry[1]
+        if not by_process:
+            gauges.extend(snapshot["gauges"])
+        elif snapshot["pid"] is not None and _is_alive(snapshot["pid"]):
+            gauges.extend((name, dict(labels, pid=str(snapshot["pid"])), value)
+                          for name, labels, value in snapshot["gauges"])
+    return merged, gauges
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(pairs) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in pairs]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics() -> str:
+    # Returns the metrics of every process in the Prometheus text format.
+    settings = _settings()
+    merged, gauges = _merge(_snapshots(settings), settings["directory"] is not None)
+    lines = []
+    for name, metric in _metrics.items():
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for label_values, value in sorted(merged.get(name, {}).items()):
+            pairs = list(zip(metric.label_names, label_values))
+            if metric.kind == 'counter':
+                lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(metric.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(pairs + [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_labels(pairs)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(pairs)} {cumulative}")
+
+    typed = set()
+    for name, labels, value in sorted(gauges, key=lambda gauge: gauge[0]):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name}{_labels(sorted(labels.items()))} {_number(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+metrics = Blueprint('metrics', __name__)
+
+
+@metrics.before_app_request
+def _start_request():
+    g.metrics_start = time.perf_counter()
+
+
+@metrics.after_app_request
+def _end_request(response):
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - start, route, request.method, str(response.status_code))
+    # The files are written by a thread, off the path of the requests.
+    if _settings()["directory"] is not None:
+        _start_flusher()
+    return response
+
+
+@metrics.route('/metrics')
+def metrics_page():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+def _template_started(sender, template, context, **extra):
+    if has_app_context():
+        g.setdefault('metrics_templates', []).append(time.perf_counter())
+
+
+def _template_rendered(sender, template, context, **extra):
+    starts = g.get('metrics_templates') if has_app_context() else None
+    if starts:
+        TEMPLATE_SECONDS.observe(time.perf_counter() - starts.pop(), template.name or 'string')
+
+
+before_render_template.connect(_template_started)
+template_rendered.connect(_template_rendered)
+
+
+def count_booking(outcome: str):
+    # Counts a booking made ("booked") or refused, with the error code of the reason.
+    BOOKINGS.inc(outcome)
@@ -0,0 +1,122 @@
+import sys
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from utils import parse_competition_date
+
+# Clubs and competitions as they are kept in memory. Numbers and dates are parsed once, when the records are loaded,
+# instead of on every request, and __slots__ keeps each record much smaller than a dict.
+#
+# The records can still be read like the dicts of the data files (club['points'], competition.get('bookings')), so
+# templates and lookups work unchanged. A number or a date that cannot be parsed is kept as None, and reported
+# where it is used with the same messages as before.
+#
+# Rewrite the data files with numbers instead of strings with:
+#     python models.py data/production/clubs.json data/production/competitions.json
+
+
+def _parse_number(value, field: str, name) -> Optional[int]:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        print(f"Invalid {field} for {name}: {value!r}")
+        return None
+
+
+class Record(Mapping):
+    # Read access by the keys of the data files. KEYS maps each key to the attribute holding it.
+    __slots__ = ()
+    KEYS = {}
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, self.KEYS[key])
+        except KeyError:
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def to_dict(self) -> dict:
+        # The record as written to the data files, with numbers as numbers.
+        return {key: getattr(self, attribute) for key, attribute in self.KEYS.items()}
+
+
+@dataclass(eq=False)
+class Club(Record):
+    __slots__ = ('name', 'email', 'points')
+    KEYS = {'name': 'name', 'email': 'email', 'points': 'points'}
+
+    name: str
+    email: str
+    points: Optional[int]
+
+    @classmethod
+    def from_dict(cls, record) -> 'Club':
+        if isinstance(record, Club):
+            return record
+        return cls(record['name'], record['email'], _parse_number(record['points'], 'points', record['name']))
+
+
+@dataclass(eq=False)
+class Competition(Record):
+    __slots__ = ('name', 'date', 'number_of_places', 'bookings', 'parsed_date')
+    KEYS = {'name': 'name', 'date': 'date', 'numberOfPlaces': 'number_of_places', 'bookings': 'bookings'}
+
+    name: str
+    date: str
+    number_of_places: Optional[int]
+    # Places booked by each club, by club name.
+    bookings: dict
+    parsed_date: Optional[datetime]
+
+    @classmethod
+    def from_dict(cls, record) -> 'Competition':
+        if isinstance(record, Competition):
+            return record
+        name = record['name']
+        bookings = {club_name: _parse_number(places, 'booking', name) or 0
+                    for club_name, places in record.get('bookings', {}).items()}
+        return cls(name, record['date'], _parse_number(record['numberOfPlaces'], 'numberOfPlaces', name), bookings,
+                   parse_competition_date(record['date']))
+
+
+@dataclass(eq=False)
+class Booking:
+    # One line of a booking: places in a competition. Unpacks as (competition, places).
+    __slots__ = ('competition', 'places')
+
+    competition: str
+    places: int
+
+    def __iter__(self):
+        return iter((self.competition, self.places))
+
+
+def clubs_from_dicts(records) -> list:
+    return [Club.from_dict(record) for record in records]
+
+
+def competitions_from_dicts(records) -> list:
+    return [Competition.from_dict(record) for record in records]
+
+
+def to_dicts(records) -> list:
+    return [record.to_dict() if isinstance(record, Record) else record for record in records]
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Usage: python models.py <clubs.json> <competitions.json>")
+        sys.exit(1)
+    from data_access import migrate_to_numbers
+    if not migrate_to_numbers(sys.argv[1], sys.argv[2]):
+        sys.exit(1)
+    print(f"Rewrote {sys.argv[1]} and {sys.argv[2]} with numbers")
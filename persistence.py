@@ -0,0 +1,280 @@
+import os
+import time
+import atexit
+import weakref
+import threading
+from typing import Optional
+
+# Ways of making the bookings durable that are shared by the storage backends writing files. Both persisters are
+# used the same way by a backend: begin() before making a booking in memory, then submit() under the lock with what
+# write() needs to save or undo it (or abandon() if it was not possible), then wait() for the answer to give.
+
+
+def _record(stats: dict, batch_size: int, success: bool, elapsed: float):
+    stats["commits"] += 1
+    stats["failures"] += 0 if success else 1
+    stats["bookings"] += batch_size
+    stats["batch_size_max"] = max(stats["batch_size_max"], batch_size)
+    stats["commit_seconds_total"] += elapsed
+    stats["commit_seconds_max"] = max(stats["commit_seconds_max"], elapsed)
+
+
+def _with_means(stats: dict) -> dict:
+    stats["batch_size_mean"] = stats["bookings"] / stats["commits"] if stats["commits"] else 0.0
+    stats["commit_seconds_mean"] = stats["commit_seconds_total"] / stats["commits"] if stats["commits"] else 0.0
+    return stats
+
+
+class _Ticket:
+    __slots__ = ('change', 'result')
+
+    def __init__(self, change):
+        self.change = change
+        self.result = None  # True or False once the write holding the change is done
+
+
+class GroupCommitter:
+    # Makes the bookings of concurrent requests durable with a single write. A booking is made in memory, then
+    # submitted, and its request waits until a write holding it is done. The first request to wait while no write is
+    # in progress does the write for everyone: it first gives the requests already making a booking up to window
+    # seconds to submit theirs, then writes once for all of them. Requests submitting during a write are written
+    # together by the next one. A single request never waits for the window, there is nobody to wait for.
+    #
+    # write(changes) is called with the changes of the batch, in the order they were made, while lock() is held. It
+    # saves the records and returns True, or puts the changes back and returns False, failing the whole batch.
+    # arriving(), if given, returns the number of bookings on their way that did not call begin() yet, for example
+    # requests waiting for the lock of their competition: the write waits for them too, within the window.
+    def __init__(self, write, lock, window: float = 0.005, arriving=None):
+        self.window = window
+        self._write = write
+        self._lock = lock
+        self._arriving = arriving
+        self._condition = threading.Condition()
+        self._preparing = 0
+        self._pending = []
+        self._writing = False
+        self._stats = {"commits": 0, "failures": 0, "bookings": 0, "batch_size_max": 0,
+                       "commit_seconds_total": 0.0, "commit_seconds_max": 0.0}
+
+    def begin(self):
+        # Called before making a booking in memory, so that a write about to start waits for it.
+        with self._condition:
+            self._preparing += 1
+
+    def abandon(self):
+        # Called instead of submit() when the booking was not possible.
+        with self._condition:
+            self._preparing -= 1
+            self._condition.notify_all()
+
+    def submit(self, change) -> _Ticket:
+        # Called under lock(), right after the booking was made in memory.
+        ticket = _Ticket(change)
+        with self._condition:
+            self._preparing -= 1
+            self._pending.append(ticket)
+            self._condition.notify_all()
+        return ticket
+
+    def wait(self, ticket: _Ticket) -> bool:
+        # Returns once the change of the ticket is written, True if it was saved.
+        with self._condition:
+            while ticket.result is None and self._writing:
+                self._condition.wait()
+            if ticket.result is not None:
+                return ticket.result
+            self._writing = True
+            self._condition.wait_for(self._nobody_booking, timeout=self.window)
+
+        batch = []
+        success = False
+        start = time.perf_counter()
+        try:
+            with self._lock():
+                # Taken under the lock, so that no booking is made in memory between this and the write.
+                with self._condition:
+                    batch, self._pending = self._pending, []
+                success = self._write([pending.change for pending in batch])
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._condition:
+                for pending in batch:
+                    pending.result = success
+                self._writing = False
+                _record(self._stats, len(batch), success, elapsed)
+                self._condition.notify_all()
+        return ticket.result
+
+    def _nobody_booking(self) -> bool:
+        return self._preparing <= 0 and not (self._arriving and self._arriving())
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        # Waits for the write in progress, if any.
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and not self._writing, timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        # Every booking is written by the request that made it, there is nothing left to write.
+        self.flush(timeout)
+
+    def stats(self) -> dict:
+        # Returns the number of writes, the bookings they held and how long they took.
+        with self._condition:
+            stats = dict(self._stats)
+        return _with_means(stats)
+
+
+DURABILITIES = ('fsync', 'enqueue')
+# Write-behind persisters alive in this process, whose thread is started again in a forked child.
+_write_behind_persisters = weakref.WeakSet()
+
+
+def _after_fork():
+    for persister in list(_write_behind_persisters):
+        persister._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+class WriteBehindPersister:
+    # A background thread saves the bookings made in memory, every booking pending at once, so that requests do not
+    # do the write themselves. With durability "fsync" a request is still only answered once its booking is written,
+    # and a failed write fails every booking it held, as with group commit. With "enqueue" it is answered as soon as
+    # its booking is queued: the disk is off the request path, but bookings not written yet are lost if the process
+    # dies. Failed writes are then retried every retry_delay seconds, the bookings staying in memory.
+    #
+    # At most max_pending bookings wait to be written; further bookings wait for room before being made. close()
+    # writes what is pending and stops the thread; it is also called when the process exits.
+    #
+    # With "fsync", write(changes) is called under lock() as for group commit. With "enqueue", snapshot(changes) is
+    # called under lock() to serialize the records, and returns the function writing them, called once the lock is
+    # released so that bookings are not held up by the disk; it returns False, without undoing anything, on failure.
+    def __init__(self, write, snapshot, lock, durability: str = 'enqueue', max_pending: int = 1000,
+                 retry_delay: float = 1.0):
+        if durability not in DURABILITIES:
+            raise ValueError(f"Unknown durability: {durability}")
+        self.durability = durability
+        self.max_pending = max_pending
+        self.retry_delay = retry_delay
+        self._write = write
+        self._snapshot = snapshot
+        self._lock = lock
+        self._condition = threading.Condition()
+        self._preparing = 0
+        self._pending = []
+        self._writing = 0
+        self._stopping = False
+        self._stats = {"commits": 0, "failures": 0, "bookings": 0, "batch_size_max": 0,
+                       "commit_seconds_total": 0.0, "commit_seconds_max": 0.0,
+                       "backpressure_waits": 0, "backpressure_seconds_total": 0.0}
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+        _write_behind_persisters.add(self)
+        atexit.register(self.close)
+
+    def _after_fork(self):
+        # The thread is not copied into a forked process: the child starts its own. The bookings pending in the
+        # parent are written by the parent.
+        self._condition = threading.Condition()
+        self._preparing = 0
+        self._pending = []
+        self._writing = 0
+        if not self._stopping:
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+
+    def begin(self):
+        # Waits while the queue is full.
+        with self._condition:
+            if self._preparing + len(self._pending) >= self.max_pending:
+                start = time.perf_counter()
+                self._condition.wait_for(lambda: self._preparing + len(self._pending) < self.max_pending)
+                self._stats["backpressure_waits"] += 1
+                self._stats["backpressure_seconds_total"] += time.perf_counter() - start
+            self._preparing += 1
+
+    def abandon(self):
+        with self._condition:
+            self._preparing -= 1
+            self._condition.notify_all()
+
+    def submit(self, change) -> _Ticket:
+        ticket = _Ticket(change)
+        with self._condition:
+            self._preparing -= 1
+            self._pending.append(ticket)
+            self._condition.notify_all()
+        return ticket
+
+    def wait(self, ticket: _Ticket) -> bool:
+        if self.durability == 'enqueue':
+            return True
+        with self._condition:
+            self._condition.wait_for(lambda: ticket.result is not None)
+            return ticket.result
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._stopping)
+                if not self._pending:
+                    return
+            if not self._write_pending():
+                with self._condition:
+                    if self._stopping:
+                        return
+                    self._condition.wait(self.retry_delay)
+
+    def _write_pending(self) -> bool:
+        batch = []
+        success = False
+        start = time.perf_counter()
+        undo = self.durability == 'fsync'
+        try:
+            with self._lock():
+                with self._condition:
+                    batch, self._pending = self._pending, []
+                    self._writing = len(batch)
+                changes = [pending.change for pending in batch]
+                if undo:
+                    success = self._write(changes)
+                else:
+                    write_snapshot = self._snapshot(changes)
+            if not undo:
+                success = write_snapshot()
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._condition:
+                if success or undo:
+                    for pending in batch:
+                        pending.result = success
+                else:
+                    # Still in memory and already acknowledged: written with the next attempt.
+                    self._pending[:0] = batch
+                self._writing = 0
+                _record(self._stats, len(batch), success, elapsed)
+                self._condition.notify_all()
+        if not success and not undo:
+            print(f"Error saving {len(batch)} booking(s), retrying in {self.retry_delay}s")
+        return success
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        # Waits until every booking queued so far is written. Returns False if some are still pending.
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and not self._writing, timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        with self._condition:
+            if self._pending:
+                print(f"{len(self._pending)} booking(s) could not be saved")
+
+    def stats(self) -> dict:
+        with self._condition:
+            stats = dict(self._stats, pending=len(self._pending), durability=self.durability)
+        return _with_means(stats)
@@ -0,0 +1,176 @@
+import os
+import sys
+import time
+import random
+import cProfile
+import pstats
+import threading
+from typing import Optional
+
+from flask import Blueprint, current_app, g, render_template, request, stream_template
+from itsdangerous import BadSignature, TimestampSigner
+
+import data_access
+from utils import validate_purchase
+from config import get_config
+
+# Profiles single requests in production. A request is profiled when it comes with a valid X-Profile-Token header
+# (see profile_token()), or at random for a share sample_rate of the requests. Its cProfile stats are written to the
+# profiling directory, which keeps the max_files most recent ones, and the response gets a Server-Timing header with
+# the time spent loading, checking, saving and rendering, taken from those stats.
+#
+# Without a profiling directory, requests are never profiled, and each one only pays for reading a setting.
+
+PROFILE_HEADER = 'X-Profile-Token'
+# Salt of the signatures of the tokens, so that no other signed value of the application is a valid token.
+TOKEN_SALT = 'gudlft-profiling'
+
+# Functions whose time is reported for each phase of a request. Time spent in a function called by another one of
+# the same phase is only counted once.
+PHASES = {
+    "load": (data_access.load_clubs, data_access.load_competitions, data_access.get_club_by_name,
+             data_access.get_club_by_email, data_access.get_competition_by_name),
+    "validate": (validate_purchase,),
+    "save": (data_access.apply_booking, data_access.apply_bookings, data_access.save_clubs,
+             data_access.save_competitions),
+    "render": (render_template, stream_template),
+}
+
+# Settings of an application that did not call init_app(): profiling disabled.
+_disabled = {"directory": None, "sample_rate": 0.0, "max_files": 100, "token_max_age": 3600}
+# cProfile can only profile one request at a time in a process; requests arriving meanwhile are not profiled.
+_profiling = threading.Lock()
+
+
+def init_app(app, directory: Optional[str], sample_rate: float = 0.0, max_files: int = 100,
+             token_max_age: int = 3600):
+    # Sets the directory of the stats of the application, None to disable profiling, the share of requests profiled
+    # at random, the number of stats files kept and how many seconds a token stays valid.
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    app.extensions['profiling'] = {"directory": directory or None, "sample_rate": sample_rate,
+                                   "max_files": max_files, "token_max_age": token_max_age}
+
+
+def _settings() -> dict:
+    return current_app.extensions.get('profiling', _disabled)
+
+
+def _signer(secret_key) -> TimestampSigner:
+    return TimestampSigner(secret_key, salt=TOKEN_SALT)
+
+
+def profile_token(secret_key) -> str:
+    # Returns a token that profiles the requests sending it in the X-Profile-Token header, for token_max_age seconds.
+    return _signer(secret_key).sign('profile').decode()
+
+
+def _valid_token(token: str) -> bool:
+    try:
+        _signer(current_app.secret_key).unsign(token, max_age=_settings()["token_max_age"])
+    except BadSignature:
+        return False
+    return True
+
+
+def _function_key(function) -> tuple:
+    # Key of the function in the stats of cProfile, the function itself for functions decorated with metrics.
+    code = getattr(function, '__wrapped__', function).__code__
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+def phase_seconds(stats: pstats.Stats) -> dict:
+    # Returns the seconds spent in each phase, from the cumulative time of its functions.
+    seconds = {}
+    for phase, functions in PHASES.items():
+        keys = {_function_key(function) for function in functions}
+        total = 0.0
+        for key in keys:
+            entry = stats.stats.get(key)
+            if entry is None:
+                continue
+            callers = entry[4]
+            # Calls made by another function of the phase are already in its cumulative time.
+            inner = sum(caller[3] for caller_key, caller in callers.items() if caller_key in keys)
+            total += entry[3] - inner
+        seconds[phase] = total
+    return seconds
+
+
+def server_timing(seconds: dict, total: float) -> str:
+    # Server-Timing header value, in milliseconds.
+    entries = [f"{phase};dur={phase_time * 1000:.2f}" for phase, phase_time in seconds.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ', '.join(entries)
+
+
+def _rotate(directory: str, max_files: int):
+    # Removes the oldest stats files beyond max_files.
+    try:
+        with os.scandir(directory) as entries:
+            files = sorted((entry for entry in entries if entry.name.endswith('.prof')),
+                           key=lambda entry: entry.stat().st_mtime_ns)
+        for entry in files[:max(len(files) - max_files, 0)]:
+            os.remove(entry.path)
+    except OSError as error:
+        print(f"Error removing old profiles from {directory}: {error}")
+
+
+profiling = Blueprint('profiling', __name__)
+
+
+@profiling.before_app_request
+def _start_profile():
+    settings = _settings()
+    if settings["directory"] is None:
+        return
+    token = request.headers.get(PROFILE_HEADER)
+    if token is not None:
+        if not _valid_token(token):
+            return
+    elif not (settings["sample_rate"] and random.random() < settings["sample_rate"]):
+        return
+    if not _profiling.acquire(blocking=False):
+        return
+    g.profile = cProfile.Profile()
+    g.profile_start = time.perf_counter()
+    g.profile.enable()
+
+
+@profiling.after_app_request
+def _end_profile(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    profile.disable()
+    _profiling.release()
+    total = time.perf_counter() - g.pop('profile_start')
+
+    stats = pstats.Stats(profile)
+    response.headers['Server-Timing'] = server_timing(phase_seconds(stats), total)
+    settings = _settings()
+    directory = settings["directory"]
+    file_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1e6) % 1000000:06d}-{request.endpoint}.prof"
+    try:
+        stats.dump_stats(os.path.join(directory, file_name))
+    except OSError as error:
+        print(f"Error writing the profile {file_name}: {error}")
+    _rotate(directory, settings["max_files"])
+    return response
+
+
+@profiling.teardown_app_request
+def _abandon_profile(exception=None):
+    # A request ended by an exception does not go through _end_profile().
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile.disable()
+        _profiling.release()
+
+
+if __name__ == '__main__':
+    # Prints a token for the X-Profile-Token header, signed with the secret key of the configuration.
+    if len(sys.argv) > 1:
+        print("Usage: python profiling.py")
+        sys.exit(1)
+    print(profile_token(get_config().SECRET_KEY))
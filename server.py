@@ -1,42 +1,100 @@
-from flask import Flask, render_template, request, redirect, flash, url_for
+import os
+import gc
+import threading
+from uuid import uuid4
+
+from flask import Flask, current_app, render_template, stream_template, request, redirect, flash, url_for
+from flask import make_response
+from flask import message_flashed
 from datetime import datetime
+from dataclasses import replace
 
 from constants import EMAIL_NOT_FOUND_ERROR
 from constants import EMAIL_EMPTY_ERROR
-from constants import INSUFFICIENT_PLACES_MESSAGE
-from constants import INSUFFICIENT_POINTS_MESSAGE
 from constants import BOOKING_COMPLETE_MESSAGE
-from constants import INVALID_PLACES_MESSAGE
-from constants import NON_POSITIVE_PLACES_MESSAGE
-from constants import INVALID_POINTS_MESSAGE
 from constants import INVALID_CLUB_OR_COMPETITION
-from constants import MAX_PLACES_PER_BOOKING_MESSAGE
-from constants import INVALID_DATE_FORMAT_MESSAGE
-from constants import PAST_COMPETITION_BOOKING_ERROR_MESSAGE
 from constants import LOADING_MESSAGE_ERROR
 from constants import SAVE_CHANGES_MESSAGE_ERROR
-from constants import COMPETITION_FULL_MESSAGE
 from constants import ERROR_MESSAGE_RETRY
+from constants import EMPTY_BATCH_MESSAGE
+from constants import IDEMPOTENCY_KEY_REUSED_MESSAGE
+from constants import INSUFFICIENT_PLACES_MESSAGE
 
-from utils import parse_competition_date
-from utils import is_competition_past
-from utils import purchase_limit
+from utils import validate_purchase
+from utils import competition_filters
 
+import data_access
 from data_access import load_clubs
 from data_access import load_competitions
-from data_access import save_clubs
-from data_access import save_competitions
+from data_access import apply_booking
+from data_access import apply_bookings
+from data_access import get_club_by_name
+from data_access import find_club_by_email
+from data_access import find_club_by_name
+from data_access import find_competition_by_name
+from data_access import data_lock_path
+from data_access import competition_date
+from data_access import competitions_page
+from data_access import clubs_page
+from data_access import CLUB_ORDERS
+from data_access import cache_stats
+from data_access import persistence_stats
+from data_access import data_file_sizes
+
+from models import Booking
+
+from locks import booking_lock
+from locks import bookings_lock
+from locks import lock_stats
+
+from config import get_config
+from config import DATA_PATH_SETTINGS
+
+from http_cache import conditional
+
+import fragment_cache
+from fragment_cache import cached_fragment
+from fragment_cache import fragment_cache_stats
+
+import idempotency
+from idempotency import idempotent
+from idempotency import keep_outcome
+from idempotency import idempotency_stats
+
+import holds
+from holds import place_hold
+from holds import without_holds
+from holds import hold_stats
+
+import metrics
+from metrics import count_booking
+
+import profiling
+
+from api import api
+from api import error_code
+
+# Routes whose flashed messages tell how a booking ended.
+BOOKING_ENDPOINTS = ('purchase_places', 'purchase_places_batch')
+
+
+def _count_booking_outcome(sender, message, category, **extra):
+    # The booking was made, or refused for the reason of the message. The messages of the batch route start with the
+    # name of the competition of the line, and the confirmation of each line is not an outcome.
+    if request.endpoint not in BOOKING_ENDPOINTS:
+        return
+    if message == BOOKING_COMPLETE_MESSAGE:
+        count_booking('booked')
+        return
+    code = error_code(message.rsplit(': ', 1)[-1])
+    if code != 'unknown_error':
+        count_booking(code)
 
-app = Flask(__name__)
-app.secret_key = 'something_special'
 
-
-@app.route('/')
 def index():
     return render_template('index.html')
 
 
-@app.route('/show-summary', methods=['POST'])
 def show_summary():
     email = request.form.get('email')
     clubs = load_clubs()
@@ -53,31 +111,85 @@ def show_summary():
         return redirect(url_for('index'))
 
     # Search for the club corresponding to the provided email
-    club = next((c for c in clubs if c['email'] == email), None)
+    club = find_club_by_email(clubs, email)
     if not club:
         flash(EMAIL_NOT_FOUND_ERROR)
         return redirect(url_for('index'))
-    return render_template('welcome.html', club=club, competitions=competitions)
+    return _render_welcome(club, competitions)
+
+
+def _render_welcome(club, competitions):
+    # The summary page lists one page of the competitions, by date: by default the upcoming ones, or those matching
+    # the filters sent with the request (see utils.competition_filters).
+    filters = competition_filters(request.values, datetime.now())
+    page, next_cursor = competitions_page(competitions, page_size=current_app.config['COMPETITIONS_PER_PAGE'],
+                                          **filters)
+    filter_values = {name: request.values.get(name, '') for name in ('from', 'to', 'available', 'name', 'past')}
+    # The list itself only depends on the club and the competitions of the page, and is rendered once per version.
+    competitions_list = cached_fragment(
+        'competitions_list', (club['name'], tuple(competition['name'] for competition in page)),
+        lambda: render_template('competitions_list.html', club=club, competitions=page))
+    return render_template('welcome.html', club=club, competitions=page, next_cursor=next_cursor,
+                           filters=filter_values, competitions_list=competitions_list)
 
 
-@app.route('/book/<competition>/<club>')
 def book(competition, club):
     clubs = load_clubs()
     competitions = load_competitions()
 
     # Search for the corresponding competition and club
-    found_club = next((c for c in clubs if c['name'] == club), None)
-    found_competition = next((c for c in competitions if c['name'] == competition), None)
+    found_club = find_club_by_name(clubs, club)
+    found_competition = find_competition_by_name(competitions, competition)
 
+    # Each form gets its own idempotency key, so that sending it twice only books once. The page is never cached, so
+    # that the next form sent never reuses the key of a booking already made.
     if found_club and found_competition:
-        return render_template('booking.html', club=found_club, competition=found_competition)
+        # Sent with places (the Hold button), the places are held for the club while it fills in the form.
+        hold = None
+        if request.method == 'POST' and current_app.config['HOLD_SECONDS'] > 0:
+            hold = _hold_places(found_club, found_competition['name'], request.form.get('places'))
+        response = make_response(render_template('booking.html', club=found_club, competition=found_competition,
+                                                 idempotency_key=uuid4().hex, hold=hold,
+                                                 hold_seconds=current_app.config['HOLD_SECONDS']))
+        response.cache_control.no_store = True
+        return response
     else:
         flash(ERROR_MESSAGE_RETRY)
         return render_template('welcome.html', club=club, competition=competitions)
 
 
-@app.route('/purchase-places', methods=['POST'])
+def _hold_places(club, competition_name, places):
+    # Holds the places if the club could book them now, without counting the places held by other clubs. Flashes why
+    # otherwise.
+    with booking_lock(competition_name, club['name'], data_lock_path()):
+        competitions = load_competitions()
+        competition = find_competition_by_name(competitions, competition_name)
+        places_required, error_message = validate_purchase(club, without_holds(competition, club['name']), places,
+                                                           datetime.now(), competition_date(competitions, competition))
+        hold = None if error_message else place_hold(competition, club['name'], places_required)
+    if error_message or hold is None:
+        flash(error_message or INSUFFICIENT_PLACES_MESSAGE)
+    return hold
+
+
+def _idempotency_key_reused():
+    flash(IDEMPOTENCY_KEY_REUSED_MESSAGE)
+    return redirect(url_for('index'))
+
+
+@idempotent(('competition', 'club', 'places'), _idempotency_key_reused)
 def purchase_places():
+    # Get the data form the form.
+    competition_name = request.form.get('competition')
+    club_name = request.form.get('club')
+
+    # Bookings for the same competition or by the same club run one at a time, in this process and across worker
+    # processes, so the checks below always see the places and points left by the previous booking.
+    with booking_lock(competition_name, club_name, data_lock_path()):
+        return _purchase_places(competition_name, club_name)
+
+
+def _purchase_places(competition_name, club_name):
     clubs = load_clubs()
     competitions = load_competitions()
 
@@ -86,118 +198,264 @@ def purchase_places():
         flash(LOADING_MESSAGE_ERROR)
         return redirect(url_for('index'))
 
-    # Get the data form the form.
-    competition_name = request.form.get('competition')
-    club_name = request.form.get('club')
-
     # Search for the corresponding competition and club.
-    selected_competition = next((c for c in competitions if c['name'] == competition_name), None)
-    selected_club = next((c for c in clubs if c['name'] == club_name), None)
+    selected_competition = find_competition_by_name(competitions, competition_name)
+    selected_club = find_club_by_name(clubs, club_name)
 
     # Check if the competition and club were found.
     if not selected_competition or not selected_club:
         flash(INVALID_CLUB_OR_COMPETITION)
         return redirect(url_for('index'))
 
-    # Parse the competition date
-    competition_date = parse_competition_date(selected_competition['date'])
-    if competition_date is None:
-        flash(INVALID_DATE_FORMAT_MESSAGE)
+    # Check the date, the number of places requested, the club's points and the places left, apart from those held by
+    # other clubs.
+    places_required, error_message = validate_purchase(selected_club,
+                                                       without_holds(selected_competition, selected_club['name']),
+                                                       request.form.get('places'), datetime.now(),
+                                                       competition_date(competitions, selected_competition))
+    if error_message:
+        flash(error_message)
         return redirect(url_for('book', competition=selected_competition['name'], club=selected_club['name']))
 
-    # Get current date
-    current_date = datetime.now()
-
-    # Check if the competition has already passed.
-    if is_competition_past(competition_date, current_date):
-        flash(PAST_COMPETITION_BOOKING_ERROR_MESSAGE)
+    # If the checks are correct, the backend takes the places and points and records the booking, all at once.
+    save_success = apply_booking(selected_competition['name'], selected_club['name'], places_required)
+    if not save_success:
+        flash(SAVE_CHANGES_MESSAGE_ERROR)
         return redirect(url_for('book', competition=selected_competition['name'], club=selected_club['name']))
 
-    # Check that the number of places requested is valid.
-    try:
-        places_required = int(request.form['places'])
+    # Generate and display the confirmation message
+    booking_confirmation_message = (f"You have reserved {places_required} place(s) for the competition"
+                                    f" {selected_competition['name']}.")
+    flash(BOOKING_COMPLETE_MESSAGE)
+    flash(booking_confirmation_message)
+    keep_outcome()
 
-        remaining_places_limit = purchase_limit(selected_club, selected_competition)
+    # Show the points and places as they are after the booking.
+    return _render_welcome(get_club_by_name(selected_club['name']), load_competitions())
 
-        # "Check that the required places are not equal to or less than 0."
-        if places_required <= 0:
-            flash(NON_POSITIVE_PLACES_MESSAGE)
-            return redirect(url_for('book', competition=selected_competition['name'], club=selected_club['name']))
 
-        # Check that the number of places requested does not exceed 12.
-        if places_required > 12:
-            flash(MAX_PLACES_PER_BOOKING_MESSAGE)
-            return redirect(url_for('book', competition=selected_competition['name'], club=selected_club['name']))
+def purchase_places_batch():
+    # Books places in several competitions at once. Each line is a competition field and the places field that
+    # follows it; lines without places are ignored.
+    club_name = request.form.get('club')
+    lines = [(competition_name, places) for competition_name, places
+             in zip(request.form.getlist('competition'), request.form.getlist('places')) if places.strip()]
 
-        # "Check that the required places do not exceed the allowed places limit."
-        if places_required > remaining_places_limit:
-            flash(f"You can only book {remaining_places_limit} more place(s) for this competition.")
-            return redirect(url_for('book', competition=selected_competition['name'], club=selected_club['name']))
+    with bookings_lock([competition_name for competition_name, _ in lines], club_name, data_lock_path()):
+        return _purchase_places_batch(club_name, lines)
 
-        points_to_use = places_required
-    except ValueError:
-        flash(INVALID_PLACES_MESSAGE)
-        return redirect(url_for('book', competition=selected_competition['name'], club=selected_club['name']))
 
-    # Check if the club has enough points.
-    try:
-        available_points = int(selected_club['points'])
-        if available_points < places_required:
-            flash(INSUFFICIENT_POINTS_MESSAGE)
-            return redirect(url_for('book', competition=selected_competition['name'], club=selected_club['name']))
-    except ValueError:
-        flash(INVALID_POINTS_MESSAGE)
-        return redirect(url_for('book', competition=selected_competition['name'], club=selected_club['name']))
-
-    # Check if there are enough places available in the competition.
-    try:
-        number_of_places = int(selected_competition['numberOfPlaces'])
-    except ValueError:
-        flash('Invalid number of places')
-        return redirect(url_for('book', competition=selected_competition['name'], club=selected_club['name']))
-    # Check if the competition is already full
-    if number_of_places <= 0:
-        flash(COMPETITION_FULL_MESSAGE)
-        return redirect(url_for('book', competition=selected_competition['name'], club=selected_club['name']))
+def _purchase_places_batch(club_name, lines):
+    clubs = load_clubs()
+    competitions = load_competitions()
 
-    if number_of_places < points_to_use:
-        flash(INSUFFICIENT_PLACES_MESSAGE)
-        return redirect(url_for('book', competition=selected_competition['name'], club=selected_club['name']))
+    # Verify if the clubs and competitions were loaded correctly.
+    if not clubs or not competitions:
+        flash(LOADING_MESSAGE_ERROR)
+        return redirect(url_for('index'))
 
-    # If the checks are correct, we update the points and places.
-    club_name = selected_club['name']
-    if club_name in selected_competition['bookings']:
-        selected_competition['bookings'][club_name] += places_required
-    else:
-        selected_competition['bookings'][club_name] = places_required
+    selected_club = find_club_by_name(clubs, club_name)
+    if not selected_club:
+        flash(INVALID_CLUB_OR_COMPETITION)
+        return redirect(url_for('index'))
 
-    selected_club['points'] = str(available_points - points_to_use)
-    selected_competition['numberOfPlaces'] = str(number_of_places - places_required)
+    if not lines:
+        flash(EMPTY_BATCH_MESSAGE)
+        return _render_welcome(selected_club, competitions)
 
-    # Save changes if all checks are correct
-    save_success = save_clubs(clubs) and save_competitions(competitions)
-    if not save_success:
+    # Check every line as purchase_places would, as if the previous lines had already been booked.
+    current_date = datetime.now()
+    bookings = []
+    error_messages = []
+    for competition_name, places in lines:
+        selected_competition = find_competition_by_name(competitions, competition_name)
+        if not selected_competition:
+            error_messages.append(f"{competition_name}: {INVALID_CLUB_OR_COMPETITION}")
+            continue
+        places_required, error_message = validate_purchase(_after_bookings(selected_club, bookings),
+                                                           _after_bookings(without_holds(selected_competition,
+                                                                                         selected_club['name']),
+                                                                           bookings, selected_club['name']),
+                                                           places, current_date,
+                                                           competition_date(competitions, selected_competition))
+        if error_message:
+            error_messages.append(f"{competition_name}: {error_message}")
+        else:
+            bookings.append(Booking(competition_name, places_required))
+
+    # Nothing is booked unless every line can be.
+    if error_messages:
+        for error_message in error_messages:
+            flash(error_message)
+        return _render_welcome(selected_club, competitions)
+
+    # All the bookings are saved together, in a single write.
+    if not apply_bookings(selected_club['name'], bookings):
         flash(SAVE_CHANGES_MESSAGE_ERROR)
-        return redirect(url_for('book', competition=selected_competition['name'], club=selected_club['name']))
+        return _render_welcome(selected_club, load_competitions())
 
-    # Generate and display the confirmation message
-    booking_confirmation_message = (f"You have reserved {places_required} place(s) for the competition"
-                                    f" {selected_competition['name']}.")
     flash(BOOKING_COMPLETE_MESSAGE)
-    flash(booking_confirmation_message)
+    for competition_name, places_required in bookings:
+        flash(f"You have reserved {places_required} place(s) for the competition {competition_name}.")
+
+    # Show the points and places as they are after the bookings.
+    return _render_welcome(get_club_by_name(selected_club['name']), load_competitions())
+
 
-    return render_template('welcome.html', club=selected_club, competitions=competitions)
+def _after_bookings(record, bookings, club_name=None):
+    # Returns a copy of the club (or of the competition, when the club name is given) as it would be once the
+    # bookings checked so far are made. The record itself is returned when they do not change it.
+    if club_name is None:
+        places = sum(places for _, places in bookings)
+        return record if not places else replace(record, points=record.points - places)
 
+    places = sum(places for competition_name, places in bookings if competition_name == record.name)
+    if not places:
+        return record
+    competition_bookings = dict(record.bookings)
+    competition_bookings[club_name] = competition_bookings.get(club_name, 0) + places
+    return replace(record, number_of_places=record.number_of_places - places, bookings=competition_bookings)
 
-@app.route('/club-points')
+
+@conditional()
 def club_points():
+    # ?sort=name or ?sort=points orders the clubs, and ?page=N lists them CLUB_POINTS_PER_PAGE at a time. With
+    # ?stream=1, or CLUB_POINTS_STREAMING in the configuration, the rows are sent as they are rendered instead of
+    # building the whole page in memory first.
     clubs = load_clubs()
     if not clubs:
         flash(LOADING_MESSAGE_ERROR)
         return redirect(url_for('index'))
-    return render_template('club_points.html', clubs=clubs)
+
+    sort_by = request.args.get('sort') if request.args.get('sort') in CLUB_ORDERS else None
+    page = request.args.get('page', type=int)
+    page_size = current_app.config['CLUB_POINTS_PER_PAGE'] if page is not None else None
+
+    def table_context():
+        page_clubs, has_next = clubs_page(clubs, sort_by, page or 1, page_size)
+        return {"clubs": page_clubs, "sort": sort_by, "page": page, "has_next": has_next}
+
+    if request.args.get('stream') == '1' or current_app.config['CLUB_POINTS_STREAMING']:
+        return stream_template('club_points.html', **table_context())
+
+    # The table is the same for every visitor until the clubs change, so it is only rendered (and sorted) once per
+    # version of the data.
+    club_points_table = cached_fragment('club_points_table', (sort_by, page, page_size),
+                                        lambda: render_template('club_points_table.html', **table_context()))
+    return render_template('club_points.html', sort=sort_by, page=page, club_points_table=club_points_table)
 
 
-@app.route('/logout')
 def logout():
     return redirect(url_for('index'))
+
+
+# Whether the data of an application was preloaded in this process, and the lock creating server.app.
+_preloaded = False
+_app_lock = threading.Lock()
+
+# Routes of the pages: (rule, view, methods). The endpoint of each route is the name of its view.
+ROUTES = (
+    ('/', index, ('GET',)),
+    ('/show-summary', show_summary, ('POST',)),
+    ('/book/<competition>/<club>', book, ('GET', 'POST')),
+    ('/purchase-places', purchase_places, ('POST',)),
+    ('/purchase-places/batch', purchase_places_batch, ('POST',)),
+    ('/club-points', club_points, ('GET',)),
+    ('/logout', logout, ('GET',)),
+)
+
+
+def create_app(config=None) -> Flask:
+    # Builds the application from the configuration named by FLASK_ENV, updated with config: a configuration class
+    # (see config) or a dict of settings. Everything that only depends on the configuration is done here, once:
+    # resolving the data paths, creating the storage backend and the state of the modules below, which each
+    # application keeps in app.extensions.
+    app = Flask(__name__)
+    app.config.from_object(get_config())
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    # Relative data paths are taken from the root of the repository, whatever the working directory.
+    for name in DATA_PATH_SETTINGS:
+        if app.config.get(name):
+            app.config[name] = os.path.join(app.root_path, app.config[name])
+
+    # The storage backend is chosen once, from the configuration.
+    data_access.init_app(app)
+
+    # Rendered parts of the pages kept in memory, see fragment_cache.
+    fragment_cache.init_app(app, app.config['FRAGMENT_CACHE_BYTES'])
+
+    # Responses to the bookings made with an idempotency key, given again to retries, see idempotency.
+    idempotency.init_app(app, app.config['IDEMPOTENCY_TTL'], app.config['IDEMPOTENCY_MAX_ENTRIES'],
+                         app.config['IDEMPOTENCY_DIRECTORY'])
+
+    # Places held for the clubs filling in a booking form, see holds.
+    holds.init_app(app, app.config['HOLD_SECONDS'], app.config['HOLDS_FILE'])
+
+    # Latencies and counters of the application in the Prometheus format, under /metrics, see metrics.
+    metrics.init_app(app, app.config['METRICS_DIRECTORY'], app.config['METRICS_FLUSH_SECONDS'])
+    metrics.register_stats(app, 'locks', lock_stats)
+    metrics.register_stats(app, 'records_cache', cache_stats)
+    metrics.register_stats(app, 'fragment_cache', fragment_cache_stats)
+    metrics.register_stats(app, 'persistence', persistence_stats)
+    metrics.register_stats(app, 'idempotency', idempotency_stats)
+    metrics.register_stats(app, 'holds', hold_stats)
+    metrics.register_stats(app, 'data_file', lambda: {name: {"size_bytes": size}
+                                                      for name, size in data_file_sizes().items()}, label='file')
+    app.register_blueprint(metrics.metrics)
+
+    # Requests profiled on demand, with their cProfile stats written to a directory, see profiling.
+    profiling.init_app(app, app.config['PROFILING_DIRECTORY'], app.config['PROFILING_SAMPLE_RATE'],
+                       app.config['PROFILING_MAX_FILES'])
+    app.register_blueprint(profiling.profiling)
+
+    # JSON versions of the pages, under /api/v1.
+    app.register_blueprint(api)
+
+    for rule, view, methods in ROUTES:
+        app.add_url_rule(rule, view_func=view, methods=methods)
+    message_flashed.connect(_count_booking_outcome, app)
+
+    if app.config['PRELOAD_DATA']:
+        warm_up(app)
+    return app
+
+
+def warm_up(app: Flask):
+    # Loads and indexes the clubs and competitions, and compiles every template, so that the first requests find
+    # them ready. With gunicorn --preload, this runs before the workers are forked: they share these pages of memory
+    # until they change them.
+    global _preloaded
+    with app.app_context():
+        load_clubs()
+        load_competitions()
+    for template_name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(template_name)
+    _preloaded = True
+
+
+def _before_fork():
+    # Runs in the process about to fork a worker. The objects preloaded are moved out of reach of the garbage
+    # collector, whose passes would otherwise write to every shared page and copy it into each worker. A process that
+    # never forks keeps collecting them.
+    if _preloaded:
+        gc.freeze()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_before_fork)
+
+
+def __getattr__(name):
+    # server.app, the application of "gunicorn server:app", is only created when it is first used, so that importing
+    # this module to call create_app() (gunicorn "server:create_app()", flask run, the tests) builds a single one.
+    global app
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _app_lock:
+        if 'app' not in globals():
+            app = create_app()
+    return app
@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import hashlib
+from typing import Optional
+
+# Layout of a data directory split into many small JSON files, so that a booking only rewrites the files of its club
+# and of its competitions instead of the two whole data files:
+#
+#     manifest.json                  the number of club buckets, and the names of the clubs and competitions in order
+#     version                        a token replaced after every write, which tells readers that something changed
+#     clubs/0042.json                the clubs whose name hashes to bucket 42, as {"clubs": [...]}
+#     competitions/<hash>.json       one competition with its bookings, as {"competitions": [...]}
+#
+# The records are the same as in the two data files, so each file is read and written like them by data_access.
+#
+# Convert the two data files into a sharded directory with:
+#     python sharded_storage.py data/production/sharded data/production/clubs.json data/production/competitions.json
+
+DEFAULT_BUCKETS = 64
+MANIFEST_FILE = 'manifest.json'
+VERSION_FILE = 'version'
+CLUBS_DIRECTORY = 'clubs'
+COMPETITIONS_DIRECTORY = 'competitions'
+
+
+def _name_hash(name: str) -> bytes:
+    # Stable across processes and Python versions, unlike hash().
+    return hashlib.blake2b(name.encode(), digest_size=8).digest()
+
+
+def club_bucket(name: str, buckets: int) -> int:
+    return int.from_bytes(_name_hash(name), 'big') % buckets
+
+
+def manifest_path(directory: str) -> str:
+    return os.path.join(directory, MANIFEST_FILE)
+
+
+def version_path(directory: str) -> str:
+    return os.path.join(directory, VERSION_FILE)
+
+
+def bucket_path(directory: str, bucket: int) -> str:
+    return os.path.join(directory, CLUBS_DIRECTORY, f"{bucket:04d}.json")
+
+
+def competition_path(directory: str, name: str) -> str:
+    # Competition names can hold any character, the file is named after their hash.
+    return os.path.join(directory, COMPETITIONS_DIRECTORY, f"{_name_hash(name).hex()}.json")
+
+
+def new_manifest(buckets: int = DEFAULT_BUCKETS) -> dict:
+    return {"buckets": buckets, "clubs": [], "competitions": []}
+
+
+def read_manifest(directory: str) -> Optional[dict]:
+    # Returns the manifest of the directory, or None if there is none or it cannot be read.
+    try:
+        with open(manifest_path(directory)) as m:
+            manifest = json.load(m)
+        if not isinstance(manifest["buckets"], int) or manifest["buckets"] <= 0:
+            raise ValueError(f"invalid number of buckets {manifest['buckets']!r}")
+        return {"buckets": manifest["buckets"], "clubs": list(manifest["clubs"]),
+                "competitions": list(manifest["competitions"])}
+    except FileNotFoundError:
+        return None
+    except (json.decoder.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        print(f"Error loading {manifest_path(directory)}: {e}")
+        return None
+
+
+def manifest_content(manifest: dict) -> str:
+    return json.dumps(manifest, separators=(',', ':'))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (4, 5):
+        print("Usage: python sharded_storage.py <directory> <clubs.json> <competitions.json> [buckets]")
+        sys.exit(1)
+    from data_access import shard_data_files
+    buckets = int(sys.argv[4]) if len(sys.argv) == 5 else DEFAULT_BUCKETS
+    if not shard_data_files(sys.argv[2], sys.argv[3], sys.argv[1], buckets):
+        sys.exit(1)
+    print(f"Split {sys.argv[2]} and {sys.argv[3]} into {sys.argv[1]}")
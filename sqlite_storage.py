@@ -0,0 +1,285 @@
+import sys
+import json
+import time
+import uuid
+import sqlite3
+from contextlib import contextmanager
+from typing import Optional
+
+# Storage of clubs, competitions and bookings in a SQLite database, using only the standard library. The functions
+# return and accept the same records as the JSON data files, so they can stand in for them in data_access.
+#
+# Import the JSON data files into a database with:
+#     python sqlite_storage.py data/production/gudlft.db data/production/clubs.json data/production/competitions.json
+
+MAX_PLACES_PER_CLUB = 12
+
+SCHEMA = """
+-- The version column of clubs and competitions is the version of the data (see meta) that last changed the row, so
+-- that a copy of the rows can be brought up to date by reading only the rows changed since.
+CREATE TABLE IF NOT EXISTS clubs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    email TEXT NOT NULL,
+    points INTEGER NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS clubs_email ON clubs (email COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS competitions (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    date TEXT NOT NULL,
+    number_of_places INTEGER NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS competitions_date ON competitions (date);
+
+CREATE TABLE IF NOT EXISTS bookings (
+    competition_id INTEGER NOT NULL REFERENCES competitions (id) ON DELETE CASCADE,
+    club_id INTEGER NOT NULL REFERENCES clubs (id) ON DELETE CASCADE,
+    places INTEGER NOT NULL,
+    PRIMARY KEY (competition_id, club_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS bookings_club ON bookings (club_id);
+
+-- A single row: an id of the database, and the version of its data, increased by every write made through this
+-- module, with the time of that write.
+CREATE TABLE IF NOT EXISTS meta (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    uid TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    modified REAL NOT NULL
+);
+"""
+
+# Created once the version columns exist, which databases created before them only get from connect().
+VERSION_INDEXES = """
+CREATE INDEX IF NOT EXISTS clubs_version ON clubs (version);
+CREATE INDEX IF NOT EXISTS competitions_version ON competitions (version);
+"""
+
+# The version the current write transaction will commit, given to the rows it changes.
+NEXT_VERSION = "(SELECT version + 1 FROM meta WHERE id = 1)"
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    # Opens the database in WAL mode, where readers never wait for the writer, and creates the tables if needed.
+    # isolation_level=None leaves transactions to the explicit BEGIN statements below.
+    connection = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA foreign_keys=ON")
+    connection.executescript(SCHEMA)
+    for table in ("clubs", "competitions"):
+        if "version" not in [column[1] for column in connection.execute(f"PRAGMA table_info({table})")]:
+            connection.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    connection.executescript(VERSION_INDEXES)
+    connection.execute("INSERT OR IGNORE INTO meta (id, uid, version, modified) VALUES (1, ?, 0, ?)",
+                       (uuid.uuid4().hex, time.time()))
+    return connection
+
+
+def data_version(connection: sqlite3.Connection) -> tuple:
+    # Returns the id of the database, the version of its data and the time of the last write.
+    return connection.execute("SELECT uid, version, modified FROM meta WHERE id = 1").fetchone()
+
+
+def _changed_since(since: Optional[int]) -> str:
+    # Condition on the version of the rows, searched through their version index, in the order of their id.
+    return "ORDER BY id" if since is None else "WHERE version > :since ORDER BY version, id"
+
+
+def load_clubs(connection: sqlite3.Connection, since: Optional[int] = None) -> list:
+    # Returns the clubs, or only those changed after the version since.
+    rows = connection.execute(f"SELECT name, email, points FROM clubs {_changed_since(since)}", {"since": since})
+    return [{"name": name, "email": email, "points": points} for name, email, points in rows]
+
+
+def load_competitions(connection: sqlite3.Connection, since: Optional[int] = None) -> list:
+    # Returns the competitions with their bookings, or only those changed after the version since.
+    competitions = {}
+    for name, date, number_of_places in connection.execute(
+            f"SELECT name, date, number_of_places FROM competitions {_changed_since(since)}", {"since": since}):
+        competitions[name] = {"name": name, "date": date, "numberOfPlaces": number_of_places, "bookings": {}}
+
+    bookings = connection.execute(
+        "SELECT competitions.name, clubs.name, bookings.places FROM bookings "
+        "JOIN competitions ON competitions.id = bookings.competition_id "
+        "JOIN clubs ON clubs.id = bookings.club_id" + ("" if since is None else
+                                                       " WHERE bookings.competition_id IN "
+                                                       "(SELECT id FROM competitions WHERE version > :since)"),
+        {"since": since})
+    for competition_name, club_name, places in bookings:
+        competitions[competition_name]["bookings"][club_name] = places
+    return list(competitions.values())
+
+
+def count(connection: sqlite3.Connection, table: str) -> int:
+    return connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def find_club(connection: sqlite3.Connection, field: str, value: str) -> Optional[dict]:
+    # Returns the first club whose name or email (compared without case, through the clubs_email index) is the value.
+    condition = "email = ? COLLATE NOCASE" if field == "email" else "name = ?"
+    row = connection.execute(f"SELECT name, email, points FROM clubs WHERE {condition} ORDER BY id LIMIT 1",
+                             (value,)).fetchone()
+    return None if row is None else {"name": row[0], "email": row[1], "points": row[2]}
+
+
+def find_competition(connection: sqlite3.Connection, name: str) -> Optional[dict]:
+    row = connection.execute("SELECT id, date, number_of_places FROM competitions WHERE name = ?",
+                             (name,)).fetchone()
+    if row is None:
+        return None
+    bookings = connection.execute("SELECT clubs.name, bookings.places FROM bookings "
+                                  "JOIN clubs ON clubs.id = bookings.club_id WHERE bookings.competition_id = ?",
+                                  (row[0],))
+    return {"name": name, "date": row[1], "numberOfPlaces": row[2], "bookings": dict(bookings)}
+
+
+@contextmanager
+def snapshot(connection: sqlite3.Connection):
+    # Reads made inside the block all see the database as it was when the first one was made.
+    connection.execute("BEGIN")
+    try:
+        yield
+    finally:
+        connection.execute("COMMIT")
+
+
+def save_clubs(connection: sqlite3.Connection, clubs_list) -> bool:
+    # Inserts or updates every club of the list and removes the clubs that are no longer in it.
+    try:
+        with _transaction(connection):
+            connection.executemany(
+                f"INSERT INTO clubs (name, email, points, version) VALUES (:name, :email, :points, {NEXT_VERSION}) "
+                "ON CONFLICT (name) DO UPDATE SET email = excluded.email, points = excluded.points, "
+                "version = excluded.version WHERE email IS NOT excluded.email OR points IS NOT excluded.points",
+                [{"name": c["name"], "email": c["email"], "points": int(c["points"])} for c in clubs_list])
+            # The bookings of the clubs removed go with them.
+            if _delete_missing(connection, "clubs", [c["name"] for c in clubs_list]):
+                connection.execute(f"UPDATE competitions SET version = {NEXT_VERSION}")
+        return True
+    except (sqlite3.Error, KeyError, TypeError, ValueError) as e:
+        print(f"Error saving clubs: {e}")
+        return False
+
+
+def save_competitions(connection: sqlite3.Connection, competitions_list) -> bool:
+    # Inserts or updates every competition of the list with its bookings and removes the competitions that are no
+    # longer in it.
+    try:
+        with _transaction(connection):
+            connection.executemany(
+                "INSERT INTO competitions (name, date, number_of_places) VALUES (:name, :date, :places) "
+                "ON CONFLICT (name) DO UPDATE SET date = excluded.date, number_of_places = excluded.number_of_places "
+                "WHERE date IS NOT excluded.date OR number_of_places IS NOT excluded.number_of_places",
+                [{"name": c["name"], "date": c["date"], "places": int(c["numberOfPlaces"])}
+                 for c in competitions_list])
+            _delete_missing(connection, "competitions", [c["name"] for c in competitions_list])
+
+            connection.execute("DELETE FROM bookings")
+            connection.executemany(
+                "INSERT INTO bookings (competition_id, club_id, places) "
+                "SELECT competitions.id, clubs.id, :places FROM competitions, clubs "
+                "WHERE competitions.name = :competition AND clubs.name = :club",
+                [{"competition": c["name"], "club": club_name, "places": int(places)}
+                 for c in competitions_list for club_name, places in c.get("bookings", {}).items()])
+            # Every booking was written again.
+            connection.execute(f"UPDATE competitions SET version = {NEXT_VERSION}")
+        return True
+    except (sqlite3.Error, KeyError, TypeError, ValueError) as e:
+        print(f"Error saving competitions: {e}")
+        return False
+
+
+def book_places(connection: sqlite3.Connection, competition_name: str, club_name: str, places: int) -> bool:
+    return book_places_batch(connection, club_name, [(competition_name, places)])
+
+
+def book_places_batch(connection: sqlite3.Connection, club_name: str, bookings) -> bool:
+    # Books places in one or more competitions, given as a list of (competition name, places), in one transaction.
+    # Each UPDATE only applies if the competition still has the places, the club still has the points and the club
+    # stays within its limit, so concurrent bookings can never oversell. Returns False, with nothing changed, if any
+    # of them did not apply.
+    try:
+        with _transaction(connection):
+            for competition_name, places in bookings:
+                parameters = {"competition": competition_name, "club": club_name, "places": places,
+                              "limit": MAX_PLACES_PER_CLUB}
+                updated = connection.execute(
+                    f"UPDATE competitions SET number_of_places = number_of_places - :places, version = {NEXT_VERSION} "
+                    "WHERE name = :competition AND number_of_places >= :places", parameters).rowcount
+                updated += connection.execute(
+                    f"UPDATE clubs SET points = points - :places, version = {NEXT_VERSION} "
+                    "WHERE name = :club AND points >= :places", parameters).rowcount
+                updated += connection.execute(
+                    "INSERT INTO bookings (competition_id, club_id, places) "
+                    "SELECT competitions.id, clubs.id, :places FROM competitions, clubs "
+                    "WHERE competitions.name = :competition AND clubs.name = :club AND 0 < :places "
+                    "AND :places <= :limit "
+                    "ON CONFLICT (competition_id, club_id) DO UPDATE SET places = places + excluded.places "
+                    "WHERE places + excluded.places <= :limit", parameters).rowcount
+                if updated != 3:
+                    raise _BookingRejected()
+        return True
+    except _BookingRejected:
+        return False
+    except sqlite3.Error as e:
+        print(f"Error booking places: {e}")
+        return False
+
+
+def import_json(connection: sqlite3.Connection, clubs_path: str, competitions_path: str) -> bool:
+    # One-shot import of the JSON data files. Clubs are imported first since bookings refer to them.
+    with open(clubs_path) as c:
+        clubs = json.load(c)["clubs"]
+    with open(competitions_path) as c:
+        competitions = json.load(c)["competitions"]
+    return save_clubs(connection, clubs) and save_competitions(connection, competitions)
+
+
+class _BookingRejected(Exception):
+    pass
+
+
+class _transaction:
+    # BEGIN IMMEDIATE takes the write lock up front, so a transaction never fails halfway on a busy database. Every
+    # committed transaction increases the version of the data.
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            try:
+                self.connection.execute("UPDATE meta SET version = version + 1, modified = ? WHERE id = 1",
+                                        (time.time(),))
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+        else:
+            self.connection.execute("ROLLBACK")
+        return False
+
+
+def _delete_missing(connection: sqlite3.Connection, table: str, names: list):
+    connection.execute("CREATE TEMP TABLE IF NOT EXISTS kept_names (name TEXT PRIMARY KEY)")
+    connection.execute("DELETE FROM kept_names")
+    connection.executemany("INSERT OR IGNORE INTO kept_names (name) VALUES (?)", [(name,) for name in names])
+    return connection.execute(f"DELETE FROM {table} WHERE name NOT IN (SELECT name FROM kept_names)").rowcount
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4:
+        print("Usage: python sqlite_storage.py <database> <clubs.json> <competitions.json>")
+        sys.exit(1)
+    database = connect(sys.argv[1])
+    if not import_json(database, sys.argv[2], sys.argv[3]):
+        sys.exit(1)
+    print(f"Imported {len(load_clubs(database))} clubs and {len(load_competitions(database))} competitions "
+          f"into {sys.argv[1]}")
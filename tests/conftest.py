@@ -1,16 +1,64 @@
+import threading
+
 import pytest
 
-from server import app
+import data_access
+from server import create_app
+from data_access import invalidate
+from data_access import configure_backend
+from data_access import InMemoryBackend
+
+
+@pytest.fixture
+def make_app(backend):
+    # Creates an application with the settings given, on top of the configuration, that stores its data in the
+    # backend of the test, and its idempotency keys and holds in memory.
+    def make_app(**settings):
+        created = create_app(dict({"TESTING": True, "PRELOAD_DATA": False, "IDEMPOTENCY_DIRECTORY": None,
+                                   "HOLDS_FILE": None}, **settings))
+        data_access.init_app(created, backend)
+        return created
+    return make_app
+
+
+@pytest.fixture
+def app(make_app):
+    # A new application for each test. pytest-flask runs the test in a request context of it, so that the functions
+    # of the modules called by the test use the state of this application.
+    return make_app()
 
 
 @pytest.fixture
-def client():
+def client(app):
     # Set up a test client.
-    app.config["TESTING"] = True
     with app.test_client() as client:
         yield client
 
 
+@pytest.fixture(autouse=True)
+def backend():
+    # Every test runs against its own empty in-memory storage, so no test reads or writes the data files. Tests store
+    # their data with backend.save_clubs() and backend.save_competitions().
+    invalidate()
+    backend = InMemoryBackend()
+    previous = configure_backend(backend)
+    yield backend
+    configure_backend(previous)
+    invalidate()
+
+
+@pytest.fixture
+def run_in_threads():
+    # Runs the target once per tuple of arguments, each in its own thread, and waits for all of them.
+    def run_in_threads(target, arguments):
+        threads = [threading.Thread(target=target, args=args) for args in arguments]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return run_in_threads
+
+
 @pytest.fixture
 def mock_load_clubs():
     # Mocks the load_clubs function.
@@ -34,40 +82,3 @@ def mock_load_competitions():
             "bookings": {}
         }
     ]
-
-
-class MockSaveFunction:
-    # A mock class designed to simulate a save function. It stores the last argument passed to it, allowing tests to
-    # verify if data was correctly passed to the mock function. It can also simulate success or failure of the save
-    # operation.
-    def __init__(self, should_succeed=True):
-        self.last_call_arg = None
-        self.should_succeed = should_succeed
-
-    def __call__(self, data):
-        self.last_call_arg = data
-        return self.should_succeed
-
-
-@pytest.fixture
-def mock_save_clubs():
-    # Returns a mock save function for clubs.
-    return MockSaveFunction(should_succeed=True)
-
-
-@pytest.fixture
-def mock_save_competitions():
-    # Returns a mock save function for competitions.
-    return MockSaveFunction(should_succeed=True)
-
-
-@pytest.fixture
-def mock_save_clubs_fail():
-    # Returns a mock save function for clubs that simulates a failure in saving.
-    return MockSaveFunction(should_succeed=False)
-
-
-@pytest.fixture
-def mock_save_competitions_fail():
-    # Returns a mock save function for competitions that simulates a failure in saving.
-    return MockSaveFunction(should_succeed=False)
@@ -0,0 +1,68 @@
+import os
+import sys
+import json
+import time
+import resource
+import subprocess
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+# Compares the peak memory and the time to first byte of /club-points rendered into one string (the default), streamed
+# (?stream=1), and as the first page of the clubs sorted by points. Each variant runs in its own process so that its
+# peak RSS is not hidden by a previous one. The clubs are generated (see datasets).
+#
+# Usage: python tests/performances_tests/bench_club_points.py [number_of_clubs]
+
+VARIANTS = {
+    "rendered": "/club-points",
+    "streamed": "/club-points?stream=1",
+    "sorted, first page": "/club-points?sort=points&page=1",
+    "sorted, streamed": "/club-points?sort=points&stream=1",
+}
+
+
+def measure(url, number_of_clubs):
+    # Runs in the child process: returns the time to the first chunk of the body, the total time and how much the
+    # peak RSS grew while the response was produced. The chunks are dropped, as a server writes them to the socket.
+    from server import create_app
+    from data_access import init_app
+    from data_access import InMemoryBackend
+    from datasets import generate_clubs
+
+    app = create_app({'PRELOAD_DATA': False, 'IDEMPOTENCY_DIRECTORY': None, 'HOLDS_FILE': None})
+    init_app(app, InMemoryBackend(generate_clubs(number_of_clubs)))
+    client = app.test_client()
+    client.get('/club-points?page=1')  # Loads the templates
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    response = client.get(url, buffered=False)
+    chunks = iter(response.response)
+    size = len(next(chunks))
+    first_byte = time.perf_counter() - start
+    for chunk in chunks:
+        size += len(chunk)
+    total = time.perf_counter() - start
+    response.close()
+
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"ttfb_ms": first_byte * 1000, "total_ms": total * 1000, "bytes": size,
+            "peak_rss_growth_mb": (rss_after - rss_before) / 1024}  # ru_maxrss is in kilobytes on Linux
+
+
+def run(number_of_clubs):
+    print(f"/club-points with {number_of_clubs} clubs")
+    print(f"  {'variant':<20} {'TTFB':>10} {'total':>10} {'body':>10} {'peak RSS growth':>16}")
+    for name, url in VARIANTS.items():
+        output = subprocess.run([sys.executable, __file__, '--child', url, str(number_of_clubs)],
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.splitlines()[-1])
+        print(f"  {name:<20} {result['ttfb_ms']:8.1f}ms {result['total_ms']:8.1f}ms "
+              f"{result['bytes'] / 1024:8.0f}KB {result['peak_rss_growth_mb']:14.1f}MB")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        print(json.dumps(measure(sys.argv[2], int(sys.argv[3]))))
+    else:
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
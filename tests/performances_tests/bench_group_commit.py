@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import data_access  # noqa: E402
+
+# Books places from many threads at once, as during a ticket release, with each booking written on its own, with
+# group commit and with write-behind, and prints the bookings per second and the size of the batches written. The
+# write-behind "enqueue" rate does not include the final flush.
+#
+# Usage: python tests/performances_tests/bench_group_commit.py [number_of_threads] [bookings_per_thread]
+
+
+def run_variant(directory, enable, number_of_threads, bookings_per_thread):
+    data_access.invalidate()
+    backend = data_access.JSONFileBackend(os.path.join(directory, 'clubs.json'),
+                                          os.path.join(directory, 'competitions.json'), compact=True)
+    backend.save_clubs([{"name": f"Club {i}", "email": f"club{i}@example.com", "points": 1000}
+                        for i in range(number_of_threads)])
+    backend.save_competitions([{"name": f"Competition {i}", "date": "2030-10-22 13:30:00", "numberOfPlaces": 10 ** 6,
+                                "bookings": {}} for i in range(bookings_per_thread)])
+    enable(backend)
+
+    def book(thread):
+        for booking in range(bookings_per_thread):
+            backend.apply_booking(f"Competition {booking}", f"Club {thread}", 1)
+
+    threads = [threading.Thread(target=book, args=(thread,)) for thread in range(number_of_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    rate = number_of_threads * bookings_per_thread / (time.perf_counter() - start)
+    persister = backend.persister
+    backend.close()
+    return rate, persister
+
+
+def run(number_of_threads, bookings_per_thread):
+    print(f"{number_of_threads} threads, {bookings_per_thread} bookings each")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, enable in (("one write per booking", lambda backend: None),
+                             ("group commit, no window", lambda backend: backend.enable_group_commit(0)),
+                             ("group commit, 5ms window", lambda backend: backend.enable_group_commit(0.005)),
+                             ("write-behind, fsync", lambda backend: backend.enable_write_behind("fsync")),
+                             ("write-behind, enqueue", lambda backend: backend.enable_write_behind("enqueue"))):
+            rate, persister = run_variant(directory, enable, number_of_threads, bookings_per_thread)
+            line = f"  {name:<26} {rate:8.0f} bookings/s"
+            if persister is not None:
+                stats = persister.stats()
+                line += (f"   batch size {stats['batch_size_mean']:.1f} (max {stats['batch_size_max']}), "
+                         f"commit {stats['commit_seconds_mean'] * 1000:.2f} ms")
+            print(line)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 32, int(sys.argv[2]) if len(sys.argv) > 2 else 20)
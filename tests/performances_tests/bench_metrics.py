@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import metrics  # noqa: E402
+from server import app  # noqa: E402
+
+# Prints what the metrics cost: one observation, a timed function against the same function untimed, a request with
+# all its timings, and rendering /metrics.
+#
+# Usage: python tests/performances_tests/bench_metrics.py [number]
+
+
+def per_call(function, number: int) -> float:
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def run(number):
+    histogram = metrics.Histogram('gudlft_bench_seconds', 'Bench.', ('operation',))
+    print(f"  observe()                {per_call(lambda: histogram.observe(0.003, 'bench'), number):8.2f} us")
+
+    def untimed():
+        return None
+    timed = histogram.time('bench')(untimed)
+    overhead = per_call(timed, number) - per_call(untimed, number)
+    print(f"  time() overhead per call {overhead:8.2f} us")
+
+    app.config['TESTING'] = True
+    client = app.test_client()
+    start = time.perf_counter()
+    for _ in range(number // 100):
+        client.get('/')
+    print(f"  GET / with metrics       {(time.perf_counter() - start) / (number // 100) * 1e6:8.2f} us")
+    print(f"  render /metrics          {per_call(metrics.render_metrics, 100):8.2f} us")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
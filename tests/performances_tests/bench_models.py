@@ -0,0 +1,59 @@
+import os
+import sys
+import gc
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from models import clubs_from_dicts  # noqa: E402
+from models import competitions_from_dicts  # noqa: E402
+from utils import validate_purchase  # noqa: E402
+from utils import parse_competition_date  # noqa: E402
+from datasets import generate_dataset  # noqa: E402
+
+# Compares clubs kept as the dicts of the data files with the Club records, on generated data (see datasets): memory
+# taken by the loaded clubs, and time to check a booking as purchase_places does for every request.
+#
+# Usage: python tests/performances_tests/bench_models.py [number_of_clubs]
+
+
+def measure_memory(build):
+    # Bytes allocated by build() and still held by what it returns.
+    gc.collect()
+    tracemalloc.start()
+    records = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return records, size
+
+
+def measure_validation(clubs, competitions, with_date):
+    # Time per validate_purchase call. The dicts need their date parsed on every call, the records already have it.
+    current_date = datetime.now()
+    start = time.perf_counter()
+    for i, club in enumerate(clubs):
+        competition = competitions[i % len(competitions)]
+        date = competition.parsed_date if with_date else parse_competition_date(competition['date'])
+        validate_purchase(club, competition, 1, current_date, date)
+    return (time.perf_counter() - start) / len(clubs)
+
+
+def run(number_of_clubs):
+    clubs, dict_competitions = generate_dataset(number_of_clubs, 100)
+    dict_clubs, dict_bytes = measure_memory(lambda: [dict(club) for club in clubs])
+    record_clubs, record_bytes = measure_memory(lambda: clubs_from_dicts(clubs))
+    record_competitions = competitions_from_dicts(dict_competitions)
+
+    print(f"{number_of_clubs} clubs")
+    print(f"  {'':<10} {'memory':>10} {'per club':>10} {'validate_purchase':>18}")
+    for name, size, time_per_call in (
+            ("dicts", dict_bytes, measure_validation(dict_clubs, dict_competitions, False)),
+            ("records", record_bytes, measure_validation(record_clubs, record_competitions, True))):
+        print(f"  {name:<10} {size / 1024 / 1024:8.1f}MB {size / number_of_clubs:8.0f} B "
+              f"{time_per_call * 1e6:15.2f} us")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
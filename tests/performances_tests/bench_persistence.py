@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import data_access  # noqa: E402
+from datasets import generate_dataset  # noqa: E402
+from datasets import make_bookable  # noqa: E402
+
+# Measures the cost of persisting one booking (save_clubs + save_competitions) with the previous truncate-and-rewrite
+# implementation and with the atomic write path, in its indented, compact and unchanged-data variants. Then compares
+# apply_booking with the two data files and with the sharded directory, which only rewrites the files it changes.
+# The clubs and competitions are generated (see datasets).
+#
+# Usage: python tests/performances_tests/bench_persistence.py [number_of_clubs] [number_of_competitions]
+
+
+def legacy_save(file_path, key, records):
+    # The implementation used before the atomic write path.
+    with open(file_path, 'w') as c:
+        json.dump({key: records}, c, indent=4)
+    return True
+
+
+def book_one_place(clubs, competitions, booking):
+    clubs[booking % len(clubs)]["points"] = booking
+    competitions[booking % len(competitions)]["numberOfPlaces"] = booking
+
+
+def run(number_of_clubs, number_of_competitions, repeat=20):
+    clubs, competitions = generate_dataset(number_of_clubs, number_of_competitions)
+    counter = iter(range(10 ** 9))
+
+    with tempfile.TemporaryDirectory() as directory:
+        clubs_file = os.path.join(directory, 'clubs.json')
+        competitions_file = os.path.join(directory, 'competitions.json')
+        data_access.configure_backend(data_access.JSONFileBackend(clubs_file, competitions_file))
+
+        def legacy():
+            book_one_place(clubs, competitions, next(counter))
+            legacy_save(clubs_file, 'clubs', clubs)
+            legacy_save(competitions_file, 'competitions', competitions)
+
+        def atomic():
+            book_one_place(clubs, competitions, next(counter))
+            data_access.save_clubs(clubs) and data_access.save_competitions(competitions)
+
+        def atomic_compact():
+            book_one_place(clubs, competitions, next(counter))
+            data_access.save_clubs(clubs, compact=True) and data_access.save_competitions(competitions, compact=True)
+
+        def unchanged():
+            data_access.save_clubs(clubs, skip_unchanged=True) and \
+                data_access.save_competitions(competitions, skip_unchanged=True)
+
+        print(f"{number_of_clubs} clubs, {number_of_competitions} competitions, {repeat} bookings per run")
+        for name, function in (("truncate-and-rewrite", legacy), ("atomic", atomic),
+                               ("atomic compact", atomic_compact), ("atomic unchanged data", unchanged)):
+            best = min(timeit.repeat(function, number=repeat, repeat=3)) / repeat
+            print(f"  {name:<24} {best * 1000:8.2f} ms per booking")
+
+        # Every booking is possible: enough points and places, and a different club or competition each time.
+        make_bookable(clubs, competitions)
+        json_backend = data_access.JSONFileBackend(clubs_file, competitions_file)
+        sharded_backend = data_access.ShardedJSONBackend(os.path.join(directory, 'sharded'))
+        for backend in (json_backend, sharded_backend):
+            backend.save_clubs(clubs)
+            backend.save_competitions(competitions)
+
+        def apply_booking(backend):
+            booking = next(counter)
+            assert backend.apply_booking(competitions[booking % number_of_competitions]["name"],
+                                         clubs[booking % number_of_clubs]["name"], 1)
+
+        for name, backend in (("apply_booking, 2 files", json_backend), ("apply_booking, sharded", sharded_backend)):
+            best = min(timeit.repeat(lambda: apply_booking(backend), number=repeat, repeat=3)) / repeat
+            print(f"  {name:<24} {best * 1000:8.2f} ms per booking")
+
+
+if __name__ == '__main__':
+    clubs_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    competitions_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    run(clubs_count, competitions_count)
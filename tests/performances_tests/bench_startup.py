@@ -0,0 +1,68 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from datasets import generate_dataset  # noqa: E402
+from datasets import write_dataset  # noqa: E402
+
+# Measures the cold start of the application on generated data files (see datasets), with and without PRELOAD_DATA:
+# the time to import server, which creates the application, then the time of the first request to /show-summary and
+# of the same request once everything is loaded. Each variant runs in a new process, as a worker would.
+#
+# Usage: python tests/performances_tests/bench_startup.py [number_of_clubs] [number_of_competitions]
+
+VARIANTS = {
+    "loaded on first request": "0",
+    "preloaded": "1",
+}
+
+
+def measure(email):
+    # Runs in the child process, whose environment names the data files and the variant.
+    start = time.perf_counter()
+    from server import app
+    created = time.perf_counter()
+
+    client = app.test_client()
+    client.post('/show-summary', data={'email': email})
+    first = time.perf_counter()
+    client.post('/show-summary', data={'email': email})
+    second = time.perf_counter()
+    return {"create_ms": (created - start) * 1000, "first_request_ms": (first - created) * 1000,
+            "warm_request_ms": (second - first) * 1000}
+
+
+def run(number_of_clubs, number_of_competitions):
+    clubs, competitions = generate_dataset(number_of_clubs, number_of_competitions)
+    with tempfile.TemporaryDirectory() as directory:
+        environment = dict(os.environ, GUDLFT_STORAGE_BACKEND='json',
+                           GUDLFT_CLUBS_FILE=os.path.join(directory, 'clubs.json'),
+                           GUDLFT_COMPETITIONS_FILE=os.path.join(directory, 'competitions.json'))
+        write_dataset(environment['GUDLFT_CLUBS_FILE'], environment['GUDLFT_COMPETITIONS_FILE'], clubs, competitions)
+
+        print(f"{number_of_clubs} clubs, {number_of_competitions} competitions")
+        print(f"  {'variant':<24} {'create_app':>11} {'1st request':>12} {'to 1st response':>16} {'warm request':>13}")
+        for name, preload in VARIANTS.items():
+            start = time.perf_counter()
+            output = subprocess.run([sys.executable, __file__, '--child', clubs[len(clubs) // 2]['email']],
+                                    env=dict(environment, GUDLFT_PRELOAD_DATA=preload), capture_output=True,
+                                    text=True, check=True).stdout
+            process = (time.perf_counter() - start) * 1000
+            result = json.loads(output.splitlines()[-1])
+            print(f"  {name:<24} {result['create_ms']:9.1f}ms {result['first_request_ms']:10.1f}ms "
+                  f"{result['create_ms'] + result['first_request_ms']:14.1f}ms {result['warm_request_ms']:11.1f}ms"
+                  f"   (process: {process:.0f}ms)")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        print(json.dumps(measure(sys.argv[2])))
+    else:
+        clubs_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+        competitions_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+        run(clubs_count, competitions_count)
@@ -0,0 +1,294 @@
+import os
+import sys
+import json
+import timeit
+import argparse
+import functools
+import platform
+import tempfile
+from datetime import datetime
+from itertools import count
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import data_access  # noqa: E402
+from data_access import JSONFileBackend  # noqa: E402
+from data_access import InMemoryBackend  # noqa: E402
+from data_access import configure_backend  # noqa: E402
+from utils import parse_competition_date  # noqa: E402
+from utils import purchase_limit  # noqa: E402
+from models import Club  # noqa: E402
+from models import Competition  # noqa: E402
+from datasets import generate_dataset  # noqa: E402
+from datasets import make_bookable  # noqa: E402
+from server import create_app  # noqa: E402
+
+# Times the storage functions, the helpers of utils and every route (through the test client, without a server) at
+# several numbers of generated clubs and competitions (see datasets), and writes the seconds per call to a JSON file.
+# Given a baseline, a previous result file, it fails when a benchmark got slower than the baseline by more than the
+# threshold.
+#
+# Usage: python tests/performances_tests/bench_suite.py [--sizes 10,1000,100000] [--filter text] [--output file]
+#                                                       [--baseline file] [--threshold 0.25]
+#
+# Timings depend on the machine: compare results made on the same one.
+
+DEFAULT_SIZES = (10, 1000, 100000)
+
+app = create_app({'TESTING': True, 'PRELOAD_DATA': False, 'IDEMPOTENCY_DIRECTORY': None, 'HOLDS_FILE': None})
+
+BENCHMARKS = []
+
+
+class Case:
+    # What a benchmark times: run() is timed, reset() is called before each series of calls and is not, and at most
+    # max_calls calls are made in a series, for benchmarks that use up their data.
+    def __init__(self, run, reset=None, max_calls=None):
+        self.run = run
+        self.reset = reset
+        self.max_calls = max_calls
+
+
+def benchmark(name: str, sized: bool = True):
+    # Registers a function building the Case of a benchmark from the number of records and a temporary directory.
+    # Benchmarks that are not sized run once, their time does not depend on the data.
+    def decorator(build):
+        BENCHMARKS.append((name, sized, build))
+        return build
+    return decorator
+
+
+@functools.lru_cache(maxsize=None)
+def dataset(size):
+    # Generated once for each size, around the current day that the routes compare the dates with. Every booking of
+    # a place is possible, and the benchmarks only book the upcoming competitions.
+    clubs, competitions = generate_dataset(size, size)
+    make_bookable(clubs, competitions)
+    today = f"{datetime.now():%Y-%m-%d}"
+    upcoming = [competition["name"] for competition in competitions if competition["date"] > today]
+    return clubs, competitions, upcoming
+
+
+def make_data(size):
+    # Copies of the generated data, which the bookings change.
+    clubs, competitions, _ = dataset(size)
+    return ([dict(club) for club in clubs],
+            [dict(competition, bookings=dict(competition["bookings"])) for competition in competitions])
+
+
+def json_backend(size, directory):
+    clubs, competitions = make_data(size)
+    backend = JSONFileBackend(os.path.join(directory, 'clubs.json'), os.path.join(directory, 'competitions.json'))
+    backend.save_clubs(clubs)
+    backend.save_competitions(competitions)
+    use_backend(backend)
+    return backend
+
+
+def memory_backend(size):
+    backend = InMemoryBackend(*make_data(size))
+    use_backend(backend)
+    return backend
+
+
+def use_backend(backend):
+    # Used by the storage functions called directly and by the routes.
+    configure_backend(backend)
+    data_access.init_app(app, backend)
+
+
+# -------------------------------------------------------
+# Storage and helpers
+# -------------------------------------------------------
+
+@benchmark('load_clubs (file read)')
+def load_clubs_read(size, directory):
+    json_backend(size, directory)
+
+    def run():
+        data_access.invalidate()
+        data_access.load_clubs()
+    return Case(run)
+
+
+@benchmark('load_clubs (cached)')
+def load_clubs_cached(size, directory):
+    json_backend(size, directory)
+    return Case(data_access.load_clubs)
+
+
+@benchmark('save_competitions')
+def save_competitions(size, directory):
+    json_backend(size, directory)
+    competitions = data_access.load_competitions()
+    return Case(lambda: data_access.save_competitions(competitions))
+
+
+@benchmark('competitions_page (available, most full)')
+def available_competitions_page(size, directory):
+    # A page of the competitions with places when only one in twenty still has some: the full ones are not walked.
+    clubs, competitions = make_data(size)
+    for position, competition in enumerate(competitions):
+        if position % 20:
+            competition["numberOfPlaces"] = 0
+    backend = InMemoryBackend(clubs, competitions)
+    use_backend(backend)
+    return Case(lambda: data_access.competitions_page(backend.load_competitions(), available_only=True))
+
+
+@benchmark('parse_competition_date', sized=False)
+def parse_date(size, directory):
+    return Case(lambda: parse_competition_date("2030-10-22 13:30:00"))
+
+
+@benchmark('purchase_limit', sized=False)
+def limit(size, directory):
+    clubs, competitions, _ = dataset(10)
+    club = Club.from_dict(clubs[3])
+    competition = Competition.from_dict(competitions[4])
+    return Case(lambda: purchase_limit(club, competition))
+
+
+# -------------------------------------------------------
+# Routes
+# -------------------------------------------------------
+
+def route(name: str, method: str, url: str, data=None, **request):
+    # A route requested with the data of memory_backend(). url and data may use {club}, {email} and {competition},
+    # the names and email of the club and upcoming competition in the middle of the data.
+    @benchmark(name)
+    def build(size, directory):
+        memory_backend(size)
+        client = app.test_client()
+        clubs, _, upcoming = dataset(size)
+        names = {"club": clubs[size // 2]["name"], "email": clubs[size // 2]["email"],
+                 "competition": upcoming[len(upcoming) // 2]}
+        target = url.format(**names)
+        form = {key: value.format(**names) for key, value in (data or {}).items()}
+        return Case(lambda: client.open(target, method=method, data=form, **request))
+    return build
+
+
+route('GET /', 'GET', '/')
+route('POST /show-summary', 'POST', '/show-summary', {'email': '{email}'})
+route('GET /book', 'GET', '/book/{competition}/{club}')
+route('GET /club-points', 'GET', '/club-points')
+route('GET /club-points?page=1', 'GET', '/club-points?sort=points&page=1')
+route('GET /logout', 'GET', '/logout')
+route('GET /api/v1/summary', 'GET', '/api/v1/summary?email={email}')
+route('GET /api/v1/competitions', 'GET', '/api/v1/competitions')
+route('GET /api/v1/club-points', 'GET', '/api/v1/club-points')
+
+
+@benchmark('POST /purchase-places')
+def purchase_places(size, directory):
+    # Every call books 1 place for the next club and upcoming competition, so that no club reaches the limit of 12
+    # places.
+    client = app.test_client()
+    calls = count()
+    clubs, _, upcoming = dataset(size)
+
+    def reset():
+        memory_backend(size)
+
+    def run():
+        i = next(calls)
+        client.post('/purchase-places', data={'club': clubs[i % size]["name"],
+                                              'competition': upcoming[i // size % len(upcoming)], 'places': "1"})
+    return Case(run, reset, max_calls=size * len(upcoming) * 10)
+
+
+@benchmark('POST /purchase-places/batch')
+def purchase_places_batch(size, directory):
+    client = app.test_client()
+    calls = count()
+    clubs, _, upcoming = dataset(size)
+
+    def reset():
+        memory_backend(size)
+
+    def run():
+        i = next(calls)
+        client.post('/purchase-places/batch', data={'club': clubs[i % size]["name"],
+                                                    'competition': [upcoming[i // size % len(upcoming)]] * 2,
+                                                    'places': ["1", "1"]})
+    return Case(run, reset, max_calls=size * len(upcoming) * 5)
+
+
+# -------------------------------------------------------
+# Runner
+# -------------------------------------------------------
+
+def measure(case: Case) -> float:
+    # Best time per call of 3 series, each long enough to last about 0.2s.
+    if case.reset is not None:
+        case.reset()
+    timer = timeit.Timer(case.run, setup=case.reset or (lambda: None))
+    number, _ = timer.autorange()
+    if case.max_calls is not None:
+        number = max(1, min(number, case.max_calls // 4))
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def run(sizes, name_filter=''):
+    # Returns the seconds per call of each benchmark, by "name [size]".
+    previous = configure_backend(None)
+    results = {}
+    try:
+        for name, sized, build in BENCHMARKS:
+            if name_filter not in name:
+                continue
+            for size in sizes if sized else (None,):
+                key = f"{name} [{size}]" if sized else name
+                with tempfile.TemporaryDirectory() as directory:
+                    data_access.invalidate()
+                    seconds = measure(build(size or 10, directory))
+                results[key] = {"name": name, "size": size, "seconds": seconds}
+                print(f"  {key:<45} {seconds * 1e6:12.1f} us")
+    finally:
+        configure_backend(previous)
+        data_access.invalidate()
+    return results
+
+
+def regressions(results: dict, baseline: dict, threshold: float) -> list:
+    # Returns (key, baseline seconds, seconds) for the benchmarks slower than the baseline by more than threshold.
+    slower = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is not None and result["seconds"] > base["seconds"] * (1 + threshold):
+            slower.append((key, base["seconds"], result["seconds"]))
+    return slower
+
+
+def main(arguments):
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the storage, helpers and routes.")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="numbers of clubs and competitions, separated by commas")
+    parser.add_argument('--filter', default='', help="only run the benchmarks whose name holds this text")
+    parser.add_argument('--output', help="file where the results are written, as JSON")
+    parser.add_argument('--baseline', help="results of a previous run to compare with")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="slowdown over the baseline that fails the run (0.25 is 25%%)")
+    options = parser.parse_args(arguments)
+
+    results = run([int(size) for size in options.sizes.split(',')], options.filter)
+    if options.output:
+        with open(options.output, 'w') as output:
+            json.dump({"created": datetime.now().isoformat(timespec='seconds'), "python": platform.python_version(),
+                       "machine": platform.machine(), "results": results}, output, indent=4)
+
+    if options.baseline:
+        with open(options.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        slower = regressions(results, baseline, options.threshold)
+        for key, base, seconds in slower:
+            print(f"REGRESSION {key}: {base * 1e6:.1f} us -> {seconds * 1e6:.1f} us (+{(seconds / base - 1):.0%})")
+        if slower:
+            return 1
+        print(f"No regression over {options.threshold:.0%} against {options.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,86 @@
+import random
+
+from locust import HttpUser
+from locust import events
+from locust.runners import WorkerRunner
+
+from tests.performances_tests.scenarios.dataset import Dataset
+from tests.performances_tests.scenarios.dataset import booking_state
+from tests.performances_tests.scenarios.dataset import overbookings
+
+# What the scenarios share: the users acting for a club of the dataset, and the checks that end a headless run with
+# exit code 1 when the latencies or the error rate go over their limits, or when a competition was oversold.
+
+DATASET = Dataset()
+
+
+class ClubUser(HttpUser):
+    # A user acting for one club of the dataset, picked at random, through the pages a browser would request.
+    abstract = True
+    host = "http://127.0.0.1:5000"
+
+    def on_start(self):
+        self.club, self.email = random.choice(DATASET.clubs)
+
+    def show_summary(self):
+        self.client.post("/show-summary", {"email": self.email})
+
+    def open_booking_page(self, competition, places=None):
+        # With places, the page holds them for the club (see holds).
+        url = f"/book/{competition}/{self.club}"
+        if places is None:
+            self.client.get(url, name="/book/[competition]/[club]")
+        else:
+            self.client.post(url, {"places": str(places)}, name="/book/[competition]/[club]")
+
+    def purchase_places(self, competition, places):
+        # A refused booking redirects to the booking page: it is an answer, not an error. The redirect is not
+        # followed, so that only the booking itself is timed.
+        self.client.post("/purchase-places", {"competition": competition, "club": self.club, "places": str(places)},
+                         allow_redirects=False)
+
+
+class ServiceLevel:
+    # Limits of a run, checked once it is over: 95th and 99th percentiles of the response times in milliseconds, and
+    # share of failed requests.
+    def __init__(self, p95_ms: float, p99_ms: float, max_error_rate: float):
+        self.p95_ms = p95_ms
+        self.p99_ms = p99_ms
+        self.max_error_rate = max_error_rate
+
+    def violations(self, stats) -> list:
+        total = stats.total
+        violations = []
+        if not total.num_requests:
+            return ["No request was made"]
+        for percentile, limit in ((0.95, self.p95_ms), (0.99, self.p99_ms)):
+            value = total.get_response_time_percentile(percentile)
+            if value > limit:
+                violations.append(f"p{int(percentile * 100)} of {value:.0f} ms over {limit:.0f} ms")
+        if total.fail_ratio > self.max_error_rate:
+            violations.append(f"error rate of {total.fail_ratio:.2%} over {self.max_error_rate:.2%}")
+        return violations
+
+
+def enforce(service_level: ServiceLevel):
+    # Checks the service level and the bookings at the end of the run, on the master (or single) process.
+    state = {}
+
+    @events.test_start.add_listener
+    def record_bookings(environment, **kwargs):
+        if not isinstance(environment.runner, WorkerRunner):
+            state["before"] = booking_state()
+
+    @events.quitting.add_listener
+    def check(environment, **kwargs):
+        if isinstance(environment.runner, WorkerRunner):
+            return
+        problems = service_level.violations(environment.stats)
+        if DATASET.storage == 'memory':
+            print("The server keeps its bookings in memory, oversold competitions cannot be checked")
+        elif "before" in state:
+            problems.extend(overbookings(state["before"], booking_state()))
+        for problem in problems:
+            print(f"FAILED: {problem}")
+        if problems:
+            environment.process_exit_code = 1
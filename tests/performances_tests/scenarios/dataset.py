@@ -0,0 +1,69 @@
+import os
+import sys
+from datetime import datetime
+
+REPOSITORY = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPOSITORY)
+
+import data_access  # noqa: E402
+from config import get_config  # noqa: E402
+from config import DATA_PATH_SETTINGS  # noqa: E402
+
+# The clubs and competitions of the data the server under test uses: the configuration chosen by FLASK_ENV (the test
+# data files with FLASK_ENV=testing), read with the same storage backend. Relative paths are taken from the root of
+# the repository, as the server does.
+
+# Places a club can book in a competition, see utils.purchase_limit().
+PLACES_LIMIT = 12
+
+
+def configuration() -> dict:
+    config = get_config()
+    settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    for name in DATA_PATH_SETTINGS:
+        settings[name] = os.path.join(REPOSITORY, settings[name])
+    # The scenarios only read, and must not write behind the server.
+    settings['WRITE_BEHIND'] = None
+    settings['GROUP_COMMIT_WINDOW'] = None
+    return settings
+
+
+class Dataset:
+    # Names and emails of the clubs, and the competitions that can still be booked, by date.
+    def __init__(self):
+        backend = data_access.create_backend(configuration())
+        self.storage = configuration()['STORAGE_BACKEND']
+        clubs = backend.load_clubs()
+        current_date = datetime.now()
+        self.clubs = [(club['name'], club['email']) for club in clubs]
+        self.competitions = [competition['name'] for competition in backend.upcoming_competitions(current_date)]
+        if not self.clubs or not self.competitions:
+            raise RuntimeError("The dataset needs clubs and upcoming competitions")
+
+
+def booking_state() -> dict:
+    # Returns, for each competition, the places left and the places booked by each club, and the points of each club,
+    # as stored now.
+    backend = data_access.create_backend(configuration())
+    return {"competitions": {competition['name']: (competition['numberOfPlaces'], dict(competition['bookings']))
+                             for competition in backend.load_competitions()},
+            "clubs": {club['name']: club['points'] for club in backend.load_clubs()}}
+
+
+def overbookings(before: dict, after: dict) -> list:
+    # Returns what is wrong in the bookings made between the two states: places or points below zero, places taken
+    # that do not match the places booked, a club over the limit of places.
+    problems = []
+    for name, (places, bookings) in after["competitions"].items():
+        places_before, bookings_before = before["competitions"].get(name, (places, bookings))
+        booked = sum(bookings.values()) - sum(bookings_before.values())
+        if places < 0:
+            problems.append(f"{name}: {places} places left")
+        if places_before - places != booked:
+            problems.append(f"{name}: {places_before - places} places taken for {booked} booked")
+        problems.extend(f"{name}: {club} booked {club_places} places, over the limit of {PLACES_LIMIT}"
+                        for club, club_places in bookings.items() if club_places > PLACES_LIMIT)
+    for name, points in after["clubs"].items():
+        if points < 0:
+            problems.append(f"{name}: {points} points left")
+    return problems
@@ -0,0 +1,40 @@
+import os
+import random
+
+from locust import between
+from locust import task
+from locust import SequentialTaskSet
+
+from tests.performances_tests.scenarios.common import DATASET
+from tests.performances_tests.scenarios.common import ClubUser
+from tests.performances_tests.scenarios.common import ServiceLevel
+from tests.performances_tests.scenarios.common import enforce
+
+# A ticket release: every user opens the booking page of the same competition, holding a few places, and books them
+# right after. Most bookings end up refused once the places or the limit of the clubs run out; the run checks that
+# the bookings stay fast while they contend for the same competition, and that it is not oversold.
+#
+# Usage: locust --config tests/performances_tests/scenarios/hot_competition.conf
+# HOT_COMPETITION names the competition, the next one of the dataset by default.
+
+HOT_COMPETITION = os.getenv('HOT_COMPETITION') or DATASET.competitions[0]
+
+enforce(ServiceLevel(p95_ms=1000, p99_ms=2000, max_error_rate=0.01))
+
+
+class HotCompetitionBooking(SequentialTaskSet):
+    def on_start(self):
+        self.places = random.randint(1, 4)
+
+    @task
+    def booking_page(self):
+        self.user.open_booking_page(HOT_COMPETITION, self.places)
+
+    @task
+    def purchase(self):
+        self.user.purchase_places(HOT_COMPETITION, self.places)
+
+
+class HotCompetitionUser(ClubUser):
+    tasks = [HotCompetitionBooking]
+    wait_time = between(0.5, 2)
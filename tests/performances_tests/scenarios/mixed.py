@@ -0,0 +1,44 @@
+import random
+
+from locust import between
+from locust import task
+
+from tests.performances_tests.scenarios.common import DATASET
+from tests.performances_tests.scenarios.common import ClubUser
+from tests.performances_tests.scenarios.common import ServiceLevel
+from tests.performances_tests.scenarios.common import enforce
+
+# A usual day: clubs mostly look at their summary and at the competitions, now and then book a few places, and rarely
+# log out.
+#
+# Usage: locust --config tests/performances_tests/scenarios/mixed.conf
+
+enforce(ServiceLevel(p95_ms=500, p99_ms=1000, max_error_rate=0.01))
+
+
+class MixedUser(ClubUser):
+    wait_time = between(1, 5)
+
+    @task(10)
+    def summary(self):
+        self.show_summary()
+
+    @task(5)
+    def booking_page(self):
+        self.open_booking_page(random.choice(DATASET.competitions))
+
+    @task(3)
+    def club_points(self):
+        self.client.get("/club-points")
+
+    @task(2)
+    def purchase(self):
+        self.purchase_places(random.choice(DATASET.competitions), random.randint(1, 4))
+
+    @task(2)
+    def index(self):
+        self.client.get("/")
+
+    @task(1)
+    def logout(self):
+        self.client.get("/logout")
@@ -0,0 +1,46 @@
+import random
+
+from locust import between
+from locust import task
+
+from tests.performances_tests.scenarios.common import DATASET
+from tests.performances_tests.scenarios.common import ClubUser
+from tests.performances_tests.scenarios.common import ServiceLevel
+from tests.performances_tests.scenarios.common import enforce
+
+# Clubs checking the points table and the places left, without booking. Like a browser, each user sends back the
+# ETag of the pages it already has, and gets a 304 while nothing was booked.
+#
+# Usage: locust --config tests/performances_tests/scenarios/read_heavy.conf
+
+enforce(ServiceLevel(p95_ms=300, p99_ms=800, max_error_rate=0.005))
+
+
+class ReadHeavyUser(ClubUser):
+    wait_time = between(0.5, 2)
+
+    def on_start(self):
+        super().on_start()
+        self.etags = {}
+
+    def get_page(self, url, name=None):
+        headers = {"If-None-Match": self.etags[url]} if url in self.etags else {}
+        response = self.client.get(url, headers=headers, name=name)
+        if response.headers.get("ETag"):
+            self.etags[url] = response.headers["ETag"]
+
+    @task(5)
+    def club_points(self):
+        self.get_page("/club-points")
+
+    @task(4)
+    def competitions(self):
+        self.get_page("/api/v1/competitions")
+
+    @task(3)
+    def booking_page(self):
+        self.get_page(f"/book/{random.choice(DATASET.competitions)}/{self.club}", name="/book/[competition]/[club]")
+
+    @task(2)
+    def summary(self):
+        self.show_summary()
@@ -0,0 +1,182 @@
+import pytest
+
+from api import error_code
+from constants import CLUB_LIMIT_MESSAGE
+from constants import INSUFFICIENT_POINTS_MESSAGE
+from constants import PAST_COMPETITION_BOOKING_ERROR_MESSAGE
+from constants import SAVE_CHANGES_MESSAGE_ERROR
+
+
+@pytest.fixture
+def api_data(backend, mock_load_clubs, mock_load_competitions):
+    # One club with 10 points and one future competition with 30 places.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
+    return backend
+
+
+# -------------------------------------------------------
+# Tests for error_code Function
+# -------------------------------------------------------
+
+def test_error_code_of_messages():
+    # Test: Messages are mapped to their codes, including the club limit message with its number.
+    assert error_code(INSUFFICIENT_POINTS_MESSAGE) == "insufficient_points"
+    assert error_code(CLUB_LIMIT_MESSAGE.format(remaining_places=3)) == "club_limit_reached"
+    assert error_code("Some unexpected message") == "unknown_error"
+
+
+# -------------------------------------------------------
+# Tests for summary Function
+# -------------------------------------------------------
+
+def test_summary(client, api_data):
+    # Test: The summary returns the club and the competitions with numbers instead of strings.
+    response = client.get('/api/v1/summary?email=TestClubMail@example.co')
+
+    assert response.status_code == 200
+    assert response.json == {
+        "club": {"name": "Test Club", "email": "testclubmail@example.co", "points": 10},
+        "competitions": [{"name": "Test Competition", "date": "2030-10-22 13:30:00", "places": 30, "past": False,
+                          "booked": 0, "remaining_limit": 12}],
+        "next_cursor": None
+    }
+
+
+def test_summary_unknown_email(client, api_data):
+    # Test: An unknown email returns a 404 with the message of the page.
+    response = client.get('/api/v1/summary?email=unknown@example.co')
+
+    assert response.status_code == 404
+    assert response.json["error"]["code"] == "club_not_found"
+
+
+def test_summary_without_email(client, api_data):
+    # Test: A missing email is a bad request.
+    response = client.get('/api/v1/summary')
+
+    assert response.status_code == 400
+    assert response.json["error"]["code"] == "email_missing"
+
+
+def test_summary_loading_error(client):
+    # Test: When no data can be loaded, the error is reported as unavailable.
+    response = client.get('/api/v1/summary?email=testclubmail@example.co')
+
+    assert response.status_code == 503
+    assert response.json["error"]["code"] == "loading_error"
+
+
+# -------------------------------------------------------
+# Tests for competitions and club points Functions
+# -------------------------------------------------------
+
+def test_competitions_availability(client, api_data):
+    # Test: Every competition is listed with its places left.
+    response = client.get('/api/v1/competitions')
+
+    assert response.json["competitions"][0]["places"] == 30
+
+
+def test_competitions_availability_lists_upcoming_competitions(client, backend):
+    # Test: Past competitions are only listed with ?past=1.
+    backend.save_competitions([
+        {"name": "Past Competition", "date": "2020-10-22 13:30:00", "numberOfPlaces": "30", "bookings": {}},
+        {"name": "Future Competition", "date": "2050-10-22 13:30:00", "numberOfPlaces": "30", "bookings": {}}
+    ])
+
+    response = client.get('/api/v1/competitions')
+    assert [c["name"] for c in response.json["competitions"]] == ["Future Competition"]
+
+    response = client.get('/api/v1/competitions?past=1')
+    assert [c["past"] for c in response.json["competitions"]] == [True, False]
+
+
+def test_competitions_availability_pages(client, backend):
+    # Test: Competitions are listed by pages of ?limit= competitions, the next one starting at next_cursor.
+    backend.save_competitions([{"name": f"Competition {i}", "date": f"{2050 + i}-10-22 13:30:00",
+                                "numberOfPlaces": "30", "bookings": {}} for i in range(5)])
+
+    first_page = client.get('/api/v1/competitions?limit=2').json
+    second_page = client.get(f'/api/v1/competitions?limit=2&cursor={first_page["next_cursor"]}').json
+
+    assert [c["name"] for c in first_page["competitions"]] == ["Competition 0", "Competition 1"]
+    assert [c["name"] for c in second_page["competitions"]] == ["Competition 2", "Competition 3"]
+
+
+def test_competition_availability_unknown(client, api_data):
+    # Test: An unknown competition returns a 404.
+    response = client.get('/api/v1/competitions/Unknown')
+
+    assert response.status_code == 404
+
+
+def test_club_points(client, api_data):
+    # Test: Every club is listed with its points.
+    response = client.get('/api/v1/club-points')
+
+    assert response.json == {"clubs": [{"name": "Test Club", "points": 10}]}
+
+
+# -------------------------------------------------------
+# Tests for purchase_places Function
+# -------------------------------------------------------
+
+def test_purchase_places(client, api_data):
+    # Test: A booking returns the club and the competition as they are after it.
+    response = client.post('/api/v1/purchases',
+                           json={"club": "Test Club", "competition": "Test Competition", "places": 4})
+
+    assert response.status_code == 201
+    assert response.json["places"] == 4
+    assert response.json["club"]["points"] == 6
+    assert response.json["competition"]["places"] == 26
+    assert response.json["competition"]["booked"] == 4
+    assert api_data.get_club_by_name("Test Club")["points"] == 6
+
+
+@pytest.mark.parametrize("places, status, code", [
+    ("abc", 422, "invalid_places"),
+    (0, 422, "non_positive_places"),
+    (13, 422, "max_places_per_booking"),
+    (11, 409, "insufficient_points"),
+])
+def test_purchase_places_rejected(client, api_data, places, status, code):
+    # Test: An invalid booking returns the code of the message and changes nothing.
+    response = client.post('/api/v1/purchases',
+                           json={"club": "Test Club", "competition": "Test Competition", "places": places})
+
+    assert response.status_code == status
+    assert response.json["error"]["code"] == code
+    assert api_data.get_club_by_name("Test Club")["points"] == 10
+
+
+def test_purchase_places_past_competition(client, backend, mock_load_clubs):
+    # Test: A past competition cannot be booked through the API either.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions([{"name": "Old Competition", "date": "2020-10-22 13:30:00", "numberOfPlaces": "30",
+                                "bookings": {}}])
+
+    response = client.post('/api/v1/purchases', json={"club": "Test Club", "competition": "Old Competition",
+                                                      "places": 1})
+
+    assert response.json["error"] == {"code": "past_competition", "message": PAST_COMPETITION_BOOKING_ERROR_MESSAGE}
+
+
+def test_purchase_places_invalid_body(client, api_data):
+    # Test: A request without a JSON body names no club or competition.
+    response = client.post('/api/v1/purchases', data="places=1")
+
+    assert response.status_code == 404
+    assert response.json["error"]["code"] == "invalid_club_or_competition"
+
+
+def test_purchase_places_save_error(client, api_data, mocker):
+    # Test: A booking the backend could not save is reported.
+    mocker.patch.object(api_data, 'apply_booking', return_value=False)
+
+    response = client.post('/api/v1/purchases',
+                           json={"club": "Test Club", "competition": "Test Competition", "places": 1})
+
+    assert response.status_code == 503
+    assert response.json["error"]["message"] == SAVE_CHANGES_MESSAGE_ERROR
@@ -1,14 +1,53 @@
 import json
+from datetime import datetime
+
+import pytest
+
+import data_access
 from data_access import load_clubs
 from data_access import load_competitions
 from data_access import save_clubs
 from data_access import save_competitions
+from data_access import invalidate
+from data_access import cache_stats
+from data_access import find_club_by_email
+from data_access import find_club_by_name
+from data_access import find_competition_by_name
+from data_access import IndexedRecords
+from data_access import CLUB_INDEX_FIELDS
+from data_access import COMPETITION_INDEX_FIELDS
+from data_access import COMPETITION_SORTED_FIELDS
+from data_access import COMPETITION_FILTERS
+from data_access import competition_date
+from data_access import competitions_between
+from data_access import competitions_page
+from data_access import clubs_page
+from data_access import data_version
+from data_access import upcoming_competitions
+from data_access import configure_backend
+from data_access import JSONFileBackend
+from data_access import InMemoryBackend
+from data_access import SQLiteBackend
+from data_access import create_backend
+from data_access import apply_booking
+from data_access import apply_bookings
+from data_access import get_club_by_email
+from data_access import get_club_by_name
+from data_access import get_competition_by_name
+
+
+@pytest.fixture
+def json_backend(tmp_path):
+    # Stores the data in JSON files of a temporary folder.
+    backend = JSONFileBackend(str(tmp_path / "clubs.json"), str(tmp_path / "competitions.json"))
+    configure_backend(backend)
+    return backend
 
 
 # -------------------------------------------------------
 # Tests for load_clubs Function
 # -------------------------------------------------------
-def test_load_clubs_success(mocker):
+def test_load_clubs_success(mocker, json_backend):
     # Test: Verify successful loading of club data from a file.
 
     mock_clubs_data = {
@@ -22,10 +61,14 @@ def test_load_clubs_success(mocker):
     mocker.patch("builtins.open", mocker.mock_open(read_data=json.dumps(mock_clubs_data)))
     clubs = load_clubs()
 
-    assert clubs == mock_clubs_data["clubs"]
+    # Points are loaded as numbers.
+    assert clubs == [
+        {"name": "Club A", "email": "cluba@example.com", "points": 100},
+        {"name": "Club B", "email": "clubb@example.com", "points": 200}
+    ]
 
 
-def test_load_clubs_file_not_found_return_empty_list(mocker):
+def test_load_clubs_file_not_found_return_empty_list(mocker, json_backend):
     # Test: Handle the situation where the club data file does not exist.
 
     mocker.patch("builtins.open", side_effect=FileNotFoundError)  # Simulate that the file does not exist
@@ -35,7 +78,7 @@ def test_load_clubs_file_not_found_return_empty_list(mocker):
     assert clubs == expected_result  # Verify against the expected result
 
 
-def test_load_clubs_json_decode_error_returns_empty_list(mocker):
+def test_load_clubs_json_decode_error_returns_empty_list(mocker, json_backend):
     # Test: Handle invalid JSON content in the club data file.
 
     mocker.patch("builtins.open",
@@ -49,7 +92,7 @@ def test_load_clubs_json_decode_error_returns_empty_list(mocker):
 # -------------------------------------------------------
 # Tests for load_competitions Function
 # -------------------------------------------------------
-def test_load_competitions_success(mocker):
+def test_load_competitions_success(mocker, json_backend):
     # Test: Verify successful loading of competition data from a file.
 
     mock_competitions_data = {
@@ -63,10 +106,14 @@ def test_load_competitions_success(mocker):
     mocker.patch("builtins.open", mocker.mock_open(read_data=json.dumps(mock_competitions_data)))
     competitions = load_competitions()
 
-    assert competitions == mock_competitions_data["competitions"]
+    # Places are loaded as numbers, with the bookings the competitions have.
+    assert competitions == [
+        {"name": "Competition A", "date": "2030-10-22 13:30:00", "numberOfPlaces": 25, "bookings": {}},
+        {"name": "Competition B", "date": "2020-06-15 13:30:00", "numberOfPlaces": 30, "bookings": {}}
+    ]
 
 
-def test_load_competitions_file_not_found_return_empty_list(mocker):
+def test_load_competitions_file_not_found_return_empty_list(mocker, json_backend):
     # Test: Handle the situation where the competition data file does not exist.
 
     mocker.patch("builtins.open", side_effect=FileNotFoundError)  # Simulate that the file does not exist
@@ -76,7 +123,7 @@ def test_load_competitions_file_not_found_return_empty_list(mocker):
     assert competitions == expected_result  # Verify against the expected result
 
 
-def test_load_competitions_json_decode_error_return_empty_list(mocker):
+def test_load_competitions_json_decode_error_return_empty_list(mocker, json_backend):
     # Test: Handle invalid JSON content in the competition data file.
 
     mocker.patch("builtins.open",
@@ -91,71 +138,523 @@ def test_load_competitions_json_decode_error_return_empty_list(mocker):
 # Tests for save_clubs Function
 # -------------------------------------------------------
 
-def test_save_clubs_success(mocker):
+def test_save_clubs_success(tmp_path):
     # Test: Verify successful saving of club data to a file.
-    mock_clubs_data = {
-        "clubs": [
-            {"name": "Club A", "email": "cluba@example.com", "points": "100"},
-            {"name": "Club B", "email": "clubb@example.com", "points": "200"}
-        ]
-    }
-    mocker.patch("builtins.open", mocker.mock_open())
+    clubs_file = tmp_path / "clubs.json"
+    configure_backend(JSONFileBackend(str(clubs_file), str(tmp_path / "competitions.json")))
+    mock_clubs_data = [
+        {"name": "Club A", "email": "cluba@example.com", "points": 100},
+        {"name": "Club B", "email": "clubb@example.com", "points": 200}
+    ]
     expected_result = True
     result = save_clubs(mock_clubs_data)  # Call the function being tested
 
     assert result == expected_result  # Verify that the function returns True
+    with open(clubs_file) as c:
+        assert json.load(c) == {"clubs": mock_clubs_data}
+    assert list(tmp_path.iterdir()) == [clubs_file]  # No temporary file left behind
 
 
-def test_save_club_io_error(mocker):
+def test_save_club_io_error(mocker, tmp_path):
     # Test: Handle an IOError when attempting to save club data.
-    mock_clubs_data = {
-        "clubs": [
-            {"name": "Club A", "email": "cluba@example.com", "points": "100"},
-            {"name": "Club B", "email": "clubb@example.com", "points": "200"}
-        ]
-    }
-
-    mocker.patch("builtins.open", mocker.mock_open())  # Mock the open function to simulate file operations
-    mocker.patch("json.dump", side_effect=IOError)  # Mock json.dump to throw an IOError, simulating a write error
+    clubs_file = tmp_path / "clubs.json"
+    clubs_file.write_text('{"clubs": []}')
+    configure_backend(JSONFileBackend(str(clubs_file), str(tmp_path / "competitions.json")))
+    mock_clubs_data = [
+        {"name": "Club A", "email": "cluba@example.com", "points": 100},
+        {"name": "Club B", "email": "clubb@example.com", "points": 200}
+    ]
+
+    mocker.patch("os.replace", side_effect=IOError)  # Simulate a failure when replacing the original file
     expected_result = False
     result = save_clubs(mock_clubs_data)
 
-    # Asserting that the result is False (indicating failure)
+    # Asserting that the result is False (indicating failure) and that the original file is untouched
     assert result == expected_result
+    assert clubs_file.read_text() == '{"clubs": []}'
+    assert list(tmp_path.iterdir()) == [clubs_file]
+
+
+def test_save_clubs_compact(tmp_path):
+    # Test: The compact mode writes the same data without indentation.
+    clubs_file = tmp_path / "clubs.json"
+    configure_backend(JSONFileBackend(str(clubs_file), str(tmp_path / "competitions.json")))
+    mock_clubs_data = [{"name": "Club A", "email": "cluba@example.com", "points": 100}]
+
+    assert save_clubs(mock_clubs_data, compact=True)
+
+    assert "\n" not in clubs_file.read_text()
+    with open(clubs_file) as c:
+        assert json.load(c) == {"clubs": mock_clubs_data}
+
+
+def test_save_clubs_skips_unchanged_data(mocker, tmp_path):
+    # Test: Saving the same data twice only writes the file once.
+    clubs_file = tmp_path / "clubs.json"
+    configure_backend(JSONFileBackend(str(clubs_file), str(tmp_path / "competitions.json")))
+    write = mocker.spy(data_access, "write_file_atomically")
+    mock_clubs_data = [{"name": "Club A", "email": "cluba@example.com", "points": 100}]
+
+    assert save_clubs(mock_clubs_data, skip_unchanged=True)
+    assert save_clubs(mock_clubs_data, skip_unchanged=True)
+    assert write.call_count == 1
+
+    mock_clubs_data[0]["points"] = 90
+    assert save_clubs(mock_clubs_data, skip_unchanged=True)
+    assert write.call_count == 2
+
+
+def test_save_clubs_rewrites_file_changed_by_someone_else(tmp_path):
+    # Test: The unchanged check does not skip the write when the file was modified outside this process.
+    clubs_file = tmp_path / "clubs.json"
+    configure_backend(JSONFileBackend(str(clubs_file), str(tmp_path / "competitions.json")))
+    mock_clubs_data = [{"name": "Club A", "email": "cluba@example.com", "points": 100}]
+    assert save_clubs(mock_clubs_data, skip_unchanged=True)
+
+    clubs_file.write_text('{"clubs": []}')
+    assert save_clubs(mock_clubs_data, skip_unchanged=True)
+
+    with open(clubs_file) as c:
+        assert json.load(c) == {"clubs": mock_clubs_data}
 
 
 # -------------------------------------------------------
 # Tests for save_competitions Function
 # -------------------------------------------------------
 
-def test_save_competitions_success(mocker):
+def test_save_competitions_success(tmp_path):
     # Test: Verify successful saving of competition data to a file.
-    mock_competitions_data = {
-        "competitions": [
-            {"name": "Competition A", "date": "2030-10-22 13:30:00", "numberOfPlaces": "25"},
-            {"name": "Competition B", "date": "2020-06-15 13:30:00", "numberOfPlaces": "30"}
-        ]
-    }
-    mocker.patch("builtins.open", mocker.mock_open())
+    competitions_file = tmp_path / "competitions.json"
+    configure_backend(JSONFileBackend(str(tmp_path / "clubs.json"), str(competitions_file)))
+    mock_competitions_data = [
+        {"name": "Competition A", "date": "2030-10-22 13:30:00", "numberOfPlaces": 25, "bookings": {}},
+        {"name": "Competition B", "date": "2020-06-15 13:30:00", "numberOfPlaces": 30, "bookings": {}}
+    ]
     expected_result = True
     result = save_competitions(mock_competitions_data)  # Call the function being tested
 
     assert result == expected_result  # Verify that the function returns True
+    with open(competitions_file) as c:
+        assert json.load(c) == {"competitions": mock_competitions_data}
 
 
-def test_save_competitions_io_error(mocker):
+def test_save_competitions_io_error(mocker, tmp_path):
     # Test: Handle an IOError when attempting to save competition data.
-    mock_competitions_data = {
-        "competitions": [
-            {"name": "Competition A", "date": "2030-10-22 13:30:00", "numberOfPlaces": "25"},
-            {"name": "Competition B", "date": "2020-06-15 13:30:00", "numberOfPlaces": "30"}
-        ]
-    }
-
-    mocker.patch("builtins.open", mocker.mock_open())  # Mock the open function to simulate file operations
-    mocker.patch("json.dump", side_effect=IOError)  # Mock json.dump to throw an IOError, simulating a write error
+    competitions_file = tmp_path / "competitions.json"
+    configure_backend(JSONFileBackend(str(tmp_path / "clubs.json"), str(competitions_file)))
+    mock_competitions_data = [
+        {"name": "Competition A", "date": "2030-10-22 13:30:00", "numberOfPlaces": "25"},
+        {"name": "Competition B", "date": "2020-06-15 13:30:00", "numberOfPlaces": "30"}
+    ]
+
+    mocker.patch("os.fsync", side_effect=IOError)  # Simulate a write error
     expected_result = False
     result = save_competitions(mock_competitions_data)
 
     # Asserting that the result is False (indicating failure)
     assert result == expected_result
+    assert list(tmp_path.iterdir()) == []
+
+
+# -------------------------------------------------------
+# Tests for the records cache
+# -------------------------------------------------------
+
+def write_clubs_file(path, clubs):
+    # Writes a clubs file in the same format as data/production/clubs.json.
+    with open(path, 'w') as c:
+        json.dump({"clubs": clubs}, c)
+
+
+def test_load_clubs_reuses_cached_records(tmp_path):
+    # Test: A second load of an unchanged file is served from the cache.
+    clubs_file = tmp_path / "clubs.json"
+    write_clubs_file(clubs_file, [{"name": "Club A", "email": "cluba@example.com", "points": "100"}])
+    configure_backend(JSONFileBackend(str(clubs_file), str(tmp_path / "competitions.json")))
+
+    stats_before = cache_stats()
+
+    first = load_clubs()
+    second = load_clubs()
+
+    assert first is second
+    assert cache_stats()["hits"] - stats_before["hits"] == 1
+    assert cache_stats()["misses"] - stats_before["misses"] == 1
+
+
+def test_load_clubs_reloads_when_file_changes(tmp_path):
+    # Test: A file modified on disk by another process is parsed again.
+    clubs_file = tmp_path / "clubs.json"
+    write_clubs_file(clubs_file, [{"name": "Club A", "email": "cluba@example.com", "points": "100"}])
+    configure_backend(JSONFileBackend(str(clubs_file), str(tmp_path / "competitions.json")))
+    load_clubs()
+
+    write_clubs_file(clubs_file, [{"name": "Club A", "email": "cluba@example.com", "points": "99"},
+                                  {"name": "Club B", "email": "clubb@example.com", "points": "200"}])
+    clubs = load_clubs()
+
+    assert len(clubs) == 2
+    assert clubs[0]["points"] == 99
+
+
+def test_save_clubs_refreshes_cache(tmp_path):
+    # Test: Records written by this process are returned by the next load without parsing the file again.
+    clubs_file = tmp_path / "clubs.json"
+    write_clubs_file(clubs_file, [{"name": "Club A", "email": "cluba@example.com", "points": "100"}])
+    configure_backend(JSONFileBackend(str(clubs_file), str(tmp_path / "competitions.json")))
+    clubs = load_clubs()
+
+    clubs[0].points = 90
+    assert save_clubs(clubs)
+    misses_before = cache_stats()["misses"]
+
+    assert load_clubs() is clubs
+    assert cache_stats()["misses"] == misses_before
+
+
+def test_invalidate_forces_reload(tmp_path):
+    # Test: invalidate() discards the cached records even if the file did not change.
+    clubs_file = tmp_path / "clubs.json"
+    write_clubs_file(clubs_file, [{"name": "Club A", "email": "cluba@example.com", "points": "100"}])
+    configure_backend(JSONFileBackend(str(clubs_file), str(tmp_path / "competitions.json")))
+    first = load_clubs()
+    misses_before = cache_stats()["misses"]
+
+    invalidate()
+
+    assert load_clubs() is not first
+    assert cache_stats()["misses"] == misses_before + 1
+
+
+# -------------------------------------------------------
+# Tests for the lookup indexes
+# -------------------------------------------------------
+
+def test_loaded_clubs_are_indexed(tmp_path):
+    # Test: Loaded clubs can be found by email (case-insensitively) and by name.
+    clubs_file = tmp_path / "clubs.json"
+    write_clubs_file(clubs_file, [{"name": "Club A", "email": "cluba@example.com", "points": "100"},
+                                  {"name": "Club B", "email": "clubb@example.com", "points": "200"}])
+    configure_backend(JSONFileBackend(str(clubs_file), str(tmp_path / "competitions.json")))
+    clubs = load_clubs()
+
+    assert isinstance(clubs, IndexedRecords)
+    assert find_club_by_email(clubs, " ClubB@Example.COM ")["name"] == "Club B"
+    assert find_club_by_name(clubs, "Club A")["email"] == "cluba@example.com"
+    assert find_club_by_name(clubs, "Club C") is None
+
+
+def test_indexes_follow_list_changes():
+    # Test: Appending, removing and replacing records keeps the indexes up to date.
+    clubs = IndexedRecords([{"name": "Club A", "email": "cluba@example.com", "points": "100"}], CLUB_INDEX_FIELDS)
+    clubs.reindex()
+
+    clubs.append({"name": "Club B", "email": "clubb@example.com", "points": "200"})
+    assert find_club_by_name(clubs, "Club B") is clubs[1]
+
+    clubs.pop(0)
+    assert find_club_by_name(clubs, "Club A") is None
+
+    clubs[0] = {"name": "Club C", "email": "clubc@example.com", "points": "300"}
+    assert find_club_by_name(clubs, "Club B") is None
+    assert find_club_by_email(clubs, "CLUBC@example.com") is clubs[0]
+
+
+def test_find_in_plain_list():
+    # Test: Lookups still work on plain lists, which are scanned.
+    competitions = [{"name": "Competition A", "date": "2030-10-22 13:30:00", "numberOfPlaces": "25"}]
+
+    assert find_competition_by_name(competitions, "Competition A") is competitions[0]
+    assert find_competition_by_name(competitions, "Competition B") is None
+    assert find_club_by_email([{"name": "Club A", "email": "cluba@example.com"}], "CLUBA@example.com") is not None
+
+
+# -------------------------------------------------------
+# Tests for the competition dates index
+# -------------------------------------------------------
+
+@pytest.fixture
+def dated_competitions():
+    # Competitions out of date order, one of them with an invalid date.
+    return [
+        {"name": "Competition C", "date": "2030-12-01 10:00:00", "numberOfPlaces": "25"},
+        {"name": "Competition A", "date": "2020-01-01 10:00:00", "numberOfPlaces": "25"},
+        {"name": "Competition X", "date": "not a date", "numberOfPlaces": "25"},
+        {"name": "Competition B", "date": "2030-06-01 10:00:00", "numberOfPlaces": "25"}
+    ]
+
+
+def test_competitions_between_dates(dated_competitions):
+    # Test: The competitions of a date range are returned by date, without the ones whose date is invalid.
+    competitions = IndexedRecords(dated_competitions, COMPETITION_INDEX_FIELDS, COMPETITION_SORTED_FIELDS)
+
+    def names(start=None, end=None):
+        return [c["name"] for c in competitions_between(competitions, start, end)]
+
+    assert names() == ["Competition A", "Competition B", "Competition C"]
+    assert names(datetime(2024, 1, 1)) == ["Competition B", "Competition C"]
+    assert names(datetime(2024, 1, 1), datetime(2030, 12, 1, 10)) == ["Competition B"]
+    # Plain lists give the same result.
+    assert competitions_between(dated_competitions, datetime(2024, 1, 1)) == \
+        competitions_between(competitions, datetime(2024, 1, 1))
+
+
+def test_competition_dates_are_parsed_once(mocker, dated_competitions):
+    # Test: Dates are parsed when the competitions are indexed, not each time they are needed.
+    competitions = IndexedRecords(dated_competitions, COMPETITION_INDEX_FIELDS, COMPETITION_SORTED_FIELDS)
+    competitions.reindex()
+    parse = mocker.patch.dict(COMPETITION_SORTED_FIELDS, {"date": mocker.Mock()})
+
+    assert competition_date(competitions, competitions[0]) == datetime(2030, 12, 1, 10)
+    assert competition_date(competitions, competitions[2]) is None
+    competitions_between(competitions, datetime(2024, 1, 1))
+    assert not parse["date"].called
+
+
+def test_dates_index_follows_list_changes(dated_competitions):
+    # Test: Appended competitions are found in the date ranges.
+    competitions = IndexedRecords(dated_competitions, COMPETITION_INDEX_FIELDS, COMPETITION_SORTED_FIELDS)
+    competitions.reindex()
+
+    competitions.append({"name": "Competition D", "date": "2031-01-01 10:00:00", "numberOfPlaces": "25"})
+
+    assert competitions_between(competitions, datetime(2030, 12, 2))[0]["name"] == "Competition D"
+
+
+@pytest.fixture
+def season():
+    # Ten competitions, one a month, the odd ones full.
+    competitions = [{"name": f"{'Spring' if month < 6 else 'Autumn'} Cup {month}",
+                     "date": f"2030-{month:02d}-15 10:00:00", "numberOfPlaces": "0" if month % 2 else "10"}
+                    for month in range(10, 0, -1)]
+    return IndexedRecords(competitions, COMPETITION_INDEX_FIELDS, COMPETITION_SORTED_FIELDS, COMPETITION_FILTERS)
+
+
+def test_competitions_page_cursor(season):
+    # Test: Pages follow each other by date until the last one, which has no next cursor.
+    names = []
+    cursor = 0
+    while cursor is not None:
+        page, cursor = competitions_page(season, cursor=cursor, page_size=4)
+        names.append([c["name"] for c in page])
+
+    assert names == [["Spring Cup 1", "Spring Cup 2", "Spring Cup 3", "Spring Cup 4"],
+                     ["Spring Cup 5", "Autumn Cup 6", "Autumn Cup 7", "Autumn Cup 8"],
+                     ["Autumn Cup 9", "Autumn Cup 10"]]
+
+
+def test_competitions_page_filters(season):
+    # Test: Date range, availability and name prefix filters can be combined.
+    page, cursor = competitions_page(season, start=datetime(2030, 3, 1), end=datetime(2030, 9, 1),
+                                     available_only=True, name_prefix="autumn")
+
+    assert [c["name"] for c in page] == ["Autumn Cup 6", "Autumn Cup 8"]
+    assert cursor is None
+
+
+def test_competitions_page_filters_with_cursor(season):
+    # Test: The cursor of a filtered page leads to the next matching competitions.
+    page, cursor = competitions_page(season, available_only=True, page_size=2)
+    next_page, _ = competitions_page(season, available_only=True, page_size=2, cursor=cursor)
+
+    assert [c["name"] for c in page] == ["Spring Cup 2", "Spring Cup 4"]
+    assert [c["name"] for c in next_page] == ["Autumn Cup 6", "Autumn Cup 8"]
+
+
+def test_competitions_page_without_more_matches(season):
+    # Test: When the competitions after a page are all full, there is no next page.
+    page, cursor = competitions_page(season, end=datetime(2030, 6, 1), available_only=True, page_size=2)
+
+    assert [c["name"] for c in page] == ["Spring Cup 2", "Spring Cup 4"]
+    assert cursor is None
+
+
+def test_competitions_page_follows_the_places_left():
+    # Test: The competitions with places are found again when a booking fills one or a failed booking gives it back.
+    backend = InMemoryBackend([{"name": "Club A", "email": "cluba@example.com", "points": "20"}],
+                              [{"name": f"Cup {month}", "date": f"2030-{month:02d}-15 10:00:00",
+                                "numberOfPlaces": "2", "bookings": {}} for month in range(1, 5)])
+    competitions = backend.load_competitions()
+
+    assert backend.apply_booking("Cup 2", "Club A", 2)
+    assert [c["name"] for c in competitions_page(competitions, available_only=True)[0]] == ["Cup 1", "Cup 3", "Cup 4"]
+    assert not backend.apply_bookings("Club A", [("Cup 1", 2), ("Cup 2", 1)])
+    assert [c["name"] for c in competitions_page(competitions, available_only=True)[0]] == ["Cup 1", "Cup 3", "Cup 4"]
+    data_access._restore([(backend.get_club_by_name("Club A"), backend.get_competition_by_name("Cup 2"), 2)])
+    assert [c["name"] for c in competitions_page(competitions, available_only=True)[0]] == \
+        ["Cup 1", "Cup 2", "Cup 3", "Cup 4"]
+
+
+@pytest.mark.parametrize("prefix", ["autumn", "Autumn Cup 1", "Spring Cup", "Summer"])
+def test_competitions_page_name_prefix(prefix):
+    # Test: Pages of a name prefix, whether few or many competitions have it, are those of a plain filter by date.
+    competitions = IndexedRecords([{"name": f"{'Spring' if day % 3 else 'Autumn'} Cup {day}",
+                                    "date": f"2030-{1 + day // 28:02d}-{1 + day % 28:02d} 10:00:00",
+                                    "numberOfPlaces": str(day % 4)}
+                                   for day in range(1, 200)], COMPETITION_INDEX_FIELDS, COMPETITION_SORTED_FIELDS)
+    expected = [c["name"] for c in competitions
+                if c["name"].casefold().startswith(prefix.casefold()) and int(c["numberOfPlaces"]) > 0]
+
+    names = []
+    cursor = 0
+    while cursor is not None:
+        page, cursor = competitions_page(competitions, available_only=True, name_prefix=prefix, cursor=cursor,
+                                         page_size=5)
+        assert page or cursor is None
+        names.extend(c["name"] for c in page)
+
+    assert names == expected
+
+
+def test_competitions_page_of_plain_list(season):
+    # Test: Plain lists are paginated the same way.
+    assert competitions_page(list(season), name_prefix="Spring", page_size=2) == \
+        competitions_page(season, name_prefix="Spring", page_size=2)
+
+
+def test_upcoming_competitions(backend, dated_competitions):
+    # Test: The backend lists the competitions still to come, by date.
+    backend.save_competitions(dated_competitions)
+
+    assert [c["name"] for c in upcoming_competitions(datetime(2024, 1, 1))] == ["Competition B", "Competition C"]
+
+
+# -------------------------------------------------------
+# Tests for clubs_page Function
+# -------------------------------------------------------
+
+def test_clubs_page():
+    # Test: Clubs are sorted by points (most first, invalid points last) or by name, and cut into pages.
+    clubs = [{"name": name, "points": points} for name, points in
+             (("club c", "5"), ("Club A", "20"), ("Club E", "invalid"), ("Club B", "13"), ("Club D", "5"))]
+
+    assert [c["name"] for c in clubs_page(clubs, 'points')[0]] == ["Club A", "Club B", "club c", "Club D", "Club E"]
+    assert clubs_page(clubs, 'name', page=2, page_size=2) == ([clubs[0], clubs[4]], True)
+    assert clubs_page(clubs, page=3, page_size=2) == ([clubs[4]], False)
+    assert clubs_page(clubs) == (clubs, False)
+
+
+# -------------------------------------------------------
+# Tests for the storage backends
+# -------------------------------------------------------
+
+def test_in_memory_backend_apply_booking(backend):
+    # Test: A booking takes the places and points and records the booking.
+    backend.save_clubs([{"name": "Club A", "email": "cluba@example.com", "points": "10"}])
+    backend.save_competitions([{"name": "Competition A", "date": "2030-10-22 13:30:00", "numberOfPlaces": "25",
+                                "bookings": {}}])
+
+    assert apply_booking("Competition A", "Club A", 4)
+
+    assert get_club_by_email("CLUBA@example.com")["points"] == 6
+    competition = get_competition_by_name("Competition A")
+    assert competition["numberOfPlaces"] == 21
+    assert competition["bookings"] == {"Club A": 4}
+
+
+def test_in_memory_backend_rejects_impossible_booking(backend):
+    # Test: A booking the club or the competition cannot honour changes nothing.
+    backend.save_clubs([{"name": "Club A", "email": "cluba@example.com", "points": "3"}])
+    backend.save_competitions([{"name": "Competition A", "date": "2030-10-22 13:30:00", "numberOfPlaces": "25",
+                                "bookings": {}}])
+
+    assert not apply_booking("Competition A", "Club A", 4)
+    assert not apply_booking("Competition B", "Club A", 1)
+
+    assert get_club_by_name("Club A")["points"] == 3
+    assert get_competition_by_name("Competition A")["bookings"] == {}
+
+
+def test_in_memory_backend_apply_bookings_is_all_or_nothing(backend):
+    # Test: When one booking of a batch cannot be honoured, none of them is applied.
+    backend.save_clubs([{"name": "Club A", "email": "cluba@example.com", "points": "10"}])
+    backend.save_competitions([
+        {"name": "Competition A", "date": "2030-10-22 13:30:00", "numberOfPlaces": "25", "bookings": {}},
+        {"name": "Competition B", "date": "2030-11-22 13:30:00", "numberOfPlaces": "2", "bookings": {}}
+    ])
+
+    assert not apply_bookings("Club A", [("Competition A", 4), ("Competition B", 3)])
+    assert get_club_by_name("Club A")["points"] == 10
+    assert get_competition_by_name("Competition A")["bookings"] == {}
+
+    assert apply_bookings("Club A", [("Competition A", 4), ("Competition B", 2)])
+    assert get_club_by_name("Club A")["points"] == 4
+    assert get_competition_by_name("Competition B")["numberOfPlaces"] == 0
+
+
+def test_data_version_increases_with_every_change(backend):
+    # Test: Saves and bookings increase the version of the data, reading it does not.
+    backend.save_clubs([{"name": "Club A", "email": "cluba@example.com", "points": "10"}])
+    backend.save_competitions([{"name": "Competition A", "date": "2030-10-22 13:30:00", "numberOfPlaces": "25",
+                                "bookings": {}}])
+    scope, version, _ = data_version()
+
+    assert data_version()[:2] == (scope, version)
+    assert apply_booking("Competition A", "Club A", 1)
+    assert data_version()[:2] == (scope, version + 1)
+    assert not apply_booking("Competition A", "Club A", 20)
+    assert data_version()[1] == version + 1
+
+
+def test_json_backend_data_version_sees_other_processes(json_backend, tmp_path):
+    # Test: A data file replaced by another process changes the version.
+    write_clubs_file(tmp_path / "clubs.json", [{"name": "Club A", "email": "cluba@example.com", "points": "10"}])
+    version = data_version()
+    assert data_version() == version
+
+    write_clubs_file(tmp_path / "clubs.json", [{"name": "Club A", "email": "cluba@example.com", "points": "200"}])
+
+    assert data_version()[:2] != version[:2]
+
+
+def test_json_backends_on_the_same_files_share_their_version(json_backend, tmp_path):
+    # Test: Worker processes reading the same data files give the same version, before and after a booking.
+    write_clubs_file(tmp_path / "clubs.json", [{"name": "Club A", "email": "cluba@example.com", "points": "10"}])
+    json_backend.save_competitions([{"name": "Competition A", "date": "2030-10-22 13:30:00", "numberOfPlaces": "25",
+                                     "bookings": {}}])
+    other = JSONFileBackend(str(tmp_path / "clubs.json"), str(tmp_path / "competitions.json"))
+    assert other.data_version() == json_backend.data_version()
+
+    assert json_backend.apply_booking("Competition A", "Club A", 1)
+
+    assert other.data_version() == json_backend.data_version()
+
+
+def test_json_backend_apply_booking_saves_both_files(json_backend, tmp_path):
+    # Test: A booking is written to both data files.
+    write_clubs_file(tmp_path / "clubs.json", [{"name": "Club A", "email": "cluba@example.com", "points": "10"}])
+    (tmp_path / "competitions.json").write_text(json.dumps({"competitions": [
+        {"name": "Competition A", "date": "2030-10-22 13:30:00", "numberOfPlaces": "25", "bookings": {}}]}))
+
+    assert apply_booking("Competition A", "Club A", 2)
+
+    with open(tmp_path / "clubs.json") as c:
+        assert json.load(c)["clubs"][0]["points"] == 8
+    with open(tmp_path / "competitions.json") as c:
+        assert json.load(c)["competitions"][0]["bookings"] == {"Club A": 2}
+
+
+def test_json_backend_apply_booking_rolls_back_on_save_error(mocker, json_backend, tmp_path):
+    # Test: If the competitions cannot be saved, the points taken from the club are put back.
+    write_clubs_file(tmp_path / "clubs.json", [{"name": "Club A", "email": "cluba@example.com", "points": "10"}])
+    (tmp_path / "competitions.json").write_text(json.dumps({"competitions": [
+        {"name": "Competition A", "date": "2030-10-22 13:30:00", "numberOfPlaces": "25", "bookings": {}}]}))
+    mocker.patch.object(json_backend, "save_competitions", return_value=False)
+
+    assert not apply_booking("Competition A", "Club A", 2)
+
+    with open(tmp_path / "clubs.json") as c:
+        assert json.load(c)["clubs"][0]["points"] == 10
+    assert get_competition_by_name("Competition A")["bookings"] == {}
+
+
+def test_create_backend_from_config(tmp_path):
+    # Test: The backend named in the configuration is created.
+    config = {"CLUBS_FILE": str(tmp_path / "clubs.json"), "COMPETITIONS_FILE": str(tmp_path / "competitions.json"),
+              "SQLITE_DATABASE": str(tmp_path / "gudlft.db")}
+
+    assert isinstance(create_backend(dict(config, STORAGE_BACKEND="json")), JSONFileBackend)
+    assert isinstance(create_backend(dict(config, STORAGE_BACKEND="memory")), InMemoryBackend)
+    assert isinstance(create_backend(dict(config, STORAGE_BACKEND="sqlite")), SQLiteBackend)
+    with pytest.raises(ValueError):
+        create_backend(dict(config, STORAGE_BACKEND="unknown"))
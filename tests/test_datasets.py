@@ -0,0 +1,79 @@
+import json
+from datetime import datetime
+
+import data_access
+from datasets import PLACES_LIMIT
+from datasets import generate_clubs
+from datasets import generate_dataset
+from datasets import main
+from models import clubs_from_dicts
+from models import competitions_from_dicts
+
+TODAY = datetime(2030, 1, 1)
+
+
+# -------------------------------------------------------
+# Tests for the generated clubs and competitions
+# -------------------------------------------------------
+
+def test_same_seed_gives_same_data():
+    # Test: The data only depends on the sizes, the seed and the day.
+    assert generate_dataset(50, 20, seed=7, today=TODAY) == generate_dataset(50, 20, seed=7, today=TODAY)
+    assert generate_dataset(50, 20, seed=7, today=TODAY) != generate_dataset(50, 20, seed=8, today=TODAY)
+
+
+def test_clubs_have_unique_names_and_emails():
+    # Test: Names and emails identify the clubs, and points are numbers that are never negative.
+    clubs = generate_clubs(1000)
+
+    assert len({club["name"] for club in clubs}) == 1000
+    assert len({club["email"] for club in clubs}) == 1000
+    assert all(isinstance(club["points"], int) and club["points"] >= 0 for club in clubs)
+
+
+def test_competitions_are_past_and_upcoming():
+    # Test: About past_share of the competitions are over, and every date can be read by the application.
+    _, competitions = generate_dataset(100, 1000, today=TODAY, past_share=0.3)
+
+    records = competitions_from_dicts(competitions)
+    assert all(record.parsed_date is not None for record in records)
+    past = sum(record.parsed_date < TODAY for record in records)
+    assert 200 < past < 400
+
+
+def test_bookings_follow_the_rules():
+    # Test: Bookings are made by existing clubs, within the limit of places per club, and places are never negative.
+    clubs, competitions = generate_dataset(200, 500, today=TODAY)
+
+    names = {club["name"] for club in clubs}
+    assert any(competition["bookings"] for competition in competitions)
+    for competition in competitions:
+        assert competition["numberOfPlaces"] >= 0
+        assert set(competition["bookings"]) <= names
+        assert all(0 < places <= PLACES_LIMIT for places in competition["bookings"].values())
+
+
+# -------------------------------------------------------
+# Tests for the command line
+# -------------------------------------------------------
+
+def test_command_writes_data_files(tmp_path):
+    # Test: The files written are read by the JSON storage, with numbers for points and places.
+    clubs_file = str(tmp_path / "generated" / "clubs.json")
+    competitions_file = str(tmp_path / "generated" / "competitions.json")
+
+    assert main([clubs_file, competitions_file, '--clubs', '30', '--competitions', '10', '--today', '2030-01-01']) == 0
+
+    data_access.invalidate()
+    backend = data_access.JSONFileBackend(clubs_file, competitions_file)
+    assert len(backend.load_clubs()) == 30
+    assert len(backend.load_competitions()) == 10
+    with open(clubs_file) as f:
+        assert clubs_from_dicts(json.load(f)["clubs"])[0].points is not None
+    data_access.invalidate()
+
+
+def test_command_refuses_invalid_day(tmp_path):
+    # Test: An invalid --today writes nothing.
+    assert main([str(tmp_path / "clubs.json"), str(tmp_path / "competitions.json"), '--today', '01/01/2030']) == 1
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,95 @@
+from fragment_cache import FragmentCache
+from fragment_cache import cached_fragment
+from fragment_cache import fragment_cache_stats
+
+
+# -------------------------------------------------------
+# Tests for FragmentCache Class
+# -------------------------------------------------------
+
+def test_least_recently_used_fragments_are_dropped():
+    # Test: Once over its size, the cache drops the fragments used the longest time ago.
+    cache = FragmentCache(max_bytes=40)
+    cache.put("a", "x" * 10)
+    cache.put("b", "x" * 10)
+    cache.put("c", "x" * 10)
+    cache.get("a")
+
+    cache.put("d", "x" * 10)
+    cache.put("e", "x" * 10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 10
+    assert cache.stats()["bytes"] == 40
+    assert cache.stats()["evictions"] == 1
+
+
+def test_large_fragments_are_not_kept():
+    # Test: A fragment larger than a quarter of the cache is not kept.
+    cache = FragmentCache(max_bytes=40)
+    cache.put("a", "x" * 11)
+
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_stats_report_hit_rate():
+    # Test: The hit rate is the share of lookups that found a fragment.
+    cache = FragmentCache(max_bytes=1000)
+    cache.get("a")
+    cache.put("a", "fragment")
+    cache.get("a")
+    cache.get("a")
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert round(stats["hit_rate"], 2) == 0.67
+    assert stats["bytes"] == len("fragment")
+
+
+# -------------------------------------------------------
+# Tests for cached_fragment Function
+# -------------------------------------------------------
+
+def test_fragments_are_rendered_once_per_version(backend, mocker, mock_load_clubs):
+    # Test: A fragment is rendered again only after the data changed.
+    render = mocker.Mock(side_effect=["<p>first</p>", "<p>second</p>"])
+
+    assert cached_fragment("test", 1, render) == "<p>first</p>"
+    assert cached_fragment("test", 1, render) == "<p>first</p>"
+    backend.save_clubs(mock_load_clubs)
+    assert cached_fragment("test", 1, render) == "<p>second</p>"
+    assert render.call_count == 2
+
+
+def test_saves_drop_the_fragments(backend, mock_load_clubs):
+    # Test: Fragments of the previous data are dropped as soon as this process saves.
+    cached_fragment("test", 1, lambda: "<p>fragment</p>")
+    assert fragment_cache_stats()["entries"] > 0
+
+    backend.save_clubs(mock_load_clubs)
+
+    assert fragment_cache_stats()["entries"] == 0
+
+
+def test_disabled_cache_always_renders(make_app, mocker):
+    # Test: With a size of 0, nothing is kept.
+    render = mocker.Mock(return_value="<p>fragment</p>")
+    with make_app(FRAGMENT_CACHE_BYTES=0).app_context():
+        cached_fragment("test", 1, render)
+        cached_fragment("test", 1, render)
+
+    assert render.call_count == 2
+
+
+def test_club_points_table_is_cached(client, backend, mock_load_clubs):
+    # Test: The club points table is rendered once and then served from the cache, until the clubs change.
+    backend.save_clubs(mock_load_clubs)
+    first = client.get('/club-points').data
+    hits = fragment_cache_stats()["hits"]
+
+    assert client.get('/club-points').data == first
+    assert fragment_cache_stats()["hits"] == hits + 1
+
+    backend.save_clubs([{"name": "Other Club", "email": "other@example.co", "points": "3"}])
+    assert b"Other Club" in client.get('/club-points').data
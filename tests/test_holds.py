@@ -0,0 +1,189 @@
+import time
+
+import pytest
+
+import data_access
+from holds import HoldTable
+from holds import FileHoldTable
+from holds import hold_stats
+from constants import BOOKING_COMPLETE_MESSAGE
+from constants import INSUFFICIENT_PLACES_MESSAGE
+
+
+@pytest.fixture
+def hot_competition(backend):
+    # Two clubs and a competition with only 5 places left, with no holds.
+    backend.save_clubs([{"name": "Club A", "email": "cluba@example.com", "points": 20},
+                        {"name": "Club B", "email": "clubb@example.com", "points": 20}])
+    backend.save_competitions([{"name": "Hot Competition", "date": "2030-10-22 13:30:00", "numberOfPlaces": 5,
+                                "bookings": {}}])
+    return backend
+
+
+def hold(client, club, places):
+    return client.post(f'/book/Hot Competition/{club}', data={'places': places})
+
+
+def purchase(client, club, places):
+    return client.post('/purchase-places', data={'competition': "Hot Competition", 'club': club, 'places': places})
+
+
+# -------------------------------------------------------
+# Tests for HoldTable Class
+# -------------------------------------------------------
+
+def test_hold_counts_for_other_clubs_only():
+    # Test: Places held by a club are taken from what the other clubs see, not from what it sees itself.
+    table = HoldTable(60)
+
+    assert table.place("Competition", "Club A", 3, 5) is not None
+
+    assert table.held("Competition", "Club B") == 3
+    assert table.held("Competition", "Club A") == 0
+
+
+def test_hold_refused_when_places_are_held():
+    # Test: A club cannot hold places already held by another club.
+    table = HoldTable(60)
+    table.place("Competition", "Club A", 3, 5)
+
+    assert table.place("Competition", "Club B", 3, 5) is None
+    assert table.place("Competition", "Club B", 2, 5) is not None
+    assert table.stats()["refused"] == 1
+
+
+def test_holding_again_replaces_the_hold():
+    # Test: A club holding places again in a competition keeps a single hold.
+    table = HoldTable(60)
+    table.place("Competition", "Club A", 3, 5)
+
+    assert table.place("Competition", "Club A", 5, 5) is not None
+
+    assert table.held("Competition") == 5
+    assert table.stats()["active"] == 1
+
+
+def test_expired_holds_are_reclaimed():
+    # Test: Once expired, the places of a hold are free again.
+    table = HoldTable(0.01)
+    table.place("Competition", "Club A", 5, 5)
+    time.sleep(0.02)
+
+    assert table.held("Competition", "Club B") == 0
+    assert table.place("Competition", "Club B", 5, 5) is not None
+    assert table.stats()["expired"] == 1
+
+
+def test_released_hold_frees_its_places():
+    # Test: A hold ended by a booking no longer counts, and does not expire later.
+    table = HoldTable(0.01)
+    table.place("Competition", "Club A", 5, 5)
+    table.release("Competition", "Club A")
+    time.sleep(0.02)
+
+    assert table.held("Competition") == 0
+    assert table.stats()["confirmed"] == 1
+    assert table.stats()["expired"] == 0
+
+
+# -------------------------------------------------------
+# Tests for FileHoldTable Class
+# -------------------------------------------------------
+
+def test_holds_in_a_file_are_seen_by_other_workers(tmp_path):
+    # Test: Places held through one worker's table count for the clubs booking through another one.
+    first, second = FileHoldTable(str(tmp_path / "holds.json"), 60), FileHoldTable(str(tmp_path / "holds.json"), 60)
+
+    assert first.place("Competition", "Club A", 3, 5) is not None
+
+    assert second.held("Competition", "Club B") == 3
+    assert second.place("Competition", "Club B", 3, 5) is None
+    second.release("Competition", "Club A")
+    assert first.held("Competition", "Club B") == 0
+
+
+def test_expired_holds_are_dropped_from_the_file(tmp_path):
+    # Test: Once expired, the places of a hold kept in a file are free again.
+    table = FileHoldTable(str(tmp_path / "holds.json"), 0.01)
+    table.place("Competition", "Club A", 5, 5)
+    time.sleep(0.02)
+
+    assert table.held("Competition", "Club B") == 0
+    assert table.place("Competition", "Club B", 5, 5) is not None
+    assert table.stats()["expired"] == 1
+    assert table.stats()["active"] == 1
+
+
+# -------------------------------------------------------
+# Tests for holds on the booking pages
+# -------------------------------------------------------
+
+def test_book_holds_places(client, hot_competition):
+    # Test: The booking page sent with places holds them and fills in the form with them.
+    response = hold(client, "Club A", "4")
+
+    assert b"4 place(s) are held for you" in response.data
+    assert b'value="4"' in response.data
+    assert hold_stats()["places_held"] == 4
+
+
+def test_held_places_cannot_be_booked_by_another_club(client, hot_competition):
+    # Test: Another club only gets the places that are not held, and the club holding them gets them.
+    hold(client, "Club A", "4")
+
+    response = purchase(client, "Club B", "2")
+    assert INSUFFICIENT_PLACES_MESSAGE.encode() in client.get(response.headers["Location"]).data
+
+    response = purchase(client, "Club A", "4")
+    assert BOOKING_COMPLETE_MESSAGE.encode() in response.data
+    assert hot_competition.get_competition_by_name("Hot Competition")["numberOfPlaces"] == 1
+    assert hold_stats()["active"] == 0
+
+
+def test_booking_ends_the_hold_of_the_club(client, hot_competition):
+    # Test: The hold ends in the same step as the booking of its places, whatever route made it.
+    hold(client, "Club A", "4")
+
+    assert data_access.apply_booking("Hot Competition", "Club A", 4)
+
+    assert hold_stats()["active"] == 0
+    assert hold_stats()["confirmed"] == 1
+
+
+def test_holds_are_not_placed_by_a_get(client, hot_competition):
+    # Test: Opening the booking page never holds places, even with places in the query string.
+    client.get('/book/Hot Competition/Club A?places=4')
+
+    assert hold_stats()["active"] == 0
+
+
+def test_book_refuses_hold_on_held_places(client, hot_competition):
+    # Test: Holding places already held by another club is refused with the reason.
+    hold(client, "Club A", "4")
+
+    response = hold(client, "Club B", "2")
+
+    assert INSUFFICIENT_PLACES_MESSAGE.encode() in response.data
+    assert b"held for you" not in response.data
+
+
+def test_api_purchase_respects_holds(client, hot_competition):
+    # Test: The JSON API does not book the places held for another club.
+    hold(client, "Club A", "4")
+    body = {"club": "Club B", "competition": "Hot Competition", "places": 2}
+
+    response = client.post('/api/v1/purchases', json=body)
+
+    assert response.get_json()["error"]["code"] == "insufficient_places"
+
+
+def test_book_without_holds(make_app, hot_competition):
+    # Test: With HOLD_SECONDS set to 0, sending places holds nothing.
+    without_holds = make_app(HOLD_SECONDS=0)
+
+    response = hold(without_holds.test_client(), "Club A", "4")
+
+    assert response.status_code == 200
+    assert b"held for you" not in response.data
+    with without_holds.app_context():
+        assert hold_stats()["active"] == 0
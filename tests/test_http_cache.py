@@ -0,0 +1,91 @@
+import server
+
+
+# -------------------------------------------------------
+# Tests for conditional Function
+# -------------------------------------------------------
+
+def test_club_points_sends_etag_and_last_modified(client, backend, mock_load_clubs):
+    # Test: A read route tells the version of the data it was rendered from.
+    backend.save_clubs(mock_load_clubs)
+
+    response = client.get('/club-points')
+
+    assert response.status_code == 200
+    assert response.headers["ETag"]
+    assert response.headers["Last-Modified"]
+    assert response.headers["Cache-Control"] == "no-cache"
+
+
+def test_unchanged_data_answers_not_modified(client, backend, mocker, mock_load_clubs):
+    # Test: Sending back the ETag of unchanged data gives a 304 without loading the clubs.
+    backend.save_clubs(mock_load_clubs)
+    etag = client.get('/club-points').headers["ETag"]
+    load_clubs = mocker.spy(server, 'load_clubs')
+
+    response = client.get('/club-points', headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.data == b""
+    assert load_clubs.call_count == 0
+
+
+def test_changed_data_is_rendered_again(client, backend, mock_load_clubs, mock_load_competitions):
+    # Test: After a booking, the old ETag no longer matches.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
+    etag = client.get('/club-points').headers["ETag"]
+
+    backend.apply_booking("Test Competition", "Test Club", 1)
+    response = client.get('/club-points', headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_if_modified_since(client, backend, mock_load_clubs):
+    # Test: A copy at least as recent as the last change is not sent again.
+    backend.save_clubs(mock_load_clubs)
+    last_modified = client.get('/club-points').headers["Last-Modified"]
+
+    response = client.get('/club-points', headers={"If-Modified-Since": last_modified})
+
+    assert response.status_code == 304
+
+
+def test_pending_flash_messages_are_rendered(client, backend, mock_load_clubs, mock_load_competitions):
+    # Test: A page that has flash messages to show is rendered even if the data did not change.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
+    etag = client.get('/club-points').headers["ETag"]
+
+    client.post('/purchase-places', data={'competition': "Test Competition", 'club': "Test Club", 'places': "50"})
+    response = client.get('/club-points', headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+
+
+def test_booking_page_is_never_cached(client, backend, mock_load_clubs, mock_load_competitions):
+    # Test: The booking form is rendered on every visit, with a new idempotency key, and is not stored by the browser.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
+    first = client.get('/book/Test%20Competition/Test%20Club')
+
+    second = client.get('/book/Test%20Competition/Test%20Club', headers={"If-None-Match": '"anything"'})
+
+    assert second.status_code == 200
+    assert "ETag" not in first.headers
+    assert first.headers["Cache-Control"] == "no-store"
+    assert first.data != second.data
+
+
+def test_time_dependent_etag_counts_started_competitions(client, backend):
+    # Test: The ETag of the competitions list changes when a competition starts, even if the data does not.
+    backend.save_competitions([
+        {"name": "Past Competition", "date": "2020-10-22 13:30:00", "numberOfPlaces": "30", "bookings": {}},
+        {"name": "Future Competition", "date": "2050-10-22 13:30:00", "numberOfPlaces": "30", "bookings": {}}
+    ])
+
+    response = client.get('/api/v1/competitions')
+
+    assert response.headers["ETag"].endswith('-1"')
@@ -0,0 +1,247 @@
+import time
+import threading
+
+from idempotency import IdempotencyStore
+from idempotency import FileIdempotencyStore
+from idempotency import Outcome
+from idempotency import idempotency_stats
+from constants import BOOKING_COMPLETE_MESSAGE
+from constants import IDEMPOTENCY_KEY_REUSED_MESSAGE
+from constants import INSUFFICIENT_POINTS_MESSAGE
+
+
+def outcome(ttl, body=b"booked"):
+    return Outcome(("Test Competition", "Test Club", "2"), 200, [], body, [], time.monotonic() + ttl)
+
+
+def purchase(client, key, places="2"):
+    return client.post('/purchase-places', data={'competition': "Test Competition", 'club': "Test Club",
+                                                 'places': places, 'idempotency_key': key})
+
+
+# -------------------------------------------------------
+# Tests for IdempotencyStore Class
+# -------------------------------------------------------
+
+def test_claimed_key_gets_its_outcome():
+    # Test: Once released with an outcome, a key returns that outcome instead of being claimed again.
+    store = IdempotencyStore(60, 10)
+
+    assert store.claim("key") is None
+    store.release("key", outcome(60))
+
+    assert store.claim("key").body == b"booked"
+    assert store.stats()["replays"] == 1
+
+
+def test_released_key_without_outcome_can_be_claimed_again():
+    # Test: A key whose booking did not go through is claimed by the next request.
+    store = IdempotencyStore(60, 10)
+    assert store.claim("key") is None
+    store.release("key")
+
+    assert store.claim("key") is None
+
+
+def test_outcomes_expire():
+    # Test: Expired outcomes are dropped, from the oldest.
+    store = IdempotencyStore(60, 10)
+    for key, ttl in (("old", -1), ("new", 60)):
+        store.claim(key)
+        store.release(key, outcome(ttl))
+
+    assert store.stats()["entries"] == 1
+    assert store.stats()["expirations"] == 1
+    assert store.claim("new") is not None
+
+
+def test_oldest_outcomes_are_evicted_past_max_entries():
+    # Test: The table never keeps more than max_entries outcomes.
+    store = IdempotencyStore(60, 2)
+    for key in ("first", "second", "third"):
+        store.claim(key)
+        store.release(key, outcome(60))
+
+    assert store.stats()["entries"] == 2
+    assert store.stats()["evictions"] == 1
+    assert store.claim("first") is None
+
+
+def test_concurrent_retry_waits_for_the_first_request():
+    # Test: A retry arriving while the key is claimed waits, then gets the outcome of the first request.
+    store = IdempotencyStore(60, 10)
+    store.claim("key")
+    results = []
+    retry = threading.Thread(target=lambda: results.append(store.claim("key")))
+    retry.start()
+    retry.join(timeout=0.05)
+    assert retry.is_alive()
+
+    store.release("key", outcome(60))
+    retry.join(timeout=5)
+
+    assert results[0].body == b"booked"
+    assert store.stats()["waits"] == 1
+
+
+# -------------------------------------------------------
+# Tests for FileIdempotencyStore Class
+# -------------------------------------------------------
+
+def test_outcome_kept_in_directory_is_seen_by_other_workers(tmp_path):
+    # Test: An outcome written by one worker's store is given by another store of the same directory.
+    first, second = FileIdempotencyStore(str(tmp_path), 60, 10), FileIdempotencyStore(str(tmp_path), 60, 10)
+
+    assert first.claim("key") is None
+    first.release("key", outcome(60))
+
+    replayed = second.claim("key")
+    assert replayed.body == b"booked"
+    assert replayed.fingerprint == ("Test Competition", "Test Club", "2")
+
+
+def test_retry_in_another_worker_waits_for_the_first_request(tmp_path):
+    # Test: A retry arriving at another worker while the key is claimed waits, then gets the outcome.
+    first, second = FileIdempotencyStore(str(tmp_path), 60, 10), FileIdempotencyStore(str(tmp_path), 60, 10)
+    first.claim("key")
+    results = []
+    retry = threading.Thread(target=lambda: results.append(second.claim("key")))
+    retry.start()
+    retry.join(timeout=0.05)
+    assert retry.is_alive()
+
+    first.release("key", outcome(60))
+    retry.join(timeout=5)
+
+    assert results[0].body == b"booked"
+    assert second.stats()["waits"] == 1
+
+
+def test_expired_files_are_removed(tmp_path):
+    # Test: Outcomes older than the ttl are not given, and their files are removed by the next sweep.
+    store = FileIdempotencyStore(str(tmp_path), 0.01, 10)
+    for key in ("old", "expired"):
+        store.claim(key)
+        store.release(key, outcome(60))
+    time.sleep(0.02)
+
+    assert store.claim("expired") is None
+    store._next_sweep = 0.0
+    store.release("expired")
+
+    assert store.stats()["entries"] == 0
+    assert store.stats()["expirations"] == 2
+
+
+# -------------------------------------------------------
+# Tests for idempotent purchases
+# -------------------------------------------------------
+
+def test_retried_purchase_books_once(client, backend, mock_load_clubs, mock_load_competitions):
+    # Test: Sending the same form twice books the places once and shows the confirmation both times.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
+
+    first = purchase(client, "retried-purchase")
+    second = purchase(client, "retried-purchase")
+
+    assert first.status_code == second.status_code == 200
+    assert BOOKING_COMPLETE_MESSAGE.encode() in second.data
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert backend.get_club_by_name("Test Club")["points"] == 8
+    assert backend.get_competition_by_name("Test Competition")["numberOfPlaces"] == 28
+
+
+def test_retried_purchase_does_not_load_data(client, backend, mocker, mock_load_clubs, mock_load_competitions):
+    # Test: A retry is answered without reading the clubs or the competitions.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
+    purchase(client, "no-load-purchase")
+    load_clubs = mocker.spy(backend, "load_clubs")
+
+    purchase(client, "no-load-purchase")
+
+    assert load_clubs.call_count == 0
+
+
+def test_refused_purchase_is_checked_again(client, backend, mock_load_competitions):
+    # Test: A booking that was refused is not kept, so the form can be sent again once corrected.
+    backend.save_clubs([{"name": "Test Club", "email": "testclubmail@example.co", "points": 1}])
+    backend.save_competitions(mock_load_competitions)
+
+    response = purchase(client, "refused-purchase", places="2")
+    assert response.status_code == 302
+    assert INSUFFICIENT_POINTS_MESSAGE.encode() in client.get(response.headers["Location"]).data
+
+    response = purchase(client, "refused-purchase", places="1")
+    assert response.status_code == 200
+    assert backend.get_club_by_name("Test Club")["points"] == 0
+
+
+def test_key_reused_for_another_booking(client, backend, mock_load_clubs, mock_load_competitions):
+    # Test: A key sent again with another number of places is refused, without booking.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
+    purchase(client, "reused-purchase", places="2")
+
+    response = purchase(client, "reused-purchase", places="3")
+
+    assert response.status_code == 302
+    assert IDEMPOTENCY_KEY_REUSED_MESSAGE.encode() in client.get(response.headers["Location"]).data
+    assert backend.get_club_by_name("Test Club")["points"] == 8
+
+
+def test_retry_sent_to_another_worker_books_once(make_app, backend, tmp_path, mock_load_clubs,
+                                                 mock_load_competitions):
+    # Test: With the outcomes kept in a shared directory, a retry answered by another worker does not book again.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
+    workers = [make_app(IDEMPOTENCY_DIRECTORY=str(tmp_path)) for _ in range(2)]
+
+    first = purchase(workers[0].test_client(), "shared-purchase")
+    second = purchase(workers[1].test_client(), "shared-purchase")
+
+    assert first.status_code == second.status_code == 200
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert backend.get_club_by_name("Test Club")["points"] == 8
+
+
+def test_booking_page_sends_a_key(client, backend, mock_load_clubs, mock_load_competitions):
+    # Test: The booking form holds an idempotency key.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
+
+    response = client.get('/book/Test Competition/Test Club')
+
+    assert b'name="idempotency_key"' in response.data
+
+
+def test_api_purchase_with_idempotency_key_header(client, backend, mock_load_clubs, mock_load_competitions):
+    # Test: The JSON API books once for a key given in the Idempotency-Key header.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
+    body = {"club": "Test Club", "competition": "Test Competition", "places": 2}
+
+    first = client.post('/api/v1/purchases', json=body, headers={"Idempotency-Key": "api-purchase"})
+    second = client.post('/api/v1/purchases', json=body, headers={"Idempotency-Key": "api-purchase"})
+    reused = client.post('/api/v1/purchases', json=dict(body, places=1), headers={"Idempotency-Key": "api-purchase"})
+
+    assert first.status_code == second.status_code == 201
+    assert second.get_json() == first.get_json()
+    assert reused.get_json()["error"]["code"] == "idempotency_key_reused"
+    assert backend.get_club_by_name("Test Club")["points"] == 8
+
+
+def test_disabled_idempotency_books_every_time(make_app, backend, mock_load_clubs, mock_load_competitions):
+    # Test: With a ttl of 0, the key is ignored.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
+    disabled = make_app(IDEMPOTENCY_TTL=0)
+    client = disabled.test_client()
+
+    purchase(client, "disabled-purchase")
+    purchase(client, "disabled-purchase")
+
+    assert backend.get_club_by_name("Test Club")["points"] == 6
+    with disabled.app_context():
+        assert idempotency_stats()["entries"] == 0
@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import fcntl
+import threading
+
+import pytest
+
+import data_access
+from data_access import JSONFileBackend
+from locks import booking_lock
+from locks import data_lock
+from locks import lock_stats
+from locks import release_booking_locks
+from locks import reset_lock_stats
+import locks
+from locks import SharedFileLock
+
+
+@pytest.fixture
+def lock_file(tmp_path):
+    # Keeps the lock file of the tests out of the data folders.
+    return str(tmp_path / ".data.lock")
+
+
+# -------------------------------------------------------
+# Tests for booking_lock Function
+# -------------------------------------------------------
+
+def test_booking_lock_serializes_same_competition(lock_file, run_in_threads):
+    # Test: Two bookings for the same competition never run at the same time.
+    inside = []
+    overlaps = []
+
+    def book(club_name):
+        with booking_lock("Test Competition", club_name, lock_file):
+            inside.append(club_name)
+            if len(inside) > 1:
+                overlaps.append(club_name)
+            time.sleep(0.05)
+            inside.remove(club_name)
+
+    run_in_threads(book, [("Club A",), ("Club B",)])
+
+    assert overlaps == []
+
+
+def test_booking_lock_lets_different_competitions_run_in_parallel(lock_file, run_in_threads):
+    # Test: Bookings for different competitions by different clubs do not wait for each other.
+    both_inside = threading.Barrier(2, timeout=2)
+
+    def book(competition_name, club_name):
+        with booking_lock(competition_name, club_name, lock_file):
+            both_inside.wait()  # Raises BrokenBarrierError if the second booking cannot get in
+
+    run_in_threads(book, [("Competition A", "Club A"), ("Competition B", "Club B")])
+
+    assert not both_inside.broken
+
+
+def test_booking_lock_holds_file_lock(lock_file):
+    # Test: While a booking runs, another process cannot take the lock on the data files.
+    with booking_lock("Test Competition", "Test Club", lock_file):
+        fd = os.open(lock_file, os.O_RDWR)
+        try:
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        finally:
+            os.close(fd)
+
+    fd = os.open(lock_file, os.O_RDWR)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)  # Released once the booking is over
+    finally:
+        os.close(fd)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs os.fork")
+def test_booking_lock_serializes_processes_sharing_json_files(tmp_path):
+    # Test: Worker processes booking the same competition through the same JSON files never sell more places than
+    # it has, and every club pays exactly the places it got.
+    data_access.invalidate()
+    backend = JSONFileBackend(str(tmp_path / "clubs.json"), str(tmp_path / "competitions.json"))
+    backend.save_clubs([{"name": f"Club {i}", "email": f"club{i}@example.com", "points": 20} for i in range(4)])
+    backend.save_competitions([{"name": "Test Competition", "date": "2030-10-22 13:30:00", "numberOfPlaces": 10,
+                                "bookings": {}}])
+
+    pids = {}
+    for i in range(4):
+        pid = os.fork()
+        if pid == 0:
+            booked = 0
+            for _ in range(5):  # 20 places asked for, 10 to sell
+                with booking_lock("Test Competition", f"Club {i}", backend.lock_path):
+                    booked += backend.apply_booking("Test Competition", f"Club {i}", 1)
+            os._exit(booked)
+        pids[f"Club {i}"] = pid
+    booked = {club_name: os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) for club_name, pid in pids.items()}
+
+    with open(tmp_path / "competitions.json") as c:
+        competition = json.load(c)["competitions"][0]
+    with open(tmp_path / "clubs.json") as c:
+        points = {club["name"]: club["points"] for club in json.load(c)["clubs"]}
+    assert sum(booked.values()) == 10
+    assert competition["numberOfPlaces"] == 0
+    assert competition["bookings"] == {club_name: places for club_name, places in booked.items() if places}
+    assert points == {club_name: 20 - places for club_name, places in booked.items()}
+
+
+def test_shared_file_lock_is_released_by_last_thread(tmp_path):
+    # Test: The file lock stays held until every thread of the process has released it.
+    lock = SharedFileLock(str(tmp_path / ".data.lock"))
+    lock.acquire()
+    lock.acquire()
+    lock.release()
+
+    fd = os.open(lock.path, os.O_RDWR)
+    try:
+        with pytest.raises(BlockingIOError):
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        lock.release()
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    finally:
+        os.close(fd)
+
+
+def test_shared_file_lock_is_released_after_max_hold(tmp_path):
+    # Test: Once the lock was held for max_hold seconds, a new thread waits until it is released, so that another
+    # process can take it in between.
+    lock = SharedFileLock(str(tmp_path / ".data.lock"), max_hold=0.01)
+    lock.acquire()
+    time.sleep(0.02)
+    entered = threading.Event()
+
+    def enter():
+        lock.acquire()
+        entered.set()
+        lock.release()
+
+    newcomer = threading.Thread(target=enter)
+    newcomer.start()
+    assert not entered.wait(0.05)
+
+    lock.release()
+    newcomer.join(timeout=2)
+    assert entered.is_set()
+
+
+def test_booking_locks_are_dropped_when_released(lock_file):
+    # Test: Names that are not booked anymore, such as unknown names sent by a client, leave no lock behind.
+    for i in range(100):
+        with booking_lock(f"Unknown Competition {i}", f"Unknown Club {i}", lock_file):
+            pass
+
+    assert len(locks._competition_locks) == 0
+    assert len(locks._club_locks) == 0
+
+
+def test_release_booking_locks_keeps_file_lock(lock_file):
+    # Test: Once released, the competition can be booked by another thread, while other processes still wait for the
+    # file lock until the end of the block.
+    booked = threading.Event()
+
+    def book():
+        with booking_lock("Test Competition", "Club B", lock_file):
+            booked.set()
+
+    with booking_lock("Test Competition", "Club A", lock_file):
+        release_booking_locks()
+        other = threading.Thread(target=book)
+        other.start()
+        assert booked.wait(2)
+        fd = os.open(lock_file, os.O_RDWR)
+        try:
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        finally:
+            os.close(fd)
+    other.join()
+
+    assert len(locks._competition_locks) == 0
+    assert locks.bookings_waiting() == 0
+
+
+# -------------------------------------------------------
+# Tests for lock_stats Function
+# -------------------------------------------------------
+
+def test_lock_stats_records_wait_time(lock_file):
+    # Test: The time spent waiting for a lock is reported.
+    reset_lock_stats()
+    release = threading.Event()
+
+    def hold():
+        with booking_lock("Test Competition", "Club A", lock_file):
+            release.wait(1)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    time.sleep(0.02)
+    threading.Timer(0.05, release.set).start()
+    with booking_lock("Test Competition", "Club B", lock_file):
+        pass
+    holder.join()
+    with data_lock():
+        pass
+
+    stats = lock_stats()
+    assert stats["competition"]["acquisitions"] == 2
+    assert stats["competition"]["wait_seconds_max"] >= 0.02
+    assert stats["data"]["acquisitions"] == 1
@@ -0,0 +1,176 @@
+import os
+import json
+import time
+
+import pytest
+
+import metrics
+from metrics import Histogram
+from metrics import render_metrics
+from data_access import JSONFileBackend
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    # Every test starts from zero, and leaves no directory for this process to write to.
+    metrics.reset()
+    yield
+    metrics.reset()
+    metrics._flushed.clear()
+    metrics._flusher["thread"] = None
+    metrics._process["retired"] = False
+
+
+def sample_lines(text: str, name: str) -> list:
+    return [line for line in text.splitlines() if line.startswith(name)]
+
+
+# -------------------------------------------------------
+# Tests for Histogram Class
+# -------------------------------------------------------
+
+def test_histogram_buckets_are_cumulative():
+    # Test: Each bucket counts the observations up to its bound, and the sum and count are given.
+    histogram = Histogram('gudlft_test_seconds', 'Test.', ('step',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, 'load')
+
+    lines = sample_lines(render_metrics(), 'gudlft_test_seconds')
+
+    assert lines == ['gudlft_test_seconds_bucket{step="load",le="0.1"} 1',
+                     'gudlft_test_seconds_bucket{step="load",le="1.0"} 2',
+                     'gudlft_test_seconds_bucket{step="load",le="+Inf"} 3',
+                     'gudlft_test_seconds_sum{step="load"} 5.55',
+                     'gudlft_test_seconds_count{step="load"} 3']
+    del metrics._metrics['gudlft_test_seconds']
+
+
+def test_time_decorator_observes_each_call():
+    # Test: A function decorated with time() is observed once per call, even when it raises.
+    histogram = Histogram('gudlft_test_calls_seconds', 'Test.')
+
+    @histogram.time()
+    def failing():
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        failing()
+
+    assert histogram.snapshot()[0][1][-1] + sum(histogram.snapshot()[0][1][:-1]) == 1
+    del metrics._metrics['gudlft_test_calls_seconds']
+
+
+# -------------------------------------------------------
+# Tests for the /metrics route
+# -------------------------------------------------------
+
+def test_metrics_show_route_storage_and_template_timings(client, backend, mock_load_clubs, mock_load_competitions):
+    # Test: A request is timed by route, with the storage functions and templates it used.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
+    client.post('/show-summary', data={'email': "testclubmail@example.co"})
+
+    text = client.get('/metrics').data.decode()
+
+    assert 'gudlft_request_duration_seconds_count{route="/show-summary",method="POST",status="200"} 1' in text
+    assert 'gudlft_storage_duration_seconds_count{operation="load_clubs"} 1' in text
+    assert 'gudlft_template_render_duration_seconds_count{template="welcome.html"} 1' in text
+
+
+def test_metrics_count_booking_outcomes(client, backend, mock_load_clubs, mock_load_competitions):
+    # Test: Bookings are counted as booked, or by the error code of the reason they were refused.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
+    booking = {'competition': "Test Competition", 'club': "Test Club"}
+    client.post('/purchase-places', data=dict(booking, places="2"))
+    client.post('/purchase-places', data=dict(booking, places="13"))
+    client.post('/api/v1/purchases', json=dict(booking, places=20))
+
+    text = client.get('/metrics').data.decode()
+
+    assert 'gudlft_booking_outcomes_total{outcome="booked"} 1' in text
+    assert 'gudlft_booking_outcomes_total{outcome="max_places_per_booking"} 2' in text
+
+
+def test_metrics_show_stats_and_file_sizes(app, client, tmp_path):
+    # Test: The stats of the other modules and the size of the data files are shown as gauges.
+    backend = JSONFileBackend(str(tmp_path / "clubs.json"), str(tmp_path / "competitions.json"))
+    backend.save_clubs([{"name": "Test Club", "email": "testclubmail@example.co", "points": 10}])
+    metrics.register_stats(app, 'test_files', lambda: {name: {"size_bytes": size}
+                                                       for name, size in backend.file_sizes().items()}, label='file')
+
+    text = client.get('/metrics').data.decode()
+
+    assert f'gudlft_test_files_size_bytes{{file="clubs"}} {os.path.getsize(tmp_path / "clubs.json")}' in text
+    assert 'gudlft_test_files_size_bytes{file="competitions"} 0' in text
+    assert 'gudlft_records_cache_hits' in text
+
+
+def test_metrics_add_up_the_files_of_every_worker(make_app, tmp_path):
+    # Test: With a metrics directory, the counts written by the other workers are added to those of this one.
+    client = make_app(METRICS_DIRECTORY=str(tmp_path)).test_client()
+    metrics.count_booking('booked')
+    other_worker = {"pid": 999999999, "gauges": [["gudlft_holds_active", {}, 7]],
+                    "metrics": {"gudlft_booking_outcomes_total": [[["booked"], 2]]}}
+    (tmp_path / "999999999-other.json").write_text(json.dumps(other_worker))
+
+    text = client.get('/metrics').data.decode()
+
+    assert 'gudlft_booking_outcomes_total{outcome="booked"} 3' in text
+    assert f'gudlft_holds_active{{pid="{os.getpid()}"}} 0' in text
+    assert 'pid="999999999"' not in text  # Gone: its counts add up, its gauges are left out
+
+
+def test_metrics_of_dead_workers_are_aggregated(make_app, tmp_path):
+    # Test: The file of a process that is gone is moved to the aggregate file, whose counts still add up.
+    client = make_app(METRICS_DIRECTORY=str(tmp_path)).test_client()
+    dead_worker = {"pid": 999999999, "gauges": [], "metrics": {"gudlft_booking_outcomes_total": [[["booked"], 2]]}}
+    (tmp_path / "999999999-dead.json").write_text(json.dumps(dead_worker))
+    client.get('/metrics')
+    (tmp_path / "999999998-dead.json").write_text(json.dumps(dict(dead_worker, pid=999999998)))
+
+    text = client.get('/metrics').data.decode()
+
+    assert 'gudlft_booking_outcomes_total{outcome="booked"} 4' in text
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == ["aggregate.json"]
+
+
+def test_mark_process_dead(tmp_path):
+    # Test: The gunicorn hook moves the counts of a worker that exited to the aggregate file.
+    worker = {"pid": 4242, "gauges": [], "metrics": {"gudlft_booking_outcomes_total": [[["booked"], 2]]}}
+    (tmp_path / "4242-worker.json").write_text(json.dumps(worker))
+
+    metrics.mark_process_dead(4242, str(tmp_path))
+
+    assert not (tmp_path / "4242-worker.json").exists()
+    aggregate = json.loads((tmp_path / "aggregate.json").read_text())
+    assert aggregate["metrics"]["gudlft_booking_outcomes_total"] == [[["booked"], 2]]
+
+
+def test_exiting_process_retires_its_file(make_app, tmp_path):
+    # Test: At exit, a process adds its counts to the aggregate file and removes its own file.
+    app = make_app(METRICS_DIRECTORY=str(tmp_path))
+    metrics.count_booking('booked')
+    with app.app_context():
+        metrics.flush()
+    assert len(list(tmp_path.glob("*-*.json"))) == 1
+
+    metrics._retire()
+
+    assert list(tmp_path.glob("*-*.json")) == []
+    aggregate = json.loads((tmp_path / "aggregate.json").read_text())
+    assert aggregate["metrics"]["gudlft_booking_outcomes_total"] == [[["booked"], 1]]
+
+
+def test_files_are_written_off_the_request_path(make_app, tmp_path, mocker):
+    # Test: Requests do not write the file of the process, a thread does.
+    client = make_app(METRICS_DIRECTORY=str(tmp_path), METRICS_FLUSH_SECONDS=0.01).test_client()
+    flush = mocker.spy(metrics, "flush")
+
+    client.get('/')
+
+    assert flush.call_count == 0
+    deadline = time.monotonic() + 5
+    while not list(tmp_path.glob(f"{os.getpid()}-*.json")) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert list(tmp_path.glob(f"{os.getpid()}-*.json"))
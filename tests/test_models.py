@@ -0,0 +1,93 @@
+import json
+from datetime import datetime
+
+from models import Booking
+from models import Club
+from models import Competition
+from models import clubs_from_dicts
+from models import to_dicts
+from data_access import migrate_to_numbers
+from utils import validate_purchase
+from constants import INVALID_POINTS_MESSAGE
+
+
+# -------------------------------------------------------
+# Tests for Club and Competition Classes
+# -------------------------------------------------------
+
+def test_club_from_dict_parses_points():
+    # Test: Points are parsed once, and the club is still read like the dict it was loaded from.
+    club = Club.from_dict({"name": "Club A", "email": "cluba@example.com", "points": "13"})
+
+    assert club.points == 13
+    assert club["points"] == 13
+    assert dict(club) == {"name": "Club A", "email": "cluba@example.com", "points": 13}
+    assert not hasattr(club, "__dict__")
+
+
+def test_club_from_dict_invalid_points():
+    # Test: Invalid points are kept as None and reported by validate_purchase as before.
+    club = Club.from_dict({"name": "Club A", "email": "cluba@example.com", "points": "abc"})
+    competition = Competition.from_dict({"name": "Competition A", "date": "2030-10-22 13:30:00",
+                                         "numberOfPlaces": "25"})
+
+    assert club.points is None
+    assert validate_purchase(club, competition, 1, datetime(2024, 1, 1)) == (None, INVALID_POINTS_MESSAGE)
+
+
+def test_competition_from_dict_parses_places_date_and_bookings():
+    # Test: Places, bookings and the date are parsed, and written back as numbers.
+    competition = Competition.from_dict({"name": "Competition A", "date": "2030-10-22 13:30:00",
+                                         "numberOfPlaces": "25", "bookings": {"Club A": "2"}})
+
+    assert competition.number_of_places == 25
+    assert competition.parsed_date == datetime(2030, 10, 22, 13, 30)
+    assert competition.get("bookings") == {"Club A": 2}
+    assert competition.to_dict() == {"name": "Competition A", "date": "2030-10-22 13:30:00", "numberOfPlaces": 25,
+                                     "bookings": {"Club A": 2}}
+
+
+def test_to_dicts_keeps_plain_dicts():
+    # Test: Records are turned back into dicts, dicts are returned as they are.
+    record = {"name": "Club B", "email": "clubb@example.com", "points": 4}
+    clubs = clubs_from_dicts([{"name": "Club A", "email": "cluba@example.com", "points": 3}])
+
+    assert to_dicts(clubs + [record]) == [{"name": "Club A", "email": "cluba@example.com", "points": 3}, record]
+
+
+def test_booking_unpacks_as_a_tuple():
+    # Test: A booking line unpacks as (competition, places).
+    competition, places = Booking("Competition A", 3)
+
+    assert (competition, places) == ("Competition A", 3)
+
+
+# -------------------------------------------------------
+# Tests for migrate_to_numbers Function
+# -------------------------------------------------------
+
+def test_migrate_to_numbers(tmp_path):
+    # Test: The data files are rewritten with numbers instead of strings.
+    clubs_file = tmp_path / "clubs.json"
+    competitions_file = tmp_path / "competitions.json"
+    clubs_file.write_text(json.dumps({"clubs": [{"name": "Club A", "email": "cluba@example.com", "points": "13"}]}))
+    competitions_file.write_text(json.dumps({"competitions": [
+        {"name": "Competition A", "date": "2030-10-22 13:30:00", "numberOfPlaces": "25"}]}))
+
+    assert migrate_to_numbers(str(clubs_file), str(competitions_file))
+
+    assert json.loads(clubs_file.read_text())["clubs"][0]["points"] == 13
+    assert json.loads(competitions_file.read_text())["competitions"][0]["numberOfPlaces"] == 25
+
+
+def test_migrate_to_numbers_invalid_value(tmp_path):
+    # Test: Files holding a value that is not a number are left untouched.
+    clubs_file = tmp_path / "clubs.json"
+    competitions_file = tmp_path / "competitions.json"
+    clubs_file.write_text(json.dumps({"clubs": [{"name": "Club A", "email": "cluba@example.com", "points": "x"}]}))
+    competitions_file.write_text(json.dumps({"competitions": [
+        {"name": "Competition A", "date": "2030-10-22 13:30:00", "numberOfPlaces": "25"}]}))
+
+    assert not migrate_to_numbers(str(clubs_file), str(competitions_file))
+
+    assert json.loads(clubs_file.read_text())["clubs"][0]["points"] == "x"
@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import threading
+
+import pytest
+
+import data_access
+from data_access import JSONFileBackend
+from locks import data_lock
+from locks import booking_lock
+from persistence import GroupCommitter
+from persistence import WriteBehindPersister
+
+
+def book(committer, change, results):
+    # Does what a backend does for one booking, the booking itself being the change.
+    committer.begin()
+    with data_lock():
+        ticket = committer.submit(change)
+    results[change] = committer.wait(ticket)
+
+
+# -------------------------------------------------------
+# Tests for GroupCommitter Class
+# -------------------------------------------------------
+
+def test_concurrent_bookings_share_writes(run_in_threads):
+    # Test: Bookings submitted while a write is running are saved together by the next write.
+    batches = []
+
+    def write(changes):
+        batches.append(changes)
+        time.sleep(0.02)
+        return True
+
+    committer = GroupCommitter(write, data_lock, window=0.005)
+    results = {}
+    run_in_threads(book, [(committer, i, results) for i in range(10)])
+
+    assert results == {i: True for i in range(10)}
+    assert sorted(change for batch in batches for change in batch) == list(range(10))
+    assert len(batches) < 10
+    assert committer.stats()["bookings"] == 10
+    assert committer.stats()["batch_size_max"] == max(len(batch) for batch in batches)
+
+
+def test_failed_write_fails_the_whole_batch(run_in_threads):
+    # Test: When the write fails, every booking it held is reported as not saved.
+    committer = GroupCommitter(lambda changes: False, data_lock)
+    results = {}
+    run_in_threads(book, [(committer, i, results) for i in range(3)])
+
+    assert results == {i: False for i in range(3)}
+    assert committer.stats()["failures"] == committer.stats()["commits"]
+
+
+def test_single_booking_does_not_wait_for_the_window():
+    # Test: With nobody else booking, the write starts at once.
+    committer = GroupCommitter(lambda changes: True, data_lock, window=10)
+    results = {}
+
+    start = time.perf_counter()
+    book(committer, "only", results)
+
+    assert results == {"only": True}
+    assert time.perf_counter() - start < 1
+
+
+def test_json_backend_with_group_commit(tmp_path, run_in_threads):
+    # Test: Concurrent bookings of different clubs are all saved, with fewer writes than bookings.
+    data_access.invalidate()
+    backend = JSONFileBackend(str(tmp_path / "clubs.json"), str(tmp_path / "competitions.json"))
+    backend.save_clubs([{"name": f"Club {i}", "email": f"club{i}@example.com", "points": 10} for i in range(8)])
+    backend.save_competitions([{"name": "Test Competition", "date": "2030-10-22 13:30:00", "numberOfPlaces": 30,
+                                "bookings": {}}])
+    backend.enable_group_commit(0.005)
+    results = []
+
+    run_in_threads(lambda i: results.append(backend.apply_booking("Test Competition", f"Club {i}", 2)),
+                   [(i,) for i in range(8)])
+
+    data_access.invalidate()
+    assert results == [True] * 8
+    assert backend.get_competition_by_name("Test Competition")["numberOfPlaces"] == 14
+    assert all(club["points"] == 8 for club in backend.load_clubs())
+    assert backend.persister.stats()["commits"] <= 8
+
+
+def test_bookings_of_one_competition_share_writes(tmp_path, monkeypatch, run_in_threads):
+    # Test: The competition lock is released before waiting for the write, so the bookings made while it runs are
+    # saved together by the next one.
+    data_access.invalidate()
+    backend = JSONFileBackend(str(tmp_path / "clubs.json"), str(tmp_path / "competitions.json"))
+    backend.save_clubs([{"name": f"Club {i}", "email": f"club{i}@example.com", "points": 10} for i in range(6)])
+    backend.save_competitions([{"name": "Test Competition", "date": "2030-10-22 13:30:00", "numberOfPlaces": 30,
+                                "bookings": {}}])
+    backend.enable_group_commit(0.005)
+    write_bookings = backend._write_bookings
+    monkeypatch.setattr(backend, "_write_bookings", lambda changes: time.sleep(0.05) or write_bookings(changes))
+    results = []
+
+    def book_under_lock(i):
+        with booking_lock("Test Competition", f"Club {i}", str(tmp_path / "lock")):
+            results.append(backend.apply_booking("Test Competition", f"Club {i}", 2))
+
+    run_in_threads(book_under_lock, [(i,) for i in range(6)])
+
+    data_access.invalidate()
+    assert results == [True] * 6
+    assert backend.get_competition_by_name("Test Competition")["numberOfPlaces"] == 18
+    assert backend.persister.stats()["commits"] < 6
+    assert backend.persister.stats()["batch_size_max"] > 1
+
+
+# -------------------------------------------------------
+# Tests for WriteBehindPersister Class
+# -------------------------------------------------------
+
+def blocked_snapshot(released, written):
+    # A snapshot whose write waits for released to be set.
+    def snapshot(changes):
+        def write():
+            released.wait()
+            written.extend(changes)
+            return True
+        return write
+    return snapshot
+
+
+def test_write_behind_acknowledges_before_the_write(run_in_threads):
+    # Test: With "enqueue", bookings are answered while the disk write is still held up, and written later.
+    released = threading.Event()
+    written = []
+    persister = WriteBehindPersister(None, blocked_snapshot(released, written), data_lock)
+    results = {}
+
+    run_in_threads(book, [(persister, i, results) for i in range(3)])
+
+    assert results == {i: True for i in range(3)}
+    assert written == []
+    released.set()
+    assert persister.flush(timeout=5)
+    assert sorted(written) == [0, 1, 2]
+    persister.close()
+
+
+def test_write_behind_applies_backpressure():
+    # Test: Once max_pending bookings wait to be written, the next one waits for room.
+    released = threading.Event()
+    persister = WriteBehindPersister(None, blocked_snapshot(released, []), data_lock, max_pending=1)
+    book(persister, "first", {})
+    while persister.stats()["pending"]:  # Until the thread takes it, to be blocked in its write
+        time.sleep(0.001)
+    book(persister, "second", {})  # Fills the queue
+    results = {}
+
+    third = threading.Thread(target=book, args=(persister, "third", results))
+    third.start()
+    third.join(timeout=0.1)
+    assert third.is_alive()
+
+    released.set()
+    third.join(timeout=5)
+    assert results == {"third": True}
+    assert persister.stats()["backpressure_waits"] == 1
+    persister.close()
+
+
+def test_write_behind_retries_failed_writes():
+    # Test: With "enqueue", a failed write is retried with the bookings it held.
+    attempts = []
+
+    def snapshot(changes):
+        return lambda: attempts.append(list(changes)) or len(attempts) > 1
+
+    persister = WriteBehindPersister(None, snapshot, data_lock, retry_delay=0.01)
+    book(persister, "booking", {})
+
+    assert persister.flush(timeout=5)
+    assert attempts == [["booking"], ["booking"]]
+    assert persister.stats()["failures"] == 1
+    persister.close()
+
+
+def test_json_backend_with_write_behind(tmp_path, run_in_threads):
+    # Test: With "enqueue", every booking acknowledged while the files are being replaced reaches the disk: the
+    # records in memory, newer than the files being written, are not reloaded from them.
+    data_access.invalidate()
+    backend = JSONFileBackend(str(tmp_path / "clubs.json"), str(tmp_path / "competitions.json"))
+    backend.save_clubs([{"name": f"Club {i}", "email": f"club{i}@example.com", "points": 100} for i in range(20)])
+    backend.save_competitions([{"name": "Test Competition", "date": "2030-10-22 13:30:00", "numberOfPlaces": 1000,
+                                "bookings": {}}])
+    backend.enable_write_behind('enqueue')
+    results = []
+
+    def book_many(i):
+        for _ in range(10):
+            results.append(backend.apply_booking("Test Competition", f"Club {i}", 1))
+
+    run_in_threads(book_many, [(i,) for i in range(20)])
+    backend.close()
+
+    data_access.invalidate()
+    assert results == [True] * 200
+    assert backend.get_competition_by_name("Test Competition")["numberOfPlaces"] == 800
+    assert backend.get_competition_by_name("Test Competition")["bookings"] == {f"Club {i}": 10 for i in range(20)}
+    assert all(club["points"] == 90 for club in backend.load_clubs())
+
+
+def test_write_behind_fsync_waits_for_the_write():
+    # Test: With "fsync", the answer is the result of the write holding the booking.
+    persister = WriteBehindPersister(lambda changes: False, None, data_lock, durability="fsync")
+    results = {}
+
+    book(persister, "booking", results)
+
+    assert results == {"booking": False}
+    persister.close()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs os.fork")
+def test_write_behind_runs_in_forked_process():
+    # Test: A process forked after the persister was created (gunicorn --preload) starts its own thread to write.
+    written = []
+    persister = WriteBehindPersister(None, lambda changes: lambda: written.extend(changes) or True, data_lock)
+
+    pid = os.fork()
+    if pid == 0:
+        book(persister, "child", {})
+        os._exit(0 if persister.flush(timeout=5) and written == ["child"] else 1)
+    _, status = os.waitpid(pid, 0)
+
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert written == []
+    persister.close()
+
+
+def test_json_backend_write_behind_saves_on_close(tmp_path):
+    # Test: A booking answered before being written is saved when the backend is closed.
+    data_access.invalidate()
+    backend = JSONFileBackend(str(tmp_path / "clubs.json"), str(tmp_path / "competitions.json"))
+    backend.save_clubs([{"name": "Test Club", "email": "testclubmail@example.co", "points": 10}])
+    backend.save_competitions([{"name": "Test Competition", "date": "2030-10-22 13:30:00", "numberOfPlaces": 30,
+                                "bookings": {}}])
+    backend.enable_write_behind("enqueue")
+
+    assert backend.apply_booking("Test Competition", "Test Club", 3)
+    assert backend.get_club_by_name("Test Club")["points"] == 7
+    backend.close()
+
+    with open(tmp_path / "clubs.json") as c:
+        assert json.load(c)["clubs"][0]["points"] == 7
+    with open(tmp_path / "competitions.json") as c:
+        assert json.load(c)["competitions"][0]["bookings"] == {"Test Club": 3}
+
+
+def write_behind_backend(tmp_path):
+    data_access.invalidate()
+    backend = JSONFileBackend(str(tmp_path / "clubs.json"), str(tmp_path / "competitions.json"))
+    backend.save_clubs([{"name": "Test Club", "email": "testclubmail@example.co", "points": 10}])
+    backend.save_competitions([{"name": "Test Competition", "date": "2030-10-22 13:30:00", "numberOfPlaces": 30,
+                                "bookings": {}}])
+    return backend
+
+
+def test_write_behind_is_refused_to_a_second_process(tmp_path):
+    # Test: A backend cannot write behind files another one already writes behind; it writes its bookings itself.
+    backend = write_behind_backend(tmp_path)
+    other = JSONFileBackend(str(tmp_path / "clubs.json"), str(tmp_path / "competitions.json"))
+
+    assert backend.enable_write_behind("enqueue")
+    assert not other.enable_write_behind("enqueue")
+    assert other.persister is None
+    backend.close()
+    assert other.enable_write_behind("enqueue")
+    other.close()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs os.fork")
+def test_forked_processes_write_their_bookings_synchronously(tmp_path):
+    # Test: After a fork, neither the parent nor the child keep bookings in memory: both write them when they are made.
+    backend = write_behind_backend(tmp_path)
+    backend.enable_write_behind("enqueue")
+
+    pid = os.fork()
+    if pid == 0:
+        saved = backend.persister is None and backend.apply_booking("Test Competition", "Test Club", 2)
+        os._exit(0 if saved else 1)
+    _, status = os.waitpid(pid, 0)
+
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert backend.persister is None
+    data_access.invalidate()
+    assert backend.apply_booking("Test Competition", "Test Club", 1)
+    with open(tmp_path / "competitions.json") as c:
+        assert json.load(c)["competitions"][0]["bookings"] == {"Test Club": 3}
+    backend.close()
@@ -0,0 +1,105 @@
+import os
+import time
+import pstats
+
+import pytest
+
+import profiling
+from profiling import profile_token
+
+
+@pytest.fixture
+def profiles(tmp_path):
+    return tmp_path
+
+
+@pytest.fixture
+def app(make_app, profiles):
+    # Profiling switched on, into a temporary directory, for requests sending a token only.
+    return make_app(PROFILING_DIRECTORY=str(profiles), PROFILING_SAMPLE_RATE=0.0, PROFILING_MAX_FILES=3)
+
+
+def purchase(client, headers=None):
+    return client.post('/purchase-places', data={'competition': "Test Competition", 'club': "Test Club",
+                                                 'places': "2"}, headers=headers or {})
+
+
+def prof_files(directory) -> list:
+    return sorted(name for name in os.listdir(directory) if name.endswith('.prof'))
+
+
+# -------------------------------------------------------
+# Tests for the profiled requests
+# -------------------------------------------------------
+
+def test_request_with_token_is_profiled(app, client, backend, profiles, mock_load_clubs, mock_load_competitions):
+    # Test: A request sending a valid token gets a Server-Timing header by phase, and its stats are written.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
+
+    response = purchase(client, {'X-Profile-Token': profile_token(app.secret_key)})
+
+    phases = [entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')]
+    assert phases == ["load", "validate", "save", "render", "total"]
+    files = prof_files(profiles)
+    assert len(files) == 1 and files[0].endswith("-purchase_places.prof")
+    assert pstats.Stats(str(profiles / files[0])).total_calls > 0
+
+
+def test_request_with_invalid_token_is_not_profiled(client, profiles):
+    # Test: A token that was not signed with the secret key does nothing.
+    response = client.get('/', headers={'X-Profile-Token': profile_token('another key')})
+
+    assert 'Server-Timing' not in response.headers
+    assert prof_files(profiles) == []
+
+
+def test_requests_are_sampled(make_app, profiles):
+    # Test: With a sample rate of 1, every request is profiled, without a token.
+    client = make_app(PROFILING_DIRECTORY=str(profiles), PROFILING_SAMPLE_RATE=1.0).test_client()
+
+    response = client.get('/')
+
+    assert 'Server-Timing' in response.headers
+
+
+def test_oldest_profiles_are_removed(app, client, profiles):
+    # Test: Only the max_files most recent stats files are kept.
+    headers = {'X-Profile-Token': profile_token(app.secret_key)}
+    for _ in range(5):
+        client.get('/', headers=headers)
+        time.sleep(0.002)
+
+    assert len(prof_files(profiles)) == 3
+
+
+def test_profiling_disabled_without_directory(make_app):
+    # Test: Without a directory, a valid token does nothing.
+    disabled = make_app(PROFILING_DIRECTORY=None)
+
+    response = disabled.test_client().get('/', headers={'X-Profile-Token': profile_token(disabled.secret_key)})
+
+    assert 'Server-Timing' not in response.headers
+
+
+# -------------------------------------------------------
+# Tests for phase_seconds Function
+# -------------------------------------------------------
+
+def test_phase_seconds_counts_nested_calls_once():
+    # Test: A function of a phase called by another one of the same phase is not counted twice.
+    def outer():
+        inner()
+
+    def inner():
+        time.sleep(0.01)
+
+    profiling.PHASES["test"] = (outer, inner)
+    try:
+        profile = profiling.cProfile.Profile()
+        profile.runcall(outer)
+        seconds = profiling.phase_seconds(pstats.Stats(profile))
+    finally:
+        del profiling.PHASES["test"]
+
+    assert 0.01 <= seconds["test"] < 0.02
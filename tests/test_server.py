@@ -1,3 +1,14 @@
+import os
+import gc
+import json
+import threading
+
+import pytest
+
+import server
+from server import create_app
+import data_access
+from data_access import JSONFileBackend
 from constants import EMAIL_NOT_FOUND_ERROR
 from constants import EMAIL_EMPTY_ERROR
 from constants import BOOKING_COMPLETE_MESSAGE
@@ -14,13 +25,15 @@ from constants import SAVE_CHANGES_MESSAGE_ERROR
 from constants import COMPETITION_FULL_MESSAGE
 from constants import ERROR_MESSAGE_RETRY
 from constants import INVALID_POINTS_MESSAGE
+from constants import EMPTY_BATCH_MESSAGE
+from datasets import generate_dataset
+from datasets import write_dataset
 
 
 # -------------------------------------------------------
 # Tests for flow
 # -------------------------------------------------------
-def test_integration_flow(client, mocker, mock_load_clubs, mock_load_competitions, mock_save_clubs,
-                          mock_save_competitions):
+def test_integration_flow(client, backend, mock_load_clubs, mock_load_competitions):
     # Test: This integration test simulates a complete user journey through the web application. It includes visiting
     # the home page, displaying the summary page for a club, booking places in a competition, completing a purchase,
     # and finally logging out. This test ensures that each step in the flow works as expected and the system responds
@@ -31,11 +44,9 @@ def test_integration_flow(client, mocker, mock_load_clubs, mock_load_competition
     existing_competition = "Test Competition"
     expected_confirmation_message = "You have reserved 5 place(s) for the competition Test Competition."
 
-    # Mock the loadsClubs y load_competitions functions
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=mock_load_competitions)
-    mocker.patch('server.save_clubs', mock_save_clubs)
-    mocker.patch('server.save_competitions', mock_save_competitions)
+    # Use the mock clubs and competitions as the stored data
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
 
     # index: GET request to the root route
     response = client.get('/')
@@ -70,10 +81,10 @@ def test_integration_flow(client, mocker, mock_load_clubs, mock_load_competition
 # Tests for show_summary Function
 # -------------------------------------------------------
 
-def test_show_summary_with_valid_email(client, mocker, mock_load_clubs, mock_load_competitions):
+def test_show_summary_with_valid_email(client, backend, mock_load_clubs, mock_load_competitions):
     # Test: Show summary page with a valid email.
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=mock_load_competitions)
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
 
     valid_email = "testclubmail@example.co"
 
@@ -82,10 +93,73 @@ def test_show_summary_with_valid_email(client, mocker, mock_load_clubs, mock_loa
     assert valid_email.encode() in response.data
 
 
-def test_show_summary_with_invalid_email(client, mocker, mock_load_clubs, mock_load_competitions):
+def test_show_summary_email_is_case_insensitive(client, backend, mock_load_clubs, mock_load_competitions):
+    # Test: Show summary page when the email is typed with a different case.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
+
+    response = client.post('/show-summary', data={'email': 'TestClubMail@Example.co'}, follow_redirects=True)
+    assert response.status_code == 200
+    assert b"testclubmail@example.co" in response.data
+
+
+def test_show_summary_lists_upcoming_competitions(client, backend, mock_load_clubs):
+    # Test: Past competitions are only listed when asked for.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions([
+        {"name": "Past Competition", "date": "2020-10-22 13:30:00", "numberOfPlaces": "30", "bookings": {}},
+        {"name": "Future Competition", "date": "2050-10-22 13:30:00", "numberOfPlaces": "30", "bookings": {}}
+    ])
+
+    response = client.post('/show-summary', data={'email': "testclubmail@example.co"})
+    assert b"Future Competition" in response.data
+    assert b"Past Competition" not in response.data
+
+    response = client.post('/show-summary', data={'email': "testclubmail@example.co", 'past': "1"})
+    assert b"Past Competition" in response.data
+
+
+def test_show_summary_pages_competitions(client, backend, mock_load_clubs):
+    # Test: Competitions are listed by pages, with a button leading to the next one.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions([{"name": f"Competition {i:02d}", "date": f"{2050 + i}-10-22 13:30:00",
+                                "numberOfPlaces": "30", "bookings": {}} for i in range(25)])
+
+    response = client.post('/show-summary', data={'email': "testclubmail@example.co"})
+    assert b"Competition 19" in response.data
+    assert b"Competition 20" not in response.data
+    assert b'name="cursor" value="20"' in response.data
+
+    response = client.post('/show-summary', data={'email': "testclubmail@example.co", 'cursor': "20"})
+    assert b"Competition 19" not in response.data
+    assert b"Competition 24" in response.data
+    assert b'name="cursor"' not in response.data
+
+
+def test_show_summary_filters_competitions(client, backend, mock_load_clubs):
+    # Test: The filters of the form narrow the competitions listed.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions([
+        {"name": "Spring Cup", "date": "2050-04-22 13:30:00", "numberOfPlaces": "30", "bookings": {}},
+        {"name": "Summer Cup", "date": "2050-07-22 13:30:00", "numberOfPlaces": "0", "bookings": {}},
+        {"name": "Autumn Cup", "date": "2050-10-22 13:30:00", "numberOfPlaces": "30", "bookings": {}}
+    ])
+
+    response = client.post('/show-summary', data={'email': "testclubmail@example.co", 'from': "2050-05-01",
+                                                  'available': "1"})
+    assert b"Autumn Cup" in response.data
+    assert b"Spring Cup" not in response.data
+    assert b"Summer Cup" not in response.data
+
+    response = client.post('/show-summary', data={'email': "testclubmail@example.co", 'name': "sp"})
+    assert b"Spring Cup" in response.data
+    assert b"Autumn Cup" not in response.data
+
+
+def test_show_summary_with_invalid_email(client, backend, mock_load_clubs, mock_load_competitions):
     # Test: Attempt to show summary page with an invalid email.
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=mock_load_competitions)
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
 
     invalid_email = "noexistingemail@example.com"
 
@@ -94,10 +168,10 @@ def test_show_summary_with_invalid_email(client, mocker, mock_load_clubs, mock_l
     assert EMAIL_NOT_FOUND_ERROR.encode() in response.data
 
 
-def test_show_summary_with_empty_email(client, mocker, mock_load_clubs, mock_load_competitions):
+def test_show_summary_with_empty_email(client, backend, mock_load_clubs, mock_load_competitions):
     # Test: Attempt to show summary page with an empty email field.
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=mock_load_competitions)
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
 
     response = client.post('/show-summary', data={'email': ''}, follow_redirects=True)
 
@@ -105,10 +179,10 @@ def test_show_summary_with_empty_email(client, mocker, mock_load_clubs, mock_loa
     assert EMAIL_EMPTY_ERROR.encode() in response.data
 
 
-def test_show_summary_with_loading_error(client, mocker):
+def test_show_summary_with_loading_error(client, backend):
     # Test: Simulate an error in loading clubs or competitions data. This should show a loading error message.
-    mocker.patch('server.load_clubs', return_value=[])  # Simulates that the loading of clubs data fails
-    mocker.patch('server.load_competitions', return_value=[])  # Simulates that the loading of competitions data fails
+    backend.save_clubs([])  # Simulates that the loading of clubs data fails
+    backend.save_competitions([])  # Simulates that the loading of competitions data fails
 
     valid_email = "testclubmail@example.co"
 
@@ -122,12 +196,10 @@ def test_show_summary_with_loading_error(client, mocker):
 # Tests for purchase_places Function
 # -------------------------------------------------------
 
-def test_purchase_places_valid_and_confirmation_message(client, mocker, mock_load_clubs, mock_load_competitions):
+def test_purchase_places_valid_and_confirmation_message(client, backend, mock_load_clubs, mock_load_competitions):
     # Test: Validate successful purchase of places for a competition.
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=mock_load_competitions)
-    mocker.patch('server.save_clubs')
-    mocker.patch('server.save_competitions')
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
 
     response = client.post('/purchase-places', data={
         'competition': "Test Competition",
@@ -143,7 +215,7 @@ def test_purchase_places_valid_and_confirmation_message(client, mocker, mock_loa
     assert expected_confirmation_message.encode() in response.data
 
 
-def test_purchase_places_with_insufficient_points(client, mocker, mock_load_competitions):
+def test_purchase_places_with_insufficient_points(client, backend, mock_load_competitions):
     # Test: Attempt to purchase places in a competition with a club that has insufficient points.
     insufficient_points_club = [
         {
@@ -153,10 +225,8 @@ def test_purchase_places_with_insufficient_points(client, mocker, mock_load_comp
         }
     ]
 
-    mocker.patch('server.load_clubs', return_value=insufficient_points_club)
-    mocker.patch('server.load_competitions', return_value=mock_load_competitions)
-    mocker.patch('server.save_clubs')
-    mocker.patch('server.save_competitions')
+    backend.save_clubs(insufficient_points_club)
+    backend.save_competitions(mock_load_competitions)
 
     response = client.post('/purchase-places', data={
         'competition': "Test Competition",
@@ -168,7 +238,7 @@ def test_purchase_places_with_insufficient_points(client, mocker, mock_load_comp
     assert INSUFFICIENT_POINTS_MESSAGE.encode() in response.data
 
 
-def test_purchase_places_when_insufficient_places(client, mocker, mock_load_clubs):
+def test_purchase_places_when_insufficient_places(client, backend, mock_load_clubs):
     # Test: Attempt to purchase more places in a competition than are available.
     insufficient_places_competitions = [
         {
@@ -178,10 +248,8 @@ def test_purchase_places_when_insufficient_places(client, mocker, mock_load_club
         }
     ]
 
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=insufficient_places_competitions)
-    mocker.patch('server.save_clubs')
-    mocker.patch('server.save_competitions')
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(insufficient_places_competitions)
 
     response = client.post('/purchase-places', data={
         'competition': "Test Competition",
@@ -193,12 +261,10 @@ def test_purchase_places_when_insufficient_places(client, mocker, mock_load_club
     assert INSUFFICIENT_PLACES_MESSAGE.encode() in response.data
 
 
-def test_purchase_places_invalid_number_of_places(client, mocker, mock_load_clubs, mock_load_competitions):
+def test_purchase_places_invalid_number_of_places(client, backend, mock_load_clubs, mock_load_competitions):
     # Test: Attempt to purchase places in a competition with an invalid number format for the requested places.
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=mock_load_competitions)
-    mocker.patch('server.save_clubs')
-    mocker.patch('server.save_competitions')
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
 
     invalid_places = "invalid"  # Invalid value for the number of places
 
@@ -212,12 +278,10 @@ def test_purchase_places_invalid_number_of_places(client, mocker, mock_load_club
     assert INVALID_PLACES_MESSAGE.encode() in response.data
 
 
-def test_purchase_places_zero_places(client, mocker, mock_load_clubs, mock_load_competitions):
+def test_purchase_places_zero_places(client, backend, mock_load_clubs, mock_load_competitions):
     # Test: Attempt to purchase zero places in a competition.
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=mock_load_competitions)
-    mocker.patch('server.save_clubs')
-    mocker.patch('server.save_competitions')
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
 
     response = client.post('/purchase-places', data={
         'competition': "Test Competition",
@@ -229,12 +293,10 @@ def test_purchase_places_zero_places(client, mocker, mock_load_clubs, mock_load_
     assert NON_POSITIVE_PLACES_MESSAGE.encode() in response.data
 
 
-def test_purchase_places_negative_places(client, mocker, mock_load_clubs, mock_load_competitions):
+def test_purchase_places_negative_places(client, backend, mock_load_clubs, mock_load_competitions):
     # Test: Attempt to purchase a negative number of places in a competition.
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=mock_load_competitions)
-    mocker.patch('server.save_clubs')
-    mocker.patch('server.save_competitions')
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
 
     response = client.post('/purchase-places', data={
         'competition': "Test Competition",
@@ -246,12 +308,10 @@ def test_purchase_places_negative_places(client, mocker, mock_load_clubs, mock_l
     assert NON_POSITIVE_PLACES_MESSAGE.encode() in response.data
 
 
-def test_purchase_places_no_club_found(client, mocker, mock_load_clubs, mock_load_competitions):
+def test_purchase_places_no_club_found(client, backend, mock_load_clubs, mock_load_competitions):
     # Test: Attempt to purchase places with a club that does not exist.
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=mock_load_competitions)
-    mocker.patch('server.save_clubs')
-    mocker.patch('server.save_competitions')
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
 
     response = client.post('/purchase-places', data={
         'competition': "Test Competition",
@@ -263,12 +323,10 @@ def test_purchase_places_no_club_found(client, mocker, mock_load_clubs, mock_loa
     assert INVALID_CLUB_OR_COMPETITION.encode() in response.data
 
 
-def test_purchase_places_no_competition_found(client, mocker, mock_load_clubs, mock_load_competitions):
+def test_purchase_places_no_competition_found(client, backend, mock_load_clubs, mock_load_competitions):
     # Test: Attempt to purchase places for a competition that does not exist.
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=mock_load_competitions)
-    mocker.patch('server.save_clubs')
-    mocker.patch('server.save_competitions')
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
 
     response = client.post('/purchase-places', data={
         'competition': "Nonexistent Competition",
@@ -280,12 +338,10 @@ def test_purchase_places_no_competition_found(client, mocker, mock_load_clubs, m
     assert INVALID_CLUB_OR_COMPETITION.encode() in response.data
 
 
-def test_purchase_places_exceeding_place_limit(client, mocker, mock_load_clubs, mock_load_competitions):
+def test_purchase_places_exceeding_place_limit(client, backend, mock_load_clubs, mock_load_competitions):
     # Test: Attempt to purchase more than 12 places in a competition.
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=mock_load_competitions)
-    mocker.patch('server.save_clubs')
-    mocker.patch('server.save_competitions')
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
 
     response = client.post('/purchase-places', data={
         'competition': "Test Competition",
@@ -297,7 +353,7 @@ def test_purchase_places_exceeding_place_limit(client, mocker, mock_load_clubs,
     assert MAX_PLACES_PER_BOOKING_MESSAGE.encode() in response.data
 
 
-def test_purchase_places_exceeding_remaining_limit(client, mocker, mock_load_clubs):
+def test_purchase_places_exceeding_remaining_limit(client, backend, mock_load_clubs):
     # Test: Attempt to purchase places exceeding the remaining limit for a club in a competition.
     mock_competitions_with_existing_bookings = [
         {
@@ -307,10 +363,8 @@ def test_purchase_places_exceeding_remaining_limit(client, mocker, mock_load_clu
             "bookings": {"Test Club": 10}  # 10 places already booked by 'Test Club'
         }
     ]
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=mock_competitions_with_existing_bookings)
-    mocker.patch('server.save_clubs')
-    mocker.patch('server.save_competitions')
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_competitions_with_existing_bookings)
 
     # Attempt to book more places than allowed
     response = client.post('/purchase-places', data={
@@ -326,7 +380,7 @@ def test_purchase_places_exceeding_remaining_limit(client, mocker, mock_load_clu
     assert expected_message.encode() in response.data
 
 
-def test_purchase_places_with_additional_booking(client, mocker, mock_load_clubs):
+def test_purchase_places_with_additional_booking(client, backend, mock_load_clubs):
     # Test: Verify the server's handling of additional booking requests for a club that has already booked some
     # places in a competition.
     mock_competitions_with_existing_bookings = [
@@ -338,10 +392,8 @@ def test_purchase_places_with_additional_booking(client, mocker, mock_load_clubs
         }
     ]
 
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=mock_competitions_with_existing_bookings)
-    mocker.patch('server.save_clubs')
-    mocker.patch('server.save_competitions')
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_competitions_with_existing_bookings)
 
     # Attempt to book additional places within the allowed limit
     response = client.post('/purchase-places', data={
@@ -359,7 +411,7 @@ def test_purchase_places_with_additional_booking(client, mocker, mock_load_clubs
     assert expected_confirmation_message.encode() in response.data
 
 
-def test_purchase_places_with_future_competition(client, mocker, mock_load_clubs):
+def test_purchase_places_with_future_competition(client, backend, mock_load_clubs):
     # Test: Attempt to purchase places for a competition set in the future.
     future_competition = [
         {
@@ -369,10 +421,8 @@ def test_purchase_places_with_future_competition(client, mocker, mock_load_clubs
             "bookings": {}
         }
     ]
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=future_competition)
-    mocker.patch('server.save_clubs')
-    mocker.patch('server.save_competitions')
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(future_competition)
 
     response = client.post('/purchase-places', data={
         'competition': "Test Competition",
@@ -384,7 +434,7 @@ def test_purchase_places_with_future_competition(client, mocker, mock_load_clubs
     assert BOOKING_COMPLETE_MESSAGE.encode() in response.data
 
 
-def test_purchase_places_with_past_competition(client, mocker, mock_load_clubs):
+def test_purchase_places_with_past_competition(client, backend, mock_load_clubs):
     # Test: Attempt to purchase places for a competition that has already occurred in the past.
     past_competition = [
         {
@@ -393,10 +443,8 @@ def test_purchase_places_with_past_competition(client, mocker, mock_load_clubs):
             "numberOfPlaces": "20"
         }
     ]
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=past_competition)
-    mocker.patch('server.save_clubs')
-    mocker.patch('server.save_competitions')
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(past_competition)
 
     response = client.post('/purchase-places', data={
         'competition': "Test Competition",
@@ -408,7 +456,7 @@ def test_purchase_places_with_past_competition(client, mocker, mock_load_clubs):
     assert PAST_COMPETITION_BOOKING_ERROR_MESSAGE.encode() in response.data
 
 
-def test_purchase_places_with_invalid_competition_date_format(client, mocker, mock_load_clubs):
+def test_purchase_places_with_invalid_competition_date_format(client, backend, mock_load_clubs):
     # Test: Attempt to purchase places for a competition with an invalid date format.
     invalid_format_competition = [
         {
@@ -417,10 +465,8 @@ def test_purchase_places_with_invalid_competition_date_format(client, mocker, mo
             "numberOfPlaces": "20"
         }
     ]
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=invalid_format_competition)
-    mocker.patch('server.save_clubs')
-    mocker.patch('server.save_competitions')
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(invalid_format_competition)
 
     response = client.post('/purchase-places', data={
         'competition': "Test Competition",
@@ -432,7 +478,7 @@ def test_purchase_places_with_invalid_competition_date_format(client, mocker, mo
     assert INVALID_DATE_FORMAT_MESSAGE.encode() in response.data
 
 
-def test_correct_point_deduction(client, mocker, mock_save_clubs, mock_save_competitions):
+def test_correct_point_deduction(client, backend):
     # Test: Verify correct point deduction after a club purchases places in a competition.
 
     initial_points = 15  # Initial points of the club
@@ -455,10 +501,8 @@ def test_correct_point_deduction(client, mocker, mock_save_clubs, mock_save_comp
             "bookings": {}
         }
     ]
-    mocker.patch('server.load_clubs', return_value=mock_club)
-    mocker.patch('server.load_competitions', return_value=mock_competition)
-    mocker.patch('server.save_clubs', mock_save_clubs)
-    mocker.patch('server.save_competitions', mock_save_competitions)
+    backend.save_clubs(mock_club)
+    backend.save_competitions(mock_competition)
 
     # Perform the POST request
     response = client.post('/purchase-places', data={
@@ -471,11 +515,11 @@ def test_correct_point_deduction(client, mocker, mock_save_clubs, mock_save_comp
     assert response.status_code == 200
     assert BOOKING_COMPLETE_MESSAGE.encode() in response.data
 
-    # Check that save_clubs was called with the updated points
-    assert mock_save_clubs.last_call_arg[0]['points'] == str(expected_points_after_purchase)
+    # Check that the stored club has the updated points
+    assert backend.get_club_by_name("Test Club")['points'] == expected_points_after_purchase
 
 
-def test_no_point_deduction_for_invalid_purchase(client, mocker, mock_save_clubs, mock_save_competitions):
+def test_no_point_deduction_for_invalid_purchase(client, backend):
     # Test: Ensure that no points are deducted from a club's total for an invalid purchase attempt
     # due to insufficient points
 
@@ -496,10 +540,8 @@ def test_no_point_deduction_for_invalid_purchase(client, mocker, mock_save_clubs
             "numberOfPlaces": "20"
         }
     ]
-    mocker.patch('server.load_clubs', return_value=mock_club)
-    mocker.patch('server.load_competitions', return_value=mock_competition)
-    mocker.patch('server.save_clubs', mock_save_clubs)
-    mocker.patch('server.save_competitions', mock_save_competitions)
+    backend.save_clubs(mock_club)
+    backend.save_competitions(mock_competition)
 
     # Perform the POST request
     response = client.post('/purchase-places', data={
@@ -512,11 +554,11 @@ def test_no_point_deduction_for_invalid_purchase(client, mocker, mock_save_clubs
     assert response.status_code == 200
     assert INSUFFICIENT_POINTS_MESSAGE.encode() in response.data
 
-    # Verify that the save_club function was not called to ensure that the club's points were not modified
-    assert mock_save_clubs.last_call_arg is None
+    # Verify that the club's points were not modified
+    assert backend.get_club_by_name("Test Club")['points'] == initial_points
 
 
-def test_point_deduction_for_max_place_purchase(client, mocker, mock_save_clubs, mock_save_competitions):
+def test_point_deduction_for_max_place_purchase(client, backend):
     initial_points = 20
     max_places_to_purchase = 12
     expected_points_after_purchase = initial_points - max_places_to_purchase
@@ -538,10 +580,8 @@ def test_point_deduction_for_max_place_purchase(client, mocker, mock_save_clubs,
         }
     ]
 
-    mocker.patch('server.load_clubs', return_value=mock_club)
-    mocker.patch('server.load_competitions', return_value=mock_competition)
-    mocker.patch('server.save_clubs', mock_save_clubs)
-    mocker.patch('server.save_competitions', mock_save_competitions)
+    backend.save_clubs(mock_club)
+    backend.save_competitions(mock_competition)
 
     # Perform the POST request to purchase the maximum number of places
     response = client.post('/purchase-places', data={
@@ -554,11 +594,11 @@ def test_point_deduction_for_max_place_purchase(client, mocker, mock_save_clubs,
     assert response.status_code == 200
     assert BOOKING_COMPLETE_MESSAGE.encode() in response.data
 
-    # Verify that save_clubs was called with the updated points
-    assert mock_save_clubs.last_call_arg[0]['points'] == str(expected_points_after_purchase)
+    # Verify that the stored club has the updated points
+    assert backend.get_club_by_name("Test Club")['points'] == expected_points_after_purchase
 
 
-def test_save_error_handling_places(client, mocker, mock_save_clubs_fail, mock_save_competitions_fail):
+def test_save_error_handling_places(client, backend, mocker):
     #  Test: Verify the server's error handling when there's a failure in saving changes after a purchase.
 
     mock_competition = [
@@ -578,10 +618,9 @@ def test_save_error_handling_places(client, mocker, mock_save_clubs_fail, mock_s
         }
     ]
 
-    mocker.patch('server.load_clubs', return_value=mock_club)
-    mocker.patch('server.load_competitions', return_value=mock_competition)
-    mocker.patch('server.save_clubs', mock_save_clubs_fail)
-    mocker.patch('server.save_competitions', mock_save_competitions_fail)
+    backend.save_clubs(mock_club)
+    backend.save_competitions(mock_competition)
+    mocker.patch.object(backend, 'apply_booking', return_value=False)  # Simulate a failure when saving the booking
 
     response = client.post('/purchase-places', data={
         'competition': "Test Competition",
@@ -593,7 +632,7 @@ def test_save_error_handling_places(client, mocker, mock_save_clubs_fail, mock_s
     assert SAVE_CHANGES_MESSAGE_ERROR.encode() in response.data
 
 
-def test_purchase_places_competition_full(client, mocker, mock_load_clubs):
+def test_purchase_places_competition_full(client, backend, mock_load_clubs):
     # Test: Attempt to purchase places in a competition that is already full.
 
     # Setting up a full competition
@@ -605,10 +644,8 @@ def test_purchase_places_competition_full(client, mocker, mock_load_clubs):
         }
     ]
 
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=full_competition)
-    mocker.patch('server.save_clubs')
-    mocker.patch('server.save_competitions')
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(full_competition)
 
     # Perform POST request to try purchasing places in the full competition
     response = client.post('/purchase-places', data={
@@ -622,10 +659,10 @@ def test_purchase_places_competition_full(client, mocker, mock_load_clubs):
     assert COMPETITION_FULL_MESSAGE.encode() in response.data
 
 
-def test_load_error_handling(client, mocker):
+def test_load_error_handling(client, backend):
     # Simulate loading error by returning empty lists
-    mocker.patch('server.load_clubs', return_value=[])
-    mocker.patch('server.load_competitions', return_value=[])
+    backend.save_clubs([])
+    backend.save_competitions([])
 
     # Perform a POST request that would normally trigger the loading
     response = client.post('/purchase-places', data={
@@ -639,7 +676,7 @@ def test_load_error_handling(client, mocker):
     assert LOADING_MESSAGE_ERROR.encode() in response.data
 
 
-def test_invalid_points_handling(client, mocker, mock_load_competitions, mock_save_clubs, mock_save_competitions):
+def test_invalid_points_handling(client, backend, mock_load_competitions):
     # Test: Verify the server's handling of a purchase attempt when the club's points value is invalid.
     mock_club = [
         {
@@ -649,10 +686,8 @@ def test_invalid_points_handling(client, mocker, mock_load_competitions, mock_sa
         }
     ]
 
-    mocker.patch('server.load_clubs', return_value=mock_club)
-    mocker.patch('server.load_competitions', return_value=mock_load_competitions)
-    mocker.patch('server.save_clubs')
-    mocker.patch('server.save_competitions')
+    backend.save_clubs(mock_club)
+    backend.save_competitions(mock_load_competitions)
 
     response = client.post('/purchase-places', data={
         'competition': "Test Competition",
@@ -664,7 +699,7 @@ def test_invalid_points_handling(client, mocker, mock_load_competitions, mock_sa
     assert INVALID_POINTS_MESSAGE.encode() in response.data
 
 
-def test_invalid_places_handling(client, mocker, mock_load_clubs, mock_save_clubs, mock_save_competitions):
+def test_invalid_places_handling(client, backend, mock_load_clubs):
     # Test: Verify the server's handling of a purchase attempt when the competition's number of available places is
     # invalid.
     mock_competition = [
@@ -675,10 +710,8 @@ def test_invalid_places_handling(client, mocker, mock_load_clubs, mock_save_club
         }
     ]
 
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=mock_competition)
-    mocker.patch('server.save_clubs')
-    mocker.patch('server.save_competitions')
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_competition)
 
     response = client.post('/purchase-places', data={
         'competition': "Test Competition",
@@ -695,9 +728,9 @@ def test_invalid_places_handling(client, mocker, mock_load_clubs, mock_save_club
 # -------------------------------------------------------
 
 
-def test_club_points_page_loads(client, mocker, mock_load_clubs):
+def test_club_points_page_loads(client, backend, mock_load_clubs):
     # Test: Verify that the club points page loads successfully.
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
+    backend.save_clubs(mock_load_clubs)
 
     response = client.get('/club-points')
 
@@ -705,9 +738,9 @@ def test_club_points_page_loads(client, mocker, mock_load_clubs):
     assert b"Club Points" in response.data
 
 
-def test_club_points_display(client, mocker, mock_load_clubs):
+def test_club_points_display(client, backend, mock_load_clubs):
     # Test: Verify that the club points are correctly displayed on the page.
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
+    backend.save_clubs(mock_load_clubs)
     clubs = mock_load_clubs
 
     response = client.get('/club-points')
@@ -717,9 +750,41 @@ def test_club_points_display(client, mocker, mock_load_clubs):
         assert club['points'].encode() in response.data
 
 
-def test_club_points_page_loading_error(client, mocker):
+@pytest.fixture
+def many_clubs(backend):
+    # Five clubs, stored out of order.
+    backend.save_clubs([{"name": f"Club {name}", "email": f"club{name}@example.co", "points": str(points)}
+                        for name, points in (("C", 5), ("A", 20), ("E", 1), ("B", 13), ("D", 8))])
+
+
+def test_club_points_streamed(client, mocker, many_clubs):
+    # Test: With ?stream=1 the page is sent as it is rendered, with the same content.
+    stream_template = mocker.spy(server, 'stream_template')
+    rendered = client.get('/club-points')
+    assert stream_template.call_count == 0
+
+    streamed = client.get('/club-points?stream=1')
+    assert stream_template.call_count == 1
+    assert streamed.data == rendered.data
+
+
+def test_club_points_sorted_and_paged(app, client, many_clubs):
+    # Test: Clubs can be sorted by points and listed by pages.
+    app.config["CLUB_POINTS_PER_PAGE"] = 2
+
+    first_page = client.get('/club-points?sort=points&page=1').data
+    last_page = client.get('/club-points?sort=points&page=3').data
+
+    assert first_page.index(b"Club A") < first_page.index(b"Club B")
+    assert b"Club C" not in first_page
+    assert b"sort=points&amp;page=2" in first_page
+    assert b"Club E" in last_page
+    assert b"page=4" not in last_page
+
+
+def test_club_points_page_loading_error(client, backend):
     # Test: Simulate a loading error and verify that an error message is displayed.
-    mocker.patch('server.load_clubs', return_value=[])  # Simulate a loading error.
+    backend.save_clubs([])  # Simulate a loading error.
     response = client.get('/club-points', follow_redirects=True)
     assert response.status_code == 200
     assert LOADING_MESSAGE_ERROR.encode() in response.data
@@ -740,15 +805,15 @@ def test_logout(client):
 # -------------------------------------------------------
 # Test for book Function
 # -------------------------------------------------------
-def test_book_club_and_competition_found(client, mocker, mock_load_clubs, mock_load_competitions):
+def test_book_club_and_competition_found(client, backend, mock_load_clubs, mock_load_competitions):
     # Test:Verify that booking page loads successfully when both club and competition are found.
 
     # Use existing club and competition names
     existing_club_name = "Test Club"
     existing_competition_name = "Test Competition"
 
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=mock_load_competitions)
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
 
     # Attempt to book for an existing club and competition.
     response = client.get(f'/book/{existing_competition_name}/{existing_club_name}')
@@ -758,14 +823,14 @@ def test_book_club_and_competition_found(client, mocker, mock_load_clubs, mock_l
     assert b'How many places?' in response.data
 
 
-def test_book_club_or_competition_not_found(client, mocker, mock_load_clubs, mock_load_competitions):
+def test_book_club_or_competition_not_found(client, backend, mock_load_clubs, mock_load_competitions):
     # Test: Verify that booking fails and redirects with an error when club or competition is not found.
 
     nonexisting_club_name = "Non Existing Competition"
     nonexisting_competition_name = "Non Existing Competition"
 
-    mocker.patch('server.load_clubs', return_value=mock_load_clubs)
-    mocker.patch('server.load_competitions', return_value=mock_load_competitions)
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(mock_load_competitions)
 
     # Attempt to book for a club and competition that do not exist in the mock data.
     response = client.get(f'/book/{nonexisting_competition_name}/{nonexisting_club_name}', follow_redirects=True)
@@ -773,3 +838,252 @@ def test_book_club_or_competition_not_found(client, mocker, mock_load_clubs, moc
     # Check that the response is a redirect to the welcome page with an error message.
     assert response.status_code == 200
     assert ERROR_MESSAGE_RETRY.encode() in response.data
+
+
+def test_concurrent_purchases_do_not_oversell(app, tmp_path):
+    # Test: Parallel purchases for a competition with few places left never book more places than available.
+    clubs_file = tmp_path / "clubs.json"
+    competitions_file = tmp_path / "competitions.json"
+    clubs = [{"name": f"Club {i}", "email": f"club{i}@example.co", "points": "10"} for i in range(10)]
+    clubs_file.write_text(json.dumps({"clubs": clubs}))
+    competitions_file.write_text(json.dumps({"competitions": [
+        {"name": "Test Competition", "date": "2050-10-22 13:30:00", "numberOfPlaces": "5", "bookings": {}}
+    ]}))
+    data_access.init_app(app, JSONFileBackend(str(clubs_file), str(competitions_file)))
+
+    def purchase(club_name):
+        with app.test_client() as thread_client:
+            thread_client.post('/purchase-places', data={
+                'competition': "Test Competition",
+                'club': club_name,
+                'places': "1"
+            })
+
+    threads = [threading.Thread(target=purchase, args=(club['name'],)) for club in clubs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with open(competitions_file) as c:
+        competition = json.load(c)["competitions"][0]
+    assert competition["numberOfPlaces"] == 0
+    assert sum(competition["bookings"].values()) == 5
+
+
+# -------------------------------------------------------
+# Tests for purchase_places_batch Function
+# -------------------------------------------------------
+
+@pytest.fixture
+def batch_competitions():
+    # Two future competitions with places left.
+    return [
+        {"name": "Competition A", "date": "2050-10-22 13:30:00", "numberOfPlaces": "20", "bookings": {}},
+        {"name": "Competition B", "date": "2050-11-22 13:30:00", "numberOfPlaces": "20", "bookings": {}}
+    ]
+
+
+def test_purchase_places_batch_books_every_line(client, backend, mock_load_clubs, batch_competitions):
+    # Test: Every line of the batch is booked and confirmed.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(batch_competitions)
+
+    response = client.post('/purchase-places/batch', data={
+        'club': "Test Club",
+        'competition': ["Competition A", "Competition B"],
+        'places': ["3", "4"]
+    })
+
+    assert response.status_code == 200
+    assert BOOKING_COMPLETE_MESSAGE.encode() in response.data
+    assert b"You have reserved 3 place(s) for the competition Competition A." in response.data
+    assert b"You have reserved 4 place(s) for the competition Competition B." in response.data
+    assert backend.get_club_by_name("Test Club")['points'] == 3
+    assert backend.get_competition_by_name("Competition B")['bookings'] == {"Test Club": 4}
+
+
+def test_purchase_places_batch_saves_once(client, backend, mocker, mock_load_clubs, batch_competitions):
+    # Test: The whole batch is persisted in a single call to the backend.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(batch_competitions)
+    apply_bookings = mocker.spy(backend, 'apply_bookings')
+
+    client.post('/purchase-places/batch', data={
+        'club': "Test Club",
+        'competition': ["Competition A", "Competition B"],
+        'places': ["1", "1"]
+    })
+
+    assert apply_bookings.call_count == 1
+
+
+def test_purchase_places_batch_ignores_empty_lines(client, backend, mock_load_clubs, batch_competitions):
+    # Test: Competitions left without a number of places are not booked.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(batch_competitions)
+
+    response = client.post('/purchase-places/batch', data={
+        'club': "Test Club",
+        'competition': ["Competition A", "Competition B"],
+        'places': ["2", ""]
+    })
+
+    assert BOOKING_COMPLETE_MESSAGE.encode() in response.data
+    assert backend.get_competition_by_name("Competition B")['bookings'] == {}
+
+
+def test_purchase_places_batch_is_all_or_nothing(client, backend, mock_load_clubs, batch_competitions):
+    # Test: A single invalid line prevents the whole batch from being booked.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(batch_competitions)
+
+    response = client.post('/purchase-places/batch', data={
+        'club': "Test Club",
+        'competition': ["Competition A", "Competition B"],
+        'places': ["2", "13"]
+    })
+
+    assert response.status_code == 200
+    assert f"Competition B: {MAX_PLACES_PER_BOOKING_MESSAGE}".encode() in response.data
+    assert BOOKING_COMPLETE_MESSAGE.encode() not in response.data
+    assert backend.get_club_by_name("Test Club")['points'] == 10
+    assert backend.get_competition_by_name("Competition A")['bookings'] == {}
+
+
+def test_purchase_places_batch_checks_points_for_all_lines(client, backend, mock_load_clubs, batch_competitions):
+    # Test: The club's points must cover the total of the batch, not only each line.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(batch_competitions)
+
+    response = client.post('/purchase-places/batch', data={
+        'club': "Test Club",
+        'competition': ["Competition A", "Competition B"],
+        'places': ["6", "6"]
+    })
+
+    assert f"Competition B: {INSUFFICIENT_POINTS_MESSAGE}".encode() in response.data
+    assert backend.get_club_by_name("Test Club")['points'] == 10
+
+
+def test_purchase_places_batch_checks_limit_for_repeated_competition(client, backend, batch_competitions):
+    # Test: The 12 places limit applies to the total booked in a competition over the batch.
+    backend.save_clubs([{"name": "Test Club", "email": "testclubmail@example.co", "points": "30"}])
+    backend.save_competitions(batch_competitions)
+
+    response = client.post('/purchase-places/batch', data={
+        'club': "Test Club",
+        'competition': ["Competition A", "Competition A"],
+        'places': ["8", "8"]
+    })
+
+    assert b"Competition A: You can only book 4 more place(s) for this competition." in response.data
+
+
+def test_purchase_places_batch_without_lines(client, backend, mock_load_clubs, batch_competitions):
+    # Test: A batch without any number of places asks for one.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(batch_competitions)
+
+    response = client.post('/purchase-places/batch', data={
+        'club': "Test Club",
+        'competition': ["Competition A", "Competition B"],
+        'places': ["", ""]
+    })
+
+    assert EMPTY_BATCH_MESSAGE.encode() in response.data
+
+
+def test_purchase_places_batch_unknown_club(client, backend, mock_load_clubs, batch_competitions):
+    # Test: A batch for a club that does not exist is refused.
+    backend.save_clubs(mock_load_clubs)
+    backend.save_competitions(batch_competitions)
+
+    response = client.post('/purchase-places/batch', data={
+        'club': "Nonexistent Club",
+        'competition': ["Competition A"],
+        'places': ["1"]
+    }, follow_redirects=True)
+
+    assert INVALID_CLUB_OR_COMPETITION.encode() in response.data
+
+
+# -------------------------------------------------------
+# Tests for create_app Function
+# -------------------------------------------------------
+
+@pytest.fixture
+def data_files(tmp_path):
+    # Generated data files, named relative to the temporary directory and as absolute paths.
+    clubs, competitions = generate_dataset(20, 10)
+    write_dataset(str(tmp_path / "clubs.json"), str(tmp_path / "competitions.json"), clubs, competitions)
+    return {"CLUBS_FILE": str(tmp_path / "clubs.json"), "COMPETITIONS_FILE": str(tmp_path / "competitions.json"),
+            "STORAGE_BACKEND": "json", "IDEMPOTENCY_DIRECTORY": str(tmp_path / "idempotency"),
+            "HOLDS_FILE": str(tmp_path / "holds.json")}
+
+
+def test_create_app_takes_settings_from_config(data_files):
+    # Test: The secret key and the other settings come from the configuration given.
+    created = create_app(dict(data_files, SECRET_KEY="another key", PRELOAD_DATA=False))
+
+    assert created.secret_key == "another key"
+    assert created.config["CLUBS_FILE"] == data_files["CLUBS_FILE"]
+
+
+def test_create_app_resolves_relative_data_paths(data_files):
+    # Test: Relative data paths are taken from the root of the repository, once.
+    created = create_app(dict(data_files, CLUBS_FILE="data/test/clubs_test.json", PRELOAD_DATA=False))
+
+    assert created.config["CLUBS_FILE"] == os.path.join(created.root_path, "data", "test", "clubs_test.json")
+
+
+def test_create_app_preloads_data_and_templates(data_files):
+    # Test: The data is loaded and every template compiled before the first request, which only reuses them.
+    data_access.invalidate()
+    created = create_app(dict(data_files, PRELOAD_DATA=True))
+    misses = data_access.cache_stats()["misses"]
+
+    assert len(created.jinja_env.cache) == len(created.jinja_env.list_templates())
+    response = created.test_client().get('/club-points')
+    assert response.status_code == 200
+    assert data_access.cache_stats()["misses"] == misses
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs os.fork")
+def test_preloaded_objects_are_frozen_before_fork(data_files):
+    # Test: The garbage collector only stops tracking the preloaded objects when a worker is forked.
+    gc.unfreeze()
+    create_app(dict(data_files, PRELOAD_DATA=True))
+    assert gc.get_freeze_count() == 0
+
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0)
+    os.waitpid(pid, 0)
+    try:
+        assert gc.get_freeze_count() > 0
+    finally:
+        gc.unfreeze()
+
+
+def test_created_app_serves_its_own_data(data_files):
+    # Test: The routes of an application created with other data files answer from them.
+    clubs, _ = generate_dataset(20, 10)
+    created = create_app(data_files)
+
+    response = created.test_client().post('/show-summary', data={'email': clubs[3]["email"]})
+
+    assert response.status_code == 200
+    assert clubs[3]["name"].encode() in response.data
+
+
+def test_created_apps_keep_their_own_state(app, data_files):
+    # Test: Creating another application changes neither the storage nor the settings of the first one.
+    other = create_app(dict(data_files, HOLD_SECONDS=0, IDEMPOTENCY_TTL=0, PRELOAD_DATA=False))
+
+    assert other.extensions["storage"] is not app.extensions["storage"]
+    assert other.extensions["holds"].ttl == 0 and app.extensions["holds"].ttl == 120
+    assert other.extensions["idempotency"] is not app.extensions["idempotency"]
+    assert data_access.get_backend() is app.extensions["storage"]
+    with other.app_context():
+        assert data_access.get_backend() is other.extensions["storage"]
@@ -0,0 +1,156 @@
+import json
+
+import pytest
+
+import data_access
+from data_access import ShardedJSONBackend
+from data_access import shard_data_files
+from sharded_storage import bucket_path
+from sharded_storage import club_bucket
+from sharded_storage import competition_path
+from sharded_storage import read_manifest
+
+
+@pytest.fixture
+def sharded(tmp_path):
+    # A sharded directory of 4 buckets holding two clubs and two competitions.
+    data_access.invalidate()
+    backend = ShardedJSONBackend(str(tmp_path / "sharded"), buckets=4)
+    backend.save_clubs([{"name": "Club A", "email": "cluba@example.com", "points": 10},
+                        {"name": "Club B", "email": "clubb@example.com", "points": 20}])
+    backend.save_competitions([
+        {"name": "Competition A", "date": "2030-10-22 13:30:00", "numberOfPlaces": 30, "bookings": {}},
+        {"name": "Competition B", "date": "2031-10-22 13:30:00", "numberOfPlaces": 30, "bookings": {}}
+    ])
+    yield backend
+    data_access.invalidate()
+
+
+def modification_times(directory):
+    return {path: path.stat().st_mtime_ns for path in directory.rglob("*.json")}
+
+
+# -------------------------------------------------------
+# Tests for the layout of the sharded directory
+# -------------------------------------------------------
+
+def test_club_bucket_is_stable():
+    # Test: A club always goes to the same bucket, within the number of buckets.
+    assert club_bucket("Club A", 64) == club_bucket("Club A", 64)
+    assert all(0 <= club_bucket(f"Club {i}", 4) < 4 for i in range(100))
+
+
+def test_save_writes_one_file_per_competition_and_bucket(tmp_path, sharded):
+    # Test: Each competition has its own file, each club is in the bucket of its name, in the manifest order.
+    directory = str(tmp_path / "sharded")
+
+    with open(competition_path(directory, "Competition B")) as c:
+        assert json.load(c)["competitions"][0]["name"] == "Competition B"
+    with open(bucket_path(directory, club_bucket("Club A", 4))) as c:
+        assert "Club A" in [club["name"] for club in json.load(c)["clubs"]]
+    assert read_manifest(directory) == {"buckets": 4, "clubs": ["Club A", "Club B"],
+                                        "competitions": ["Competition A", "Competition B"]}
+
+
+# -------------------------------------------------------
+# Tests for ShardedJSONBackend Class
+# -------------------------------------------------------
+
+def test_load_keeps_the_order_of_the_manifest(sharded):
+    # Test: All the clubs and competitions are returned in the order they were saved.
+    assert [club["name"] for club in sharded.load_clubs()] == ["Club A", "Club B"]
+    competitions = sharded.load_competitions()
+    assert [competition["name"] for competition in competitions] == ["Competition A", "Competition B"]
+    assert sharded.get_club_by_email("CLUBB@example.com")["points"] == 20
+
+
+def test_lookup_by_name_reads_a_single_file(mocker, sharded):
+    # Test: A club or a competition looked up by name is read from its own file only.
+    data_access.invalidate()
+    load = mocker.spy(data_access, "_load_records")
+
+    assert sharded.get_club_by_name("Club B")["points"] == 20
+    assert sharded.get_competition_by_name("Competition A")["numberOfPlaces"] == 30
+    assert sharded.get_competition_by_name("Unknown") is None
+    assert load.call_count == 2
+
+
+def test_booking_rewrites_only_the_files_it_changes(tmp_path, sharded):
+    # Test: A booking rewrites the bucket of the club and the file of the competition, nothing else.
+    directory = tmp_path / "sharded"
+    before = modification_times(directory)
+
+    assert sharded.apply_booking("Competition A", "Club A", 4)
+
+    changed = {path.name for path, mtime in modification_times(directory).items() if before.get(path) != mtime}
+    assert changed == {f"{club_bucket('Club A', 4):04d}.json",
+                       competition_path(str(directory), "Competition A").rsplit("/", 1)[1]}
+    assert sharded.get_club_by_name("Club A")["points"] == 6
+    assert sharded.load_competitions()[0]["bookings"] == {"Club A": 4}
+
+
+def test_impossible_booking_changes_nothing(sharded):
+    # Test: Bookings are all or nothing, as with the other backends.
+    assert not sharded.apply_bookings("Club A", [("Competition A", 4), ("Competition B", 8)])
+
+    assert sharded.get_club_by_name("Club A")["points"] == 10
+    assert sharded.get_competition_by_name("Competition A")["numberOfPlaces"] == 30
+
+
+def test_changes_by_another_process_are_seen(tmp_path, sharded):
+    # Test: A file rewritten by another backend on the same directory is read again, with a new data version.
+    version = sharded.data_version()
+    sharded.load_clubs()
+
+    # Another process has its own copy of the records.
+    other = ShardedJSONBackend(str(tmp_path / "sharded"))
+    data_access.invalidate()
+    assert other.apply_booking("Competition B", "Club B", 2)
+
+    assert sharded.data_version()[:2] != version[:2]
+    assert other.data_version() == sharded.data_version()
+    assert [club["points"] for club in sharded.load_clubs()] == [10, 18]
+
+
+def test_own_booking_keeps_the_combined_lists(mocker, sharded):
+    # Test: After a booking by this process, the lists of all clubs and competitions are served without reading or
+    # checking each file again.
+    sharded.load_clubs()
+    sharded.load_competitions()
+    assert sharded.apply_booking("Competition A", "Club A", 4)
+    load = mocker.spy(data_access, "_load_records")
+
+    assert sharded.load_competitions()[0]["bookings"] == {"Club A": 4}
+    assert sharded.load_clubs()[0]["points"] == 6
+    assert load.call_count == 0
+
+
+def test_save_competitions_removes_dropped_competitions(tmp_path, sharded):
+    # Test: The file of a competition that is no longer listed is removed.
+    directory = str(tmp_path / "sharded")
+    sharded.save_competitions(sharded.load_competitions()[1:])
+
+    assert [competition["name"] for competition in sharded.load_competitions()] == ["Competition B"]
+    with pytest.raises(FileNotFoundError):
+        open(competition_path(directory, "Competition A"))
+
+
+# -------------------------------------------------------
+# Tests for shard_data_files Function
+# -------------------------------------------------------
+
+def test_shard_data_files(tmp_path):
+    # Test: The two data files are split into a sharded directory holding the same records.
+    clubs_file = tmp_path / "clubs.json"
+    competitions_file = tmp_path / "competitions.json"
+    clubs_file.write_text(json.dumps({"clubs": [{"name": "Club A", "email": "cluba@example.com", "points": "13"}]}))
+    competitions_file.write_text(json.dumps({"competitions": [
+        {"name": "Competition A", "date": "2030-10-22 13:30:00", "numberOfPlaces": "25",
+         "bookings": {"Club A": 2}}]}))
+
+    assert shard_data_files(str(clubs_file), str(competitions_file), str(tmp_path / "sharded"), buckets=8)
+
+    backend = ShardedJSONBackend(str(tmp_path / "sharded"))
+    assert backend.load_clubs() == [{"name": "Club A", "email": "cluba@example.com", "points": 13}]
+    assert backend.get_competition_by_name("Competition A")["bookings"] == {"Club A": 2}
+    assert read_manifest(str(tmp_path / "sharded"))["buckets"] == 8
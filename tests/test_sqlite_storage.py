@@ -0,0 +1,260 @@
+import json
+import threading
+
+import pytest
+
+import sqlite_storage
+from data_access import SQLiteBackend
+from sqlite_storage import connect
+from sqlite_storage import load_clubs
+from sqlite_storage import load_competitions
+from sqlite_storage import save_clubs
+from sqlite_storage import save_competitions
+from sqlite_storage import book_places
+from sqlite_storage import book_places_batch
+from sqlite_storage import import_json
+from sqlite_storage import data_version
+
+
+@pytest.fixture
+def database(tmp_path):
+    # An empty database holding one club and one competition.
+    connection = connect(str(tmp_path / "gudlft.db"))
+    save_clubs(connection, [{"name": "Test Club", "email": "testclubmail@example.co", "points": "10"}])
+    save_competitions(connection, [{"name": "Test Competition", "date": "2030-10-22 13:30:00",
+                                    "numberOfPlaces": "30", "bookings": {}}])
+    yield connection
+    connection.close()
+
+
+# -------------------------------------------------------
+# Tests for connect Function
+# -------------------------------------------------------
+
+def test_connect_uses_wal_mode(database):
+    # Test: The database is opened in WAL mode.
+    assert database.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+# -------------------------------------------------------
+# Tests for load and save Functions
+# -------------------------------------------------------
+
+def test_save_and_load_clubs(database):
+    # Test: Clubs are read back in the same format as the JSON data file, with numbers.
+    clubs = [
+        {"name": "Test Club", "email": "testclubmail@example.co", "points": 7},
+        {"name": "Club B", "email": "clubb@example.com", "points": 200}
+    ]
+
+    assert save_clubs(database, clubs)
+
+    assert load_clubs(database) == clubs
+
+
+def test_save_clubs_removes_missing_clubs(database):
+    # Test: Clubs that are no longer in the saved list are deleted.
+    assert save_clubs(database, [{"name": "Club B", "email": "clubb@example.com", "points": "200"}])
+
+    assert [club["name"] for club in load_clubs(database)] == ["Club B"]
+
+
+def test_save_clubs_invalid_points(database):
+    # Test: Invalid points are rejected and nothing is saved.
+    assert not save_clubs(database, [{"name": "Club B", "email": "clubb@example.com", "points": "invalid"}])
+
+    assert [club["name"] for club in load_clubs(database)] == ["Test Club"]
+
+
+def test_save_and_load_competitions_with_bookings(database):
+    # Test: Competitions are read back with their bookings.
+    competitions = [{"name": "Test Competition", "date": "2030-10-22 13:30:00", "numberOfPlaces": 25,
+                     "bookings": {"Test Club": 5}}]
+
+    assert save_competitions(database, competitions)
+
+    assert load_competitions(database) == competitions
+
+
+# -------------------------------------------------------
+# Tests for book_places Function
+# -------------------------------------------------------
+
+def test_book_places_updates_places_points_and_bookings(database):
+    # Test: A booking takes the places from the competition and the points from the club.
+    assert book_places(database, "Test Competition", "Test Club", 3)
+    assert book_places(database, "Test Competition", "Test Club", 2)
+
+    assert load_clubs(database)[0]["points"] == 5
+    competition = load_competitions(database)[0]
+    assert competition["numberOfPlaces"] == 25
+    assert competition["bookings"] == {"Test Club": 5}
+
+
+@pytest.mark.parametrize("places, competition_places, club_points", [
+    (5, 4, 10),  # Not enough places
+    (5, 30, 4),  # Not enough points
+    (13, 30, 20),  # More than 12 places
+])
+def test_book_places_rejected_changes_nothing(database, places, competition_places, club_points):
+    # Test: A booking that cannot be honoured leaves the database untouched.
+    save_clubs(database, [{"name": "Test Club", "email": "testclubmail@example.co", "points": club_points}])
+    save_competitions(database, [{"name": "Test Competition", "date": "2030-10-22 13:30:00",
+                                  "numberOfPlaces": competition_places, "bookings": {}}])
+
+    assert not book_places(database, "Test Competition", "Test Club", places)
+
+    assert load_clubs(database)[0]["points"] == club_points
+    assert load_competitions(database)[0]["numberOfPlaces"] == competition_places
+    assert load_competitions(database)[0]["bookings"] == {}
+
+
+def test_book_places_over_club_limit(database):
+    # Test: A club cannot go over 12 places in a competition over several bookings.
+    save_clubs(database, [{"name": "Test Club", "email": "testclubmail@example.co", "points": "20"}])
+    assert book_places(database, "Test Competition", "Test Club", 10)
+
+    assert not book_places(database, "Test Competition", "Test Club", 3)
+    assert load_competitions(database)[0]["bookings"] == {"Test Club": 10}
+
+
+def test_book_places_batch_is_all_or_nothing(database):
+    # Test: A batch with one booking that cannot be honoured changes nothing.
+    save_competitions(database, [
+        {"name": "Test Competition", "date": "2030-10-22 13:30:00", "numberOfPlaces": "30", "bookings": {}},
+        {"name": "Competition B", "date": "2030-11-22 13:30:00", "numberOfPlaces": "1", "bookings": {}}
+    ])
+
+    assert not book_places_batch(database, "Test Club", [("Test Competition", 3), ("Competition B", 2)])
+    assert load_clubs(database)[0]["points"] == 10
+
+    assert book_places_batch(database, "Test Club", [("Test Competition", 3), ("Competition B", 1)])
+    assert load_clubs(database)[0]["points"] == 6
+    assert [c["bookings"] for c in load_competitions(database)] == [{"Test Club": 3}, {"Test Club": 1}]
+
+
+def test_concurrent_bookings_do_not_oversell(tmp_path):
+    # Test: Bookings from several connections at once never take more places than available.
+    db_path = str(tmp_path / "gudlft.db")
+    connection = connect(db_path)
+    save_clubs(connection, [{"name": f"Club {i}", "email": f"club{i}@example.co", "points": "10"} for i in range(10)])
+    save_competitions(connection, [{"name": "Test Competition", "date": "2030-10-22 13:30:00",
+                                    "numberOfPlaces": "5", "bookings": {}}])
+
+    def book(club_name):
+        thread_connection = connect(db_path)
+        book_places(thread_connection, "Test Competition", club_name, 1)
+        thread_connection.close()
+
+    threads = [threading.Thread(target=book, args=(f"Club {i}",)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    competition = load_competitions(connection)[0]
+    assert competition["numberOfPlaces"] == 0
+    assert len(competition["bookings"]) == 5
+
+
+def test_data_version_shared_by_connections(tmp_path, database):
+    # Test: Every committed write increases the version seen by all the connections, a rejected booking does not.
+    other_connection = connect(str(tmp_path / "gudlft.db"))
+    uid, version, _ = data_version(other_connection)
+
+    assert book_places(database, "Test Competition", "Test Club", 1)
+    assert data_version(other_connection)[:2] == (uid, version + 1)
+    assert not book_places(database, "Test Competition", "Test Club", 50)
+    assert data_version(other_connection)[1] == version + 1
+    other_connection.close()
+
+
+# -------------------------------------------------------
+# Tests for import_json Function
+# -------------------------------------------------------
+
+def test_import_json(tmp_path):
+    # Test: The JSON data files are imported into an empty database.
+    clubs = [{"name": "Club A", "email": "cluba@example.com", "points": "13"}]
+    competitions = [{"name": "Competition A", "date": "2030-10-22 13:30:00", "numberOfPlaces": "25",
+                     "bookings": {"Club A": 2}}]
+    (tmp_path / "clubs.json").write_text(json.dumps({"clubs": clubs}))
+    (tmp_path / "competitions.json").write_text(json.dumps({"competitions": competitions}))
+    connection = connect(str(tmp_path / "gudlft.db"))
+
+    assert import_json(connection, str(tmp_path / "clubs.json"), str(tmp_path / "competitions.json"))
+
+    # Data files written before the numbers were stored as numbers are imported too.
+    assert load_clubs(connection) == [dict(clubs[0], points=13)]
+    assert load_competitions(connection) == [dict(competitions[0], numberOfPlaces=25)]
+
+
+def test_sqlite_backend(tmp_path):
+    # Test: The SQLite backend reads, books and sees the changes made by other connections.
+    db_path = str(tmp_path / "gudlft.db")
+    backend = SQLiteBackend(db_path)
+    backend.save_clubs([{"name": "Test Club", "email": "testclubmail@example.co", "points": "10"}])
+    backend.save_competitions([{"name": "Test Competition", "date": "2030-10-22 13:30:00",
+                                "numberOfPlaces": "30", "bookings": {}}])
+
+    assert backend.get_club_by_email("TESTCLUBMAIL@example.co")["name"] == "Test Club"
+    assert backend.apply_booking("Test Competition", "Test Club", 4)
+    assert backend.get_competition_by_name("Test Competition")["bookings"] == {"Test Club": 4}
+
+    other_connection = connect(db_path)
+    save_clubs(other_connection, [{"name": "Test Club", "email": "testclubmail@example.co", "points": "50"}])
+    other_connection.close()
+    assert backend.get_club_by_name("Test Club")["points"] == 50
+
+
+def test_sqlite_backend_lookups_do_not_load_every_record(tmp_path, mocker):
+    # Test: Looking up one club or competition is an indexed query, without loading all the records.
+    backend = SQLiteBackend(str(tmp_path / "gudlft.db"))
+    backend.save_clubs([{"name": "Test Club", "email": "testclubmail@example.co", "points": "10"}])
+    backend.save_competitions([{"name": "Test Competition", "date": "2030-10-22 13:30:00",
+                                "numberOfPlaces": "30", "bookings": {"Test Club": 2}}])
+    load_all = mocker.spy(sqlite_storage, "load_clubs")
+
+    assert backend.get_club_by_email(" TestClubMail@example.co")["name"] == "Test Club"
+    assert backend.get_club_by_email("unknown@example.co") is None
+    assert backend.get_competition_by_name("Test Competition")["bookings"] == {"Test Club": 2}
+    assert load_all.call_count == 0
+    plan = backend._connection().execute("EXPLAIN QUERY PLAN SELECT name FROM clubs WHERE email = ? COLLATE NOCASE",
+                                         ("testclubmail@example.co",)).fetchall()
+    assert "clubs_email" in plan[0][3]
+
+
+def test_sqlite_backend_reads_only_the_rows_changed(tmp_path, mocker):
+    # Test: After a booking, the records loaded are updated in place from the rows it changed.
+    backend = SQLiteBackend(str(tmp_path / "gudlft.db"))
+    backend.save_clubs([{"name": "Club A", "email": "cluba@example.com", "points": "10"},
+                        {"name": "Club B", "email": "clubb@example.com", "points": "10"}])
+    backend.save_competitions([{"name": "Competition A", "date": "2030-10-22 13:30:00", "numberOfPlaces": "30",
+                                "bookings": {}}])
+    clubs = backend.load_clubs()
+    competitions = backend.load_competitions()
+    load = mocker.spy(sqlite_storage, "load_clubs")
+
+    assert backend.apply_booking("Competition A", "Club B", 3)
+
+    assert backend.load_clubs() is clubs
+    assert load.call_args.args[1] is not None
+    assert load.spy_return == [{"name": "Club B", "email": "clubb@example.com", "points": 7}]
+    assert [club["points"] for club in clubs] == [10, 7]
+    assert backend.load_competitions() is competitions
+    assert competitions[0]["bookings"] == {"Club B": 3}
+
+
+def test_sqlite_backend_reloads_after_rows_are_removed(tmp_path):
+    # Test: Clubs removed by another connection are no longer listed, and new ones are.
+    db_path = str(tmp_path / "gudlft.db")
+    backend = SQLiteBackend(db_path)
+    backend.save_clubs([{"name": "Club A", "email": "cluba@example.com", "points": "10"}])
+    assert [club["name"] for club in backend.load_clubs()] == ["Club A"]
+
+    other_connection = connect(db_path)
+    save_clubs(other_connection, [{"name": "Club B", "email": "clubb@example.com", "points": "20"}])
+    other_connection.close()
+
+    assert [club["name"] for club in backend.load_clubs()] == ["Club B"]
+    assert backend.load_clubs().lookup("email", "clubb@example.com")["points"] == 20
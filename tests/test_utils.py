@@ -2,6 +2,10 @@ from datetime import datetime
 from utils import parse_competition_date
 from utils import is_competition_past
 from utils import purchase_limit
+from utils import validate_purchase
+from utils import competition_filters
+from constants import INSUFFICIENT_PLACES_MESSAGE
+from constants import PAST_COMPETITION_BOOKING_ERROR_MESSAGE
 
 
 # -------------------------------------------------------
@@ -149,3 +153,55 @@ def test_purchase_limit_when_limit_reached():
 
     expected_limit = 0
     assert purchase_limit(selected_club, selected_competition) == expected_limit
+
+
+# -------------------------------------------------------
+# Tests for validate_purchase Function
+# -------------------------------------------------------
+
+def test_validate_purchase_valid_request():
+    # Test: A valid request returns the number of places to book and no message.
+    club = {"name": "Test Club", "points": "10"}
+    competition = {"name": "Test Competition", "date": "2050-10-22 13:30:00", "numberOfPlaces": "20", "bookings": {}}
+
+    assert validate_purchase(club, competition, "4", datetime(2024, 1, 1)) == (4, None)
+
+
+def test_validate_purchase_past_competition():
+    # Test: A competition that has already taken place cannot be booked.
+    club = {"name": "Test Club", "points": "10"}
+    competition = {"name": "Test Competition", "date": "2020-10-22 13:30:00", "numberOfPlaces": "20", "bookings": {}}
+
+    assert validate_purchase(club, competition, "4", datetime(2024, 1, 1)) == \
+        (None, PAST_COMPETITION_BOOKING_ERROR_MESSAGE)
+
+
+def test_validate_purchase_not_enough_places():
+    # Test: A competition cannot be booked beyond its remaining places.
+    club = {"name": "Test Club", "points": "10"}
+    competition = {"name": "Test Competition", "date": "2050-10-22 13:30:00", "numberOfPlaces": "2", "bookings": {}}
+
+    assert validate_purchase(club, competition, "3", datetime(2024, 1, 1)) == (None, INSUFFICIENT_PLACES_MESSAGE)
+
+
+# -------------------------------------------------------
+# Tests for competition_filters Function
+# -------------------------------------------------------
+
+def test_competition_filters_default_to_upcoming():
+    # Test: Without filters, the competitions from the current date are listed.
+    current_date = datetime(2024, 1, 1, 12, 0, 0)
+
+    assert competition_filters({}, current_date) == {"start": current_date, "end": None, "available_only": False,
+                                                     "name_prefix": None, "cursor": 0}
+    assert competition_filters({"past": "1"}, current_date)["start"] is None
+
+
+def test_competition_filters_values():
+    # Test: The "to" day is included and invalid values are ignored.
+    filters = competition_filters({"from": "2030-01-01", "to": "2030-01-31", "available": "1", "name": " Spring ",
+                                   "cursor": "4"}, datetime(2024, 1, 1))
+
+    assert filters == {"start": datetime(2030, 1, 1), "end": datetime(2030, 2, 1), "available_only": True,
+                       "name_prefix": "Spring", "cursor": 4}
+    assert competition_filters({"to": "31/01/2030", "cursor": "x"}, datetime(2024, 1, 1))["end"] is None
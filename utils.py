@@ -1,5 +1,19 @@
 from datetime import datetime
+from datetime import timedelta
 from typing import Optional
+from typing import Tuple
+
+from constants import INSUFFICIENT_PLACES_MESSAGE
+from constants import INSUFFICIENT_POINTS_MESSAGE
+from constants import INVALID_PLACES_MESSAGE
+from constants import NON_POSITIVE_PLACES_MESSAGE
+from constants import INVALID_POINTS_MESSAGE
+from constants import MAX_PLACES_PER_BOOKING_MESSAGE
+from constants import INVALID_DATE_FORMAT_MESSAGE
+from constants import PAST_COMPETITION_BOOKING_ERROR_MESSAGE
+from constants import COMPETITION_FULL_MESSAGE
+from constants import INVALID_NUMBER_OF_PLACES_MESSAGE
+from constants import CLUB_LIMIT_MESSAGE
 
 
 def parse_competition_date(date_str: str) -> Optional[datetime]:
@@ -15,8 +29,82 @@ def is_competition_past(competition_date: datetime, current_date: datetime) -> b
     return competition_date < current_date
 
 
+def competition_filters(values, current_date: datetime) -> dict:
+    # Reads the filters of a competitions list from request values: "from" and "to" days (YYYY-MM-DD, both
+    # included), "available", "name" (a prefix) and "cursor". Without "from", only upcoming competitions are listed,
+    # unless "past" is 1. Invalid values are ignored.
+    def day(name):
+        try:
+            return datetime.strptime(values.get(name) or '', "%Y-%m-%d")
+        except ValueError:
+            return None
+
+    start = day('from')
+    if start is None and values.get('past') != '1':
+        start = current_date
+    end = day('to')
+    try:
+        cursor = max(int(values.get('cursor') or 0), 0)
+    except ValueError:
+        cursor = 0
+    return {
+        "start": start,
+        "end": end + timedelta(days=1) if end is not None else None,
+        "available_only": values.get('available') == '1',
+        "name_prefix": (values.get('name') or '').strip() or None,
+        "cursor": cursor,
+    }
+
+
 def purchase_limit(selected_club, selected_competition):
     # Calculates remaining booking limit for a club in a competition, ensuring it doesn't exceed the total limit of 12.
     club_name = selected_club["name"]
     current_bookings = selected_competition.get('bookings', {}).get(club_name, 0)
     return 12 - current_bookings
+
+
+def validate_purchase(selected_club, selected_competition, places, current_date: datetime,
+                      competition_date: Optional[datetime] = None) -> Tuple[Optional[int], Optional[str]]:
+    # Checks a request for places in a competition. Returns the number of places to book and None, or None and the
+    # message explaining why the places cannot be booked. The date of the competition is parsed unless given.
+
+    # Check the competition date and that the competition has not already passed.
+    if competition_date is None:
+        competition_date = parse_competition_date(selected_competition['date'])
+    if competition_date is None:
+        return None, INVALID_DATE_FORMAT_MESSAGE
+    if is_competition_past(competition_date, current_date):
+        return None, PAST_COMPETITION_BOOKING_ERROR_MESSAGE
+
+    # Check that the number of places requested is valid.
+    try:
+        places_required = int(places)
+    except (TypeError, ValueError):
+        return None, INVALID_PLACES_MESSAGE
+    remaining_places_limit = purchase_limit(selected_club, selected_competition)
+    if places_required <= 0:
+        return None, NON_POSITIVE_PLACES_MESSAGE
+    if places_required > 12:
+        return None, MAX_PLACES_PER_BOOKING_MESSAGE
+    if places_required > remaining_places_limit:
+        return None, CLUB_LIMIT_MESSAGE.format(remaining_places=remaining_places_limit)
+
+    # Check if the club has enough points.
+    try:
+        available_points = int(selected_club['points'])
+    except (TypeError, ValueError):
+        return None, INVALID_POINTS_MESSAGE
+    if available_points < places_required:
+        return None, INSUFFICIENT_POINTS_MESSAGE
+
+    # Check if there are enough places available in the competition.
+    try:
+        number_of_places = int(selected_competition['numberOfPlaces'])
+    except (TypeError, ValueError):
+        return None, INVALID_NUMBER_OF_PLACES_MESSAGE
+    if number_of_places <= 0:
+        return None, COMPETITION_FULL_MESSAGE
+    if number_of_places < places_required:
+        return None, INSUFFICIENT_PLACES_MESSAGE
+
+    return places_required, None